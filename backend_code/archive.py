@@ -0,0 +1,81 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from backend_code.models import Order, OrderItems, ArchivedOrder, ArchivedOrderItems, TERMINAL_ORDER_STATUSES
+from backend_code.pagination import page_limit
+
+ARCHIVE_WATERMARK_KEY = 'order-archive:last-id'
+ORDER_FIELDS = ('id', 'order_number', 'order_slug', 'order_customer_id', 'area_code', 'final_delivery_price',
+                'express_delivery', 'total_price', 'status', 'status_changed')
+ORDER_ITEM_FIELDS = ('id', 'number_of_order_id', 'order_product_id', 'order_prod_vendor', 'order_vendor_id', 'order_prod_amount')
+
+
+def _refresh_watermark():
+    # the highest archived id, read back from the table so concurrent archivers cannot lower it
+    watermark = ArchivedOrder.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+    cache.set(ARCHIVE_WATERMARK_KEY, watermark, settings.ORDER_ARCHIVE_WATERMARK_TIMEOUT)
+    return watermark
+
+
+def archive_watermark():
+    '''
+    Наибольший id заказа в архиве. Заказы с большим id гарантированно находятся в основной таблице.
+    '''
+    watermark = cache.get(ARCHIVE_WATERMARK_KEY)
+    return _refresh_watermark() if watermark is None else watermark
+
+
+def archive_batch(cutoff, batch_size):
+    '''
+    Перенос одной пачки завершенных (delivered, canceled) заказов, статус которых не менялся с cutoff, вместе с позициями в архивные таблицы. Пачка переносится в короткой транзакции, заблокированные другими транзакциями заказы пропускаются (SKIP LOCKED). Возвращает количество перенесенных заказов.
+    '''
+    with transaction.atomic():
+        orders = list(Order.objects.select_for_update(skip_locked=True)
+                      .filter(status__in=TERMINAL_ORDER_STATUSES, status_changed__lt=cutoff)
+                      .order_by('id').values(*ORDER_FIELDS)[:batch_size])
+        if not orders:
+            return 0
+        order_ids = [order['id'] for order in orders]
+        items = OrderItems.objects.filter(number_of_order__in=order_ids).order_by().values_list(*ORDER_ITEM_FIELDS)
+        ArchivedOrder.objects.bulk_create([ArchivedOrder(**order) for order in orders])
+        ArchivedOrderItems.objects.bulk_create([ArchivedOrderItems(**dict(zip(ORDER_ITEM_FIELDS, item))) for item in items])
+        Order.objects.filter(id__in=order_ids).delete()
+        transaction.on_commit(_refresh_watermark)
+    return len(orders)
+
+
+def archive_orders(age_days=None, batch_size=None):
+    '''
+    Архивация завершенных заказов старше age_days дней (по умолчанию ORDER_ARCHIVE_AGE_DAYS) пачками по batch_size (ORDER_ARCHIVE_BATCH_SIZE). Каждая пачка - отдельная транзакция, поэтому блокировки не держатся дольше переноса одной пачки.
+    '''
+    cutoff = timezone.now() - timedelta(days=settings.ORDER_ARCHIVE_AGE_DAYS if age_days is None else age_days)
+    batch_size = batch_size or settings.ORDER_ARCHIVE_BATCH_SIZE
+    archived = 0
+    while True:
+        moved = archive_batch(cutoff, batch_size)
+        archived += moved
+        if moved < batch_size:
+            return archived
+
+
+def order_history_page(orders, archived_orders, before=None, limit=None):
+    '''
+    Страница истории заказов (от новых к старым, как keyset_page) из основной и архивной таблиц. Архив запрашивается, только если страница доходит до id, не превышающих archive_watermark(), т.е. когда клиент пролистал данные основной таблицы.
+    '''
+    limit = page_limit(limit)
+    if before not in (None, ''):
+        orders = orders.filter(id__lt=int(before))
+        archived_orders = archived_orders.filter(id__lt=int(before))
+    items = list(orders.order_by('-id')[:limit + 1])
+    if len(items) <= limit or items[limit - 1].id <= archive_watermark():
+        # on a full page only archived orders newer than the extra hot order can still make the cut
+        if len(items) > limit:
+            archived_orders = archived_orders.filter(id__gt=items[limit].id)
+        items = sorted(items + list(archived_orders.order_by('-id')[:limit + 1]), key=lambda order: order.id, reverse=True)
+    next_cursor = items[limit - 1].id if len(items) > limit else None
+    return items[:limit], next_cursor
@@ -0,0 +1,257 @@
+import asyncio
+import io
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signals
+from django.core.handlers.base import BaseHandler
+from django.core.handlers.wsgi import WSGIRequest, get_script_name
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve, set_script_prefix
+from rest_framework.renderers import JSONRenderer
+
+from backend_code.db_connections import check_connections, mark_used
+from backend_code.serializers import VendorOrderItemSerializer
+from backend_code.vendor_feed import ASYNC_WAIT_KEY, FeedWait, feed_event, poll_items, poll_step
+from backend_code.views import ProductViewSet, StoreViewSet, ProductCatViewSet, VendorOrderFeedView
+
+# read endpoints served without the WSGI wrapper: viewset and action of a GET request
+ASYNC_ACTIONS = {
+    (ProductViewSet, 'list'),
+    (ProductViewSet, 'retrieve'),
+    (StoreViewSet, 'retrieve'),
+    (ProductCatViewSet, 'retrieve'),
+    (VendorOrderFeedView, 'get'),
+}
+
+# the ORM of Django 2.2 is synchronous: requests to ASYNC_ACTIONS run in this pool, one persistent connection per thread
+_db_executor = ThreadPoolExecutor(settings.ASYNC_DB_THREADS, thread_name_prefix='async-db')
+
+
+async def in_pool(func, *args, **kwargs):
+    '''
+    Выполнение синхронного кода (обработчик Django, ORM, кэш) в пуле потоков ASYNC_DB_THREADS. Цикл событий в это время обслуживает другие запросы.
+    '''
+    return await sync_to_async(func, thread_sensitive=False, executor=_db_executor)(*args, **kwargs)
+
+
+def async_action(match, method):
+    view = getattr(match.func, 'cls', None)
+    actions = getattr(match.func, 'actions', None)
+    # an APIView has no actions, its handler is named after the method
+    action = actions.get(method.lower()) if actions else method.lower()
+    return (view, action) in ASYNC_ACTIONS
+
+
+def _db_call(func, *args, **kwargs):
+    # the same connection handling as for a WSGI request (request_started / request_finished)
+    close_old_connections()
+    check_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        mark_used()
+        close_old_connections()
+
+
+async def wait_for_items(store, after=None, limit=None, timeout=0):
+    '''
+    Long polling ленты магазина в цикле событий (см. backend_code.vendor_feed.poll_items): паузы выдерживаются asyncio.sleep, проверки кэша и запросы к БД выполняются в пуле потоков ASYNC_DB_THREADS, поэтому ожидающий клиент не занимает поток.
+    '''
+    polling = poll_items(store, after, limit, timeout)
+    while True:
+        pause, result = await in_pool(_db_call, poll_step, polling)
+        if result is not None:
+            return result
+        await asyncio.sleep(pause)
+
+
+async def event_stream(store, after=None, duration=None):
+    '''
+    Поток Server-Sent Events ленты магазина в цикле событий: то же содержимое, что у backend_code.vendor_feed.event_stream.
+    '''
+    deadline = time.monotonic() + (settings.VENDOR_FEED_STREAM_SECONDS if duration is None else duration)
+    yield f'retry: {settings.VENDOR_FEED_RETRY_MS}\n\n'
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        items, after = await wait_for_items(store, after, None, min(settings.VENDOR_FEED_KEEPALIVE_SECONDS, remaining))
+        if not items:
+            yield ': keep-alive\n\n'
+        else:
+            yield await in_pool(render_events, items)
+
+
+def render_events(items):
+    return ''.join(feed_event(item) for item in items)
+
+
+def render_feed(items, cursor):
+    return JSONRenderer().render({'results': VendorOrderItemSerializer(items, many=True).data, 'next': cursor})
+
+
+class PoolHandler(BaseHandler):
+    '''
+    Обработчик запросов к ASYNC_ACTIONS: тот же набор промежуточных слоев settings.MIDDLEWARE, что и у WSGI-приложения (проверка хоста, соединения с БД, привязка к основной БД, метрики, профилирование, статистика SQL), и то же представление, поэтому ответы не отличаются. Запросы обрабатываются параллельно в пуле потоков ASYNC_DB_THREADS, а не по одному в потоке WsgiToAsgi.
+    '''
+
+    def __init__(self):
+        super().__init__()
+        self.load_middleware()
+
+    def handle(self, environ):
+        # the steps of WSGIHandler.__call__, the response body is sent by the event loop
+        set_script_prefix(get_script_name(environ))
+        signals.request_started.send(sender=self.__class__, environ=environ)
+        request = WSGIRequest(environ)
+        response = self.get_response(request)
+        if response.streaming:
+            response = buffered_response(response)
+        # request_finished: connections past CONN_MAX_AGE are closed
+        response.close()
+        return response
+
+
+def buffered_response(response):
+    # a streaming response cannot get a content, the chunks go to an HttpResponse with the same status, headers and cookies
+    buffered = HttpResponse(b''.join(response.streaming_content), status=response.status_code)
+    for name, value in response.items():
+        buffered[name] = value
+    buffered.cookies = response.cookies
+    # files of a FileResponse are closed with the buffered response
+    buffered._closable_objects.extend(response._closable_objects)
+    return buffered
+
+
+def build_environ(scope, body):
+    '''
+    WSGI environ из ASGI scope: для запросов к ASYNC_ACTIONS создается обычный WSGIRequest.
+    '''
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf8').decode('latin1'),
+        'PATH_INFO': scope['path'].encode('utf8').decode('latin1'),
+        'QUERY_STRING': scope['query_string'].decode('ascii'),
+        'SERVER_PROTOCOL': f'HTTP/{scope["http_version"]}',
+        'SERVER_NAME': scope['server'][0] if scope.get('server') else 'localhost',
+        'SERVER_PORT': str(scope['server'][1]) if scope.get('server') else '80',
+        'REMOTE_ADDR': scope['client'][0] if scope.get('client') else '',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1').upper().replace('-', '_')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        value = value.decode('latin1')
+        environ[name] = f'{environ[name]},{value}' if name in environ and name.startswith('HTTP_') else value
+    return environ
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+def response_headers(response):
+    headers = [(name.lower().encode('latin1'), str(value).encode('latin1')) for name, value in response.items()]
+    return headers + [(b'set-cookie', cookie.output(header='').strip().encode('latin1')) for cookie in response.cookies.values()]
+
+
+async def send_response(send, response):
+    headers = response_headers(response)
+    if not response.has_header('Content-Length'):
+        headers.append((b'content-length', str(len(response.content)).encode('ascii')))
+    await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': response.content})
+
+
+async def send_stream(send, response):
+    await send({'type': 'http.response.start', 'status': response.status_code, 'headers': response_headers(response)})
+    async for chunk in event_stream(response.store, response.after):
+        await send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def until_disconnect(receive, sending):
+    '''
+    Отправка ответа sending до конца или до отключения клиента: ожидание ленты прерывается, как только клиент закрыл соединение.
+    '''
+    sending = asyncio.ensure_future(sending)
+    disconnect = asyncio.ensure_future(receive())
+    await asyncio.wait({sending, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+    for task in (sending, disconnect):
+        task.cancel()
+    if sending.done() and not sending.cancelled():
+        sending.result()
+
+
+class AsgiRouter:
+    '''
+    ASGI-приложение: GET-запросы к маршрутам из ASYNC_ACTIONS обрабатываются PoolHandler в пуле потоков, остальные - WSGI-приложением Django через WsgiToAsgi (как и под gunicorn, по одному запросу за раз в процессе). Ожидание новых позиций ленты заказов магазина (wait, stream) идет в цикле событий и не занимает ни поток пула, ни поток WsgiToAsgi. Маршруты определяются urls.py, отдельной таблицы нет.
+    '''
+
+    def __init__(self, wsgi_application):
+        self.wsgi_application = wsgi_application
+        self.handler = PoolHandler()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http' or scope['method'] != 'GET':
+            return await self.wsgi_application(scope, receive, send)
+        try:
+            match = resolve(scope['path'])
+        except Resolver404:
+            return await self.wsgi_application(scope, receive, send)
+        if not async_action(match, scope['method']):
+            return await self.wsgi_application(scope, receive, send)
+
+        body = await read_body(receive)
+        if body is None:
+            return
+        environ = build_environ(scope, body)
+        environ[ASYNC_WAIT_KEY] = True
+        response = await in_pool(self.handler.handle, environ)
+        if isinstance(response, FeedWait):
+            await until_disconnect(receive, self.send_feed(send, response))
+        else:
+            await send_response(send, response)
+
+    async def send_feed(self, send, response):
+        # the view has checked the request, the feed is awaited here and not in a pool thread
+        if response.has_header('Content-Length'):
+            # set by CommonMiddleware for the empty body
+            del response['Content-Length']
+        if response.stream:
+            return await send_stream(send, response)
+        items, cursor = await wait_for_items(response.store, response.after, response.limit, response.wait)
+        response.content = await in_pool(render_feed, items, cursor)
+        await send_response(send, response)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                _db_executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
@@ -0,0 +1,149 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Max, Sum
+
+from backend_code.delivery import delivery_price
+from backend_code.models import Basket, Product
+
+BASKET_OPERATIONS = ('set', 'increment', 'remove')
+
+
+class BasketError(Exception):
+    '''
+    Ошибка изменения корзины. Содержит описание ошибки и HTTP-статус, с которым view возвращает ответ.
+    '''
+
+    def __init__(self, error, status):
+        super().__init__(error)
+        self.error = error
+        self.status = status
+
+
+def parse_operations(items):
+    '''
+    Проверка списка операций с корзиной: [{'stock_number': ..., 'amount': ..., 'op': 'set' | 'increment' | 'remove'}]. По умолчанию op = 'set'.
+    '''
+    if not isinstance(items, list) or not items:
+        raise BasketError('Please provide a list of basket items', 401)
+    operations = []
+    for item in items:
+        if not isinstance(item, dict) or 'stock_number' not in item:
+            raise BasketError('Invalid data', 401)
+        op = item.get('op', 'set')
+        if op not in BASKET_OPERATIONS:
+            raise BasketError(f'Unknown basket operation: {op}', 401)
+        try:
+            stock_number = int(item['stock_number'])
+            amount = int(item['amount']) if op != 'remove' else 0
+        except (KeyError, TypeError, ValueError):
+            raise BasketError('Invalid data', 401)
+        if op != 'remove' and amount < 1:
+            raise BasketError('Invalid data', 401)
+        operations.append((stock_number, op, amount))
+    return operations
+
+
+def _collapse(operations):
+    # reduce several operations on one product to a single write, in request order
+    plan = {}
+    for stock_number, op, amount in operations:
+        previous = plan.get(stock_number)
+        if op == 'increment' and previous and previous[0] != 'remove':
+            plan[stock_number] = (previous[0], previous[1] + amount)
+        elif op == 'increment' and previous:
+            plan[stock_number] = ('set', amount)
+        else:
+            plan[stock_number] = (op, amount)
+    return plan
+
+
+def apply_operations(customer, operations):
+    '''
+    Применение пакета операций к корзине пользователя: товары и магазины определяются одним запросом, изменения записываются одним INSERT ... ON CONFLICT на каждый тип операции и одним DELETE для удаления. Пакет применяется целиком или не применяется совсем.
+    '''
+    plan = _collapse(operations)
+    products = {stock_number: (product_id, store_id, store_status) for stock_number, product_id, store_id, store_status in
+                Product.objects.filter(stock_number__in=plan.keys()).values_list('stock_number', 'id', 'delivery_store', 'delivery_store__status')}
+    missing = [stock_number for stock_number, (op, _) in plan.items() if op != 'remove' and not (stock_number in products and products[stock_number][2])]
+    if missing:
+        raise BasketError({'Product or store not found': missing}, 404)
+
+    rows = {'set': [], 'increment': []}
+    removed = []
+    for stock_number, (op, amount) in plan.items():
+        if op == 'remove':
+            if stock_number in products:
+                removed.append(products[stock_number][0])
+        else:
+            product_id, store_id, _ = products[stock_number]
+            rows[op].append((customer.id, product_id, store_id, amount))
+
+    with transaction.atomic():
+        if removed:
+            Basket.objects.filter(b_customer=customer, b_product__in=removed).delete()
+        if rows['set']:
+            Basket.objects.bulk_upsert(rows['set'])
+        if rows['increment']:
+            Basket.objects.bulk_upsert(rows['increment'], increment=True)
+        invalidate_basket_quote(customer.id)
+
+
+def customer_basket(customer):
+    '''
+    Корзина пользователя со всеми связанными объектами, необходимыми для BasketSerializer.
+    '''
+    return Basket.objects.filter(b_customer=customer).select_related('b_customer', 'b_product', 'b_vendor__vendor_id').prefetch_related('b_vendor__cats').order_by('id')
+
+
+def _basket_quote_key(customer_id):
+    return f'basket-quote:{customer_id}'
+
+
+def invalidate_basket_quote(customer_id):
+    '''
+    Сброс кэша расчета корзины. Вызывается при любом изменении корзины, после фиксации транзакции.
+    '''
+    transaction.on_commit(lambda: cache.delete(_basket_quote_key(customer_id)))
+
+
+def invalidate_store_basket_quotes(store):
+    '''
+    Сброс кэша расчета всех корзин, в которых есть товары магазина (например, после изменения номинальной стоимости доставки).
+    '''
+    customer_ids = list(Basket.objects.filter(b_vendor=store).values_list('b_customer', flat=True).distinct())
+    transaction.on_commit(lambda: cache.delete_many([_basket_quote_key(customer_id) for customer_id in customer_ids]))
+
+
+def invalidate_product_basket_quotes(product_ids):
+    '''
+    Сброс кэша расчета всех корзин с указанными товарами (после изменения цены или класса габаритов, удаления товара).
+    '''
+    customer_ids = list(Basket.objects.filter(b_product__in=product_ids).values_list('b_customer', flat=True).distinct())
+    transaction.on_commit(lambda: cache.delete_many([_basket_quote_key(customer_id) for customer_id in customer_ids]))
+
+
+def basket_quote(customer):
+    '''
+    Расчет корзины: количество позиций и единиц товара, общая стоимость (цена * количество) и стоимость обычной и экспресс-доставки. Итоги считаются одним агрегирующим запросом (Basket JOIN Product JOIN Store) и кэшируются для пользователя на BASKET_QUOTE_CACHE_TIMEOUT секунд.
+    '''
+    key = _basket_quote_key(customer.id)
+    totals = cache.get(key)
+    if totals is None:
+        totals = Basket.objects.filter(b_customer=customer).aggregate(
+            lines=Count('id'),
+            item_count=Sum('amount'),
+            total_price=Sum(F('amount') * F('b_product__price')),
+            nominal_delivery_price=Max('b_vendor__nominal_delivery_price'),
+            weight_class=Max('b_product__weight_class'))
+        cache.set(key, totals, settings.BASKET_QUOTE_CACHE_TIMEOUT)
+    if not totals['lines']:
+        return {'lines': 0, 'item_count': 0, 'total_price': 0, 'standard_delivery_price': 0, 'express_delivery_price': 0}
+    # area code is applied on read, so a changed customer address never needs the cache
+    return {
+        'lines': totals['lines'],
+        'item_count': totals['item_count'],
+        'total_price': totals['total_price'],
+        'standard_delivery_price': delivery_price(customer.area_code, totals['nominal_delivery_price'], totals['weight_class'], False),
+        'express_delivery_price': delivery_price(customer.area_code, totals['nominal_delivery_price'], totals['weight_class'], True),
+    }
@@ -0,0 +1,89 @@
+from django.db import transaction
+
+from backend_code.basket import invalidate_basket_quote
+from backend_code.delivery import delivery_price
+from backend_code.id_allocator import order_numbers
+from backend_code.models import Basket, OrderItems
+from backend_code.serializers import OrderSerializer
+from backend_code.stock import reserve_stock, InsufficientStock
+from backend_code.vendor_feed import assign_feed_positions, notify_vendor_feeds
+
+class CheckoutError(Exception):
+    '''
+    Ошибка оформления заказа. Содержит описание ошибки и HTTP-статус, с которым view возвращает ответ.
+    '''
+
+    def __init__(self, error, status):
+        super().__init__(error)
+        self.error = error
+        self.status = status
+
+
+def load_basket(customer):
+    '''
+    Загрузка корзины пользователя вместе с товарами и магазинами одним запросом (JOIN).
+    '''
+    return list(Basket.objects.filter(b_customer=customer).select_related('b_product', 'b_vendor'))
+
+
+def calculate_basket(basket_items, area_code, express_delivery):
+    '''
+    Расчет стоимости товаров и доставки за один проход по корзине. Стоимость доставки зависит от максимальной номинальной стоимости доставки поставщиков, максимального класса габаритов (weight_class), региона (area_code) и экспресс-доставки.
+    '''
+    total_price = 0
+    max_nominal_delivery = 0
+    max_weight_class = 0
+    for basket_item in basket_items:
+        total_price += basket_item.b_product.price * basket_item.amount
+        max_nominal_delivery = max(max_nominal_delivery, basket_item.b_vendor.nominal_delivery_price)
+        max_weight_class = max(max_weight_class, basket_item.b_product.weight_class)
+    return total_price, delivery_price(area_code, max_nominal_delivery, max_weight_class, express_delivery)
+
+
+def checkout(customer, express_delivery):
+    '''
+    Оформление заказа из корзины пользователя. Резервирование товара, заказ, все позиции заказа (bulk_create) и очистка корзины выполняются в одной транзакции, количество запросов к БД не зависит от размера корзины. Если какого-либо товара не хватает, заказ не создается.
+    '''
+    basket_items = load_basket(customer)
+    if not basket_items:
+        raise CheckoutError('Basket empty', 404)
+    if not customer.address:
+        raise CheckoutError('Please provide customer address', 401)
+
+    total_price, final_delivery_price = calculate_basket(basket_items, customer.area_code, express_delivery == 'True')
+    order_creation = OrderSerializer(data={
+        'order_customer': customer.id,
+        'order_number': order_numbers.next_id(),
+        'status': 'new',
+        'area_code': customer.area_code,
+        'total_price': total_price,
+        'final_delivery_price': final_delivery_price,
+        'express_delivery': express_delivery,
+    })
+    if not order_creation.is_valid():
+        raise CheckoutError(order_creation.errors, 401)
+
+    quantities = {}
+    for basket_item in basket_items:
+        quantities[basket_item.b_product_id] = quantities.get(basket_item.b_product_id, 0) + basket_item.amount
+
+    with transaction.atomic():
+        try:
+            reserve_stock(quantities)
+        except InsufficientStock as err:
+            raise CheckoutError({'Not enough stock': err.stock_numbers}, 409)
+        current_order = order_creation.save()
+        OrderItems.objects.bulk_create([
+            OrderItems(number_of_order=current_order,
+                       order_product=basket_item.b_product,
+                       order_prod_vendor=str(basket_item.b_vendor),
+                       order_vendor=basket_item.b_vendor,
+                       order_prod_amount=basket_item.amount)
+            for basket_item in basket_items])
+        # remove only the basket rows that went into the order
+        Basket.objects.filter(id__in=[basket_item.id for basket_item in basket_items]).delete()
+        invalidate_basket_quote(customer.id)
+        # last statement of the transaction: the feed counter stays locked only until the commit
+        assign_feed_positions(OrderItems.objects.filter(number_of_order=current_order))
+        notify_vendor_feeds(basket_item.b_vendor_id for basket_item in basket_items)
+    return current_order, order_creation.data
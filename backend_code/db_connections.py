@@ -0,0 +1,51 @@
+import time
+
+from celery import signals
+from django.conf import settings
+from django.db import connections
+
+
+def check_connections():
+    '''
+    Проверка постоянных соединений перед использованием (CONN_MAX_AGE > 0): соединение, простаивавшее DB_HEALTH_CHECK_IDLE секунд и более, проверяется запросом, и если оно разорвано (перезапуск Postgres или pgbouncer, таймаут простоя), закрывается - следующий запрос к БД откроет новое. Соединения, использованные недавно, не проверяются, поэтому на частых запросах проверка ничего не стоит.
+    '''
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        if now - getattr(connection, 'last_used', 0) >= settings.DB_HEALTH_CHECK_IDLE and not connection.is_usable():
+            connection.close()
+
+
+def mark_used():
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is not None:
+            connection.last_used = now
+
+
+class ConnectionHealthMiddleware:
+    '''
+    Проверка соединений с БД перед обработкой запроса (см. check_connections).
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        check_connections()
+        try:
+            return self.get_response(request)
+        finally:
+            mark_used()
+
+
+# celery closes obsolete connections around every task itself (CONN_MAX_AGE), broken ones are left to this check
+@signals.task_prerun.connect
+def _check_task_connections(**kwargs):
+    check_connections()
+
+
+@signals.task_postrun.connect
+def _mark_task_connections(**kwargs):
+    mark_used()
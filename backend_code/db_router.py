@@ -0,0 +1,158 @@
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, DatabaseError
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# replication lag in seconds, 0 when the replica has replayed everything it received
+LAG_QUERIES = {
+    'postgresql': 'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+                  'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END',
+}
+
+# None outside of requests (celery tasks, management commands): everything goes to the primary
+_read_from_primary = ContextVar('read_from_primary', default=None)
+
+
+def replica_lag(alias):
+    # a backend without replication (SQLite stand-ins) never lags
+    query = LAG_QUERIES.get(connections[alias].vendor)
+    if query is None:
+        return 0
+    with connections[alias].cursor() as cursor:
+        cursor.execute(query)
+        lag = cursor.fetchone()[0]
+    # NULL: the replica has not replayed any transaction yet
+    return float('inf') if lag is None else float(lag)
+
+
+class ReplicaMonitor:
+    '''
+    Реплики, доступные для чтения: задержка репликации каждой реплики проверяется не чаще раза в REPLICA_LAG_CHECK_INTERVAL секунд (в каждом процессе), реплика с задержкой больше REPLICA_MAX_LAG_SECONDS или недоступная исключается из ротации до следующей успешной проверки.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked = {}
+        self._healthy = {}
+
+    def healthy(self):
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            for alias in settings.DATABASE_REPLICAS:
+                if now - self._checked.get(alias, float('-inf')) >= settings.REPLICA_LAG_CHECK_INTERVAL:
+                    # other threads keep the previous state while this one checks
+                    self._checked[alias] = now
+                    due.append(alias)
+        for alias in due:
+            self._healthy[alias] = self.check(alias)
+        return [alias for alias in settings.DATABASE_REPLICAS if self._healthy.get(alias)]
+
+    def check(self, alias):
+        try:
+            lag = replica_lag(alias)
+        except DatabaseError as err:
+            logger.warning('Replica %s is out of rotation: %s', alias, err)
+            return False
+        if lag > settings.REPLICA_MAX_LAG_SECONDS:
+            logger.warning('Replica %s is out of rotation: %.1f s behind', alias, lag)
+            return False
+        return True
+
+    def reset(self):
+        with self._lock:
+            self._checked = {}
+            self._healthy = {}
+
+
+monitor = ReplicaMonitor()
+
+
+class ReplicaRouter:
+    '''
+    Записи - в основную БД (default), безопасные запросы на чтение - в реплики DATABASE_REPLICAS. Чтение идет в основную БД внутри транзакции (в том числе select_for_update), в небезопасных запросах (POST, PATCH, DELETE), у клиента, недавно изменившего данные (см. ReplicaRoutingMiddleware), вне HTTP-запросов (задачи celery) и когда все реплики отстают.
+    '''
+
+    def db_for_read(self, model, **hints):
+        if _read_from_primary.get() is not False or connections['default'].in_atomic_block:
+            return 'default'
+        replicas = monitor.healthy()
+        return random.choice(replicas) if replicas else 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same data as the primary
+        aliases = ['default'] + list(settings.DATABASE_REPLICAS)
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+@contextmanager
+def read_routing(from_primary):
+    token = _read_from_primary.set(from_primary)
+    try:
+        yield
+    finally:
+        _read_from_primary.reset(token)
+
+
+def client_key(request):
+    '''
+    Клиент запроса для привязки к основной БД: API определяет покупателя по email_login в теле запроса (JSON или форма) или в строке запроса. Для анонимных запросов - None.
+    '''
+    email = request.GET.get('email_login')
+    if not email and request.method == 'POST' and request.content_type in ('multipart/form-data', 'application/x-www-form-urlencoded'):
+        email = request.POST.get('email_login')
+    elif not email and request.content_type == 'application/json' and request.body:
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return None
+        email = data.get('email_login') if isinstance(data, dict) else None
+    if not isinstance(email, str) or not email:
+        return None
+    return 'replica-pin:' + hashlib.sha1(email.lower().encode()).hexdigest()
+
+
+def reads_from_primary(request, key):
+    return request.method not in SAFE_METHODS or bool(key and cache.get(key))
+
+
+def pin_client(request, response, key):
+    # a client that has just written reads its own writes from the primary for REPLICA_PIN_SECONDS
+    if key and request.method not in SAFE_METHODS and response.status_code < 400:
+        cache.set(key, True, settings.REPLICA_PIN_SECONDS)
+
+
+class ReplicaRoutingMiddleware:
+    '''
+    Чтение своих записей: после успешного изменяющего запроса клиента его запросы на чтение REPLICA_PIN_SECONDS секунд идут в основную БД, поэтому корзина и новые заказы не читаются с отстающей реплики. Без настроенных реплик ничего не делает.
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        # the body is read before the view consumes the stream
+        key = client_key(request)
+        with read_routing(reads_from_primary(request, key)):
+            response = self.get_response(request)
+        pin_client(request, response, key)
+        return response
@@ -0,0 +1,68 @@
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, Max, PositiveIntegerField, Value, When
+
+from backend_code.models import Basket, OrderItems
+
+EXPRESS_DELIVERY_MULTIPLIER = 3
+QUOTE_PAGE_SIZE = 1000
+QUOTE_MAX_PAGE_SIZE = 10000
+
+
+def delivery_price(area_code, nominal_delivery_price, weight_class, express_delivery):
+    '''
+    Стоимость доставки заказа: регион (area_code) * максимальная номинальная стоимость доставки поставщиков * максимальный класс габаритов * коэффициент экспресс-доставки.
+    '''
+    express = EXPRESS_DELIVERY_MULTIPLIER if express_delivery else 1
+    return int(area_code) * int(nominal_delivery_price) * int(weight_class) * express
+
+
+def _nominal_price(store_field, nominal_prices):
+    # tariff table {store_id: nominal price} overrides the stored price of the listed stores
+    current_price = F(f'{store_field}__nominal_delivery_price')
+    if not nominal_prices:
+        return current_price
+    return Case(*[When(**{store_field: int(store_id)}, then=Value(price)) for store_id, price in nominal_prices.items()],
+                default=current_price, output_field=DecimalField(max_digits=10, decimal_places=2))
+
+
+def _delivery(express):
+    return ExpressionWrapper(F('area_code') * F('nominal_delivery_price') * F('weight_class') * express,
+                             output_field=DecimalField(max_digits=20, decimal_places=2))
+
+
+def _page(quotes, key, after, limit):
+    if after is not None:
+        quotes = quotes.filter(**{f'{key}__gt': after})
+    return quotes.order_by(key)[:min(limit or QUOTE_PAGE_SIZE, QUOTE_MAX_PAGE_SIZE)]
+
+
+def quote_baskets(customer_ids=None, nominal_prices=None, express_delivery=False, after=None, limit=None):
+    '''
+    Пакетный расчет стоимости доставки для всех открытых корзин (или корзин указанных пользователей) одним агрегирующим запросом: группировка по пользователю, максимумы номинальной стоимости доставки и класса габаритов и сама формула считаются в БД. nominal_prices - таблица тарифов {store_id: цена} для моделирования изменения номинальной стоимости доставки. Результат отдается страницами по пользователю (after - id последнего пользователя предыдущей страницы).
+    '''
+    baskets = Basket.objects.all()
+    if customer_ids is not None:
+        baskets = baskets.filter(b_customer__in=customer_ids)
+    quotes = baskets.values('b_customer').annotate(
+        area_code=Max('b_customer__area_code'),
+        nominal_delivery_price=Max(_nominal_price('b_vendor', nominal_prices)),
+        weight_class=Max('b_product__weight_class'),
+    ).annotate(delivery_price=_delivery(EXPRESS_DELIVERY_MULTIPLIER if express_delivery else 1))
+    return _page(quotes, 'b_customer', after, limit)
+
+
+def quote_orders(order_ids=None, nominal_prices=None, after=None, limit=None):
+    '''
+    Пакетный пересчет стоимости доставки заказов (по текущим или смоделированным тарифам) одним агрегирующим запросом по позициям заказов. Для сравнения возвращается и фактическая стоимость доставки заказа.
+    '''
+    items = OrderItems.objects.order_by()
+    if order_ids is not None:
+        items = items.filter(number_of_order__in=order_ids)
+    quotes = items.values('number_of_order').annotate(
+        order_number=Max('number_of_order__order_number'),
+        area_code=Max('number_of_order__area_code'),
+        express=Max(Case(When(number_of_order__express_delivery=True, then=Value(EXPRESS_DELIVERY_MULTIPLIER)), default=Value(1), output_field=PositiveIntegerField())),
+        nominal_delivery_price=Max(_nominal_price('order_product__delivery_store', nominal_prices)),
+        weight_class=Max('order_product__weight_class'),
+        final_delivery_price=Max('number_of_order__final_delivery_price'),
+    ).annotate(delivery_price=_delivery(F('express')))
+    return _page(quotes, 'number_of_order', after, limit)
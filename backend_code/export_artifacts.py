@@ -0,0 +1,100 @@
+import gzip
+import json
+import os
+import time
+
+import yaml
+from django.conf import settings
+from django.core import signing
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.urls import reverse
+
+from backend_code.models import Store
+
+EXPORT_SIGNING_SALT = 'backend_code.export-download'
+
+
+def bump_catalog_version(store_ids):
+    '''
+    Новая версия каталога магазинов: сохраненные выгрузки прежней версии больше не используются.
+    '''
+    Store.objects.filter(id__in=store_ids).update(catalog_version=F('catalog_version') + 1)
+
+
+def artifact_path(store_id, version):
+    return os.path.join(settings.EXPORT_ROOT, f'{store_id}-{version}.yaml.gz')
+
+
+def _touch(path):
+    # last use is kept in atime (LRU), creation time in mtime (EXPORT_ARTIFACT_MAX_AGE)
+    os.utime(path, (time.time(), os.stat(path).st_mtime))
+
+
+def cached_artifact(store):
+    '''
+    Готовая выгрузка текущей версии каталога магазина, если она есть и не старше EXPORT_ARTIFACT_MAX_AGE (остатки товара в выгрузке - на момент ее создания).
+    '''
+    path = artifact_path(store.id, store.catalog_version)
+    try:
+        if time.time() - os.stat(path).st_mtime > settings.EXPORT_ARTIFACT_MAX_AGE:
+            return None
+        _touch(path)
+    except FileNotFoundError:
+        return None
+    return path
+
+
+def write_artifact(store, version, products, job):
+    '''
+    Запись выгрузки (yaml, gzip). Файл пишется под уникальным временным именем и атомарно переименовывается, поэтому одновременные выгрузки не повреждают друг друга. После записи старые выгрузки вытесняются (evict_artifacts).
+    '''
+    os.makedirs(settings.EXPORT_ROOT, exist_ok=True)
+    path = artifact_path(store.id, version)
+    temp_path = f'{path}.{job or os.getpid()}.tmp'
+    with gzip.open(temp_path, 'wt', encoding='utf-8') as file:
+        yaml.dump(json.dumps(products, cls=DjangoJSONEncoder), file)
+    os.replace(temp_path, path)
+    evict_artifacts(keep=path)
+    return path
+
+
+def evict_artifacts(keep=None):
+    '''
+    Удаление давно не использованных выгрузок (LRU), пока общий размер каталога выгрузок больше EXPORT_MAX_BYTES.
+    '''
+    artifacts = []
+    with os.scandir(settings.EXPORT_ROOT) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith('.yaml.gz'):
+                stat = entry.stat()
+                artifacts.append((stat.st_atime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in artifacts)
+    for _, size, path in sorted(artifacts):
+        if total <= settings.EXPORT_MAX_BYTES:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def download_url(domain, store, version):
+    '''
+    Подписанная ссылка на выгрузку, действительна EXPORT_LINK_MAX_AGE секунд.
+    '''
+    token = signing.dumps({'store': store.id, 'version': version}, salt=EXPORT_SIGNING_SALT)
+    return f'http://{domain}{reverse("backend_code:export_download", args=[token])}'
+
+
+def artifact_from_token(token):
+    '''
+    Путь к выгрузке по подписанной ссылке. signing.SignatureExpired - срок ссылки истек, signing.BadSignature - ссылка изменена, FileNotFoundError - выгрузка уже удалена.
+    '''
+    payload = signing.loads(token, salt=EXPORT_SIGNING_SALT, max_age=settings.EXPORT_LINK_MAX_AGE)
+    path = artifact_path(payload['store'], payload['version'])
+    _touch(path)
+    return path
@@ -0,0 +1,64 @@
+import os
+import threading
+
+from django.db import connections, transaction
+from django.db.models import F
+
+from backend_code.models import IdSequence
+
+# every process must use the same block size, otherwise reserved ranges overlap
+ID_BLOCK_SIZE = 1000
+# public ids live in [2 ** 30, 2 ** 31): they fit PositiveIntegerField and stay clear of small manually chosen ids
+ID_SPACE = 2 ** 30
+ID_OFFSET = 2 ** 30
+# odd multiplier and xor key: a bijection on [0, ID_SPACE), so consecutive sequence values map to scattered unique ids
+ID_MULTIPLIER = 0x2545F491
+ID_XOR_KEY = 0x15A4E35
+
+
+def scramble(value):
+    return ID_OFFSET + (((value * ID_MULTIPLIER) % ID_SPACE) ^ ID_XOR_KEY)
+
+
+class IdAllocator:
+    '''
+    Генератор уникальных идентификаторов по схеме hi/lo. Из последовательности БД резервируется блок из ID_BLOCK_SIZE номеров (hi), затем номера выдаются из блока в памяти процесса без обращения к БД (lo). На PostgreSQL используется нативная последовательность (не откатывается вместе с транзакцией), на других БД - таблица IdSequence (только для разработки и тестов: блок, зарезервированный в откатившейся транзакции, может быть выдан повторно).
+    '''
+
+    def __init__(self, name, using='default'):
+        self.name = name
+        self.using = using
+        self._lock = threading.Lock()
+        self._pid = None
+        self._next = 0
+        self._end = 0
+
+    def next_id(self):
+        with self._lock:
+            # a forked worker must not reuse the block cached by its parent
+            if self._pid != os.getpid() or self._next >= self._end:
+                hi = self._reserve_block()
+                self._pid = os.getpid()
+                self._next, self._end = hi * ID_BLOCK_SIZE, (hi + 1) * ID_BLOCK_SIZE
+            value = self._next
+            self._next += 1
+        if value >= ID_SPACE:
+            raise RuntimeError(f'Id sequence {self.name} exhausted')
+        return scramble(value)
+
+    def _reserve_block(self):
+        connection = connections[self.using]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT nextval(%s)', [f'backend_code_id_{self.name}'])
+                return cursor.fetchone()[0]
+        with transaction.atomic(using=self.using):
+            IdSequence.objects.using(self.using).get_or_create(name=self.name)
+            IdSequence.objects.using(self.using).filter(name=self.name).update(last_block=F('last_block') + 1)
+            return IdSequence.objects.using(self.using).get(name=self.name).last_block
+
+
+order_numbers = IdAllocator('order_number')
+vendor_ids = IdAllocator('seller_vendor_id')
+store_category_ids = IdAllocator('store_cat_id')
+product_category_ids = IdAllocator('prod_cat_id')
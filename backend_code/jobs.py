@@ -0,0 +1,49 @@
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _job_key(kind, vendor):
+    return f'vendor-job:{kind}:{vendor}'
+
+
+def start_vendor_job(kind, vendor, enqueue):
+    '''
+    Запуск задачи kind (import, export) для поставщика не более чем в одном экземпляре. Пока задача поставщика стоит в очереди или выполняется, повторный запрос присоединяется к ней и новая задача не создается. Блокировка - ключ в общем кэше с ограниченным сроком (lease), поэтому задача упавшего обработчика не блокирует поставщика навсегда. enqueue(job) ставит задачу в очередь. Возвращает идентификатор задачи и признак присоединения к уже запущенной.
+    '''
+    key = _job_key(kind, vendor)
+    while True:
+        job = uuid.uuid4().hex
+        if cache.add(key, job, settings.VENDOR_JOB_QUEUED_LEASE):
+            try:
+                enqueue(job)
+            except Exception:
+                cache.delete(key)
+                raise
+            return job, False
+        current = cache.get(key)
+        # the lease may expire between add and get: then try to take it again
+        if current is not None:
+            return current, True
+
+
+@contextmanager
+def vendor_job_lease(kind, vendor, job):
+    '''
+    Выполнение задачи под блокировкой поставщика. В начале работы срок блокировки продлевается до VENDOR_JOB_RUNNING_LEASE (больше максимального времени выполнения задачи), по завершении блокировка снимается. Если блокировкой уже владеет другая задача (срок блокировки истек, пока задача стояла в очереди), контекст возвращает False и задача не выполняется. Задачи без идентификатора (job=None) выполняются без блокировки.
+    '''
+    if job is None:
+        yield True
+        return
+    key = _job_key(kind, vendor)
+    current = cache.get(key)
+    owned = current == job or (current is None and cache.add(key, job, settings.VENDOR_JOB_RUNNING_LEASE))
+    if owned:
+        cache.set(key, job, settings.VENDOR_JOB_RUNNING_LEASE)
+    try:
+        yield owned
+    finally:
+        if owned and cache.get(key) == job:
+            cache.delete(key)
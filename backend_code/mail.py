@@ -0,0 +1,111 @@
+import json
+import smtplib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from backend_code.models import QueuedEmail
+
+# the recipient or the sender is rejected: retrying the same message will not help
+PERMANENT_SMTP_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused)
+
+
+def queue_mail(subject, body, from_email, to, file_path=None):
+    '''
+    Постановка письма в очередь отправки (таблица QueuedEmail). Письма отправляет deliver_mail.
+    '''
+    return QueuedEmail.objects.create(subject=subject, body=body, from_email=from_email, recipients=json.dumps(list(to)), attachment=file_path)
+
+
+def queue_mail_batch(messages):
+    '''
+    Постановка пачки писем (subject, body, from_email, to) в очередь одним INSERT.
+    '''
+    return QueuedEmail.objects.bulk_create([QueuedEmail(subject=subject, body=body, from_email=from_email, recipients=json.dumps(list(to)))
+                                            for subject, body, from_email, to in messages])
+
+
+def retry_delay(attempts):
+    # exponential backoff: MAIL_RETRY_BACKOFF, 2 * MAIL_RETRY_BACKOFF, ... up to MAIL_RETRY_BACKOFF_MAX seconds
+    return min(settings.MAIL_RETRY_BACKOFF * 2 ** (attempts - 1), settings.MAIL_RETRY_BACKOFF_MAX)
+
+
+def claim_batch(batch_size):
+    '''
+    Выборка пачки писем, срок отправки которых наступил. Письма забираются в короткой транзакции: следующая попытка переносится на MAIL_SEND_LEASE секунд вперед, поэтому другие обработчики их не возьмут, а письма упавшего обработчика будут отправлены повторно после истечения срока.
+    '''
+    now = timezone.now()
+    with transaction.atomic():
+        claimed = list(QueuedEmail.objects.select_for_update(skip_locked=True)
+                       .filter(status='queued', next_attempt__lte=now).order_by('id')[:batch_size])
+        if claimed:
+            QueuedEmail.objects.filter(id__in=[queued.id for queued in claimed]).update(
+                attempts=F('attempts') + 1, next_attempt=now + timedelta(seconds=settings.MAIL_SEND_LEASE))
+    for queued in claimed:
+        queued.attempts += 1
+    return claimed
+
+
+def _message(queued, connection):
+    message = EmailMessage(queued.subject, queued.body, queued.from_email, json.loads(queued.recipients), connection=connection)
+    if queued.attachment:
+        message.attach_file(queued.attachment)
+    return message
+
+
+def send_batch(connection, claimed):
+    '''
+    Отправка пачки писем через одно открытое SMTP-соединение. Отправленные письма удаляются из очереди, для остальных назначается следующая попытка с экспоненциальной задержкой; после MAIL_MAX_ATTEMPTS попыток (или если адрес отклонен сервером) письмо помечается как failed. Если отправка прервана (ограничение времени задачи, неожиданная ошибка), уже отправленные письма все равно удаляются, а неотправленные остаются за обработчиком до истечения MAIL_SEND_LEASE. Возвращает количество отправленных писем.
+    '''
+    sent = []
+    retried = []
+    try:
+        for queued in claimed:
+            try:
+                connection.open()
+                if connection.send_messages([_message(queued, connection)]):
+                    sent.append(queued.id)
+                    continue
+                error = 'Message not accepted'
+            except (smtplib.SMTPException, OSError) as err:
+                error = repr(err)
+                # a broken connection is reopened for the next message
+                connection.close()
+                if isinstance(err, PERMANENT_SMTP_ERRORS):
+                    queued.attempts = settings.MAIL_MAX_ATTEMPTS
+            queued.last_error = error
+            queued.status = 'failed' if queued.attempts >= settings.MAIL_MAX_ATTEMPTS else 'queued'
+            queued.next_attempt = timezone.now() + timedelta(seconds=retry_delay(queued.attempts))
+            retried.append(queued)
+    finally:
+        # sent messages leave the queue even when the batch is interrupted, otherwise they go out again after the lease
+        QueuedEmail.objects.filter(id__in=sent).delete()
+        QueuedEmail.objects.bulk_update(retried, ['status', 'attempts', 'next_attempt', 'last_error'])
+    return len(sent)
+
+
+def deliver_mail(batch_size=None):
+    '''
+    Отправка писем из очереди, срок отправки которых наступил, пачками по MAIL_BATCH_SIZE через одно SMTP-соединение, не больше MAIL_BATCHES_PER_RUN пачек за вызов, чтобы задача укладывалась в ограничение времени; остаток отправит следующий вызов. Повторные попытки не ждут в обработчике: письмо остается в очереди до срока следующей попытки и отправляется следующим вызовом (задача deliver_mail_async запускается по расписанию). Возвращает количество отправленных писем.
+    '''
+    batch_size = batch_size or settings.MAIL_BATCH_SIZE
+    connection = None
+    delivered = 0
+    try:
+        for _ in range(settings.MAIL_BATCHES_PER_RUN):
+            claimed = claim_batch(batch_size)
+            if not claimed:
+                break
+            # the connection is opened only when there is something to send
+            connection = connection or get_connection()
+            delivered += send_batch(connection, claimed)
+            if len(claimed) < batch_size:
+                break
+    finally:
+        if connection:
+            connection.close()
+    return delivered
@@ -0,0 +1,24 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from backend_code.outbox import relay_outbox
+
+
+class Command(BaseCommand):
+    help = 'Relays tasks from the outbox table to the Celery broker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Relay everything that is due and exit')
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        while True:
+            relayed = relay_outbox(options['batch_size'])
+            if options['once']:
+                self.stdout.write(f'Relayed - {relayed}')
+                return
+            # a full pass means there may be more waiting: poll again at once
+            if not relayed:
+                time.sleep(settings.OUTBOX_POLL_INTERVAL)
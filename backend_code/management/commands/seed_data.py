@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from backend_code.synthetic_data import SeedPlan, seed_data
+
+
+class Command(BaseCommand):
+    help = 'Generates deterministic synthetic customers, stores, products, baskets and orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=100000)
+        parser.add_argument('--vendors', type=int, default=1000, help='The first customers are vendors with a store each')
+        parser.add_argument('--products', type=int, default=1000000)
+        parser.add_argument('--orders', type=int, default=1000000)
+        parser.add_argument('--baskets-per-customer', type=float, default=2, help='Mean number of basket items per customer')
+        parser.add_argument('--items-per-order', type=float, default=3, help='Mean number of items per order')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--workers', type=int, default=4, help='Loader processes, Postgres only')
+        parser.add_argument('--chunk-size', type=int, default=50000, help='Rows generated and loaded per transaction')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        plan = SeedPlan(options['customers'], options['vendors'], options['products'], options['orders'], options['baskets_per_customer'],
+                        options['items_per_order'], options['seed'])
+        loaded = seed_data(plan, options['workers'], options['chunk_size'], log=self.stdout.write)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'Loaded - {sum(loaded.values())} rows in {elapsed:.1f} s')
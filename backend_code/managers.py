@@ -1,4 +1,5 @@
 from django.contrib.auth.base_user import BaseUserManager
+from django.db import connections, models
 
 
 class CustomUserManager(BaseUserManager):
@@ -32,3 +33,26 @@ class CustomUserManager(BaseUserManager):
             raise ValueError('Superuser must have is_superuser=True.')
 
         return self._create_user(email_login, password, **extra_fields)
+
+
+class BasketManager(models.Manager):
+    upsert_batch_size = 200
+
+    def bulk_upsert(self, rows, increment=False):
+        '''
+        Вставка строк корзины (customer_id, product_id, vendor_id, amount) одним INSERT ... ON CONFLICT на пакет. У существующей строки (покупатель, товар) количество заменяется новым или, при increment, суммируется.
+        '''
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        opts = self.model._meta
+        table = qn(opts.db_table)
+        customer, product, vendor, amount = (qn(opts.get_field(name).column) for name in ('b_customer', 'b_product', 'b_vendor', 'amount'))
+        new_amount = f'{table}.{amount} + EXCLUDED.{amount}' if increment else f'EXCLUDED.{amount}'
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), self.upsert_batch_size):
+                batch = rows[start:start + self.upsert_batch_size]
+                values = ', '.join(['(%s, %s, %s, %s)'] * len(batch))
+                cursor.execute(
+                    f'INSERT INTO {table} ({customer}, {product}, {vendor}, {amount}) VALUES {values} '
+                    f'ON CONFLICT ({customer}, {product}) DO UPDATE SET {amount} = {new_amount}, {vendor} = EXCLUDED.{vendor}',
+                    [value for row in batch for value in row])
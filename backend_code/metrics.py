@@ -0,0 +1,229 @@
+import bisect
+import os
+import resource
+import socket
+import threading
+import time
+import tracemalloc
+
+from celery import signals
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+METRICS_PROCESSES_KEY = 'metrics:processes'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+TASK_BUCKETS = (0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 1800, 3600)
+MEMORY_BUCKETS = tuple(2 ** power for power in range(20, 32, 2))
+
+
+class Metric:
+    '''
+    Описание метрики в формате Prometheus: histogram (buckets - верхние границы интервалов) или counter.
+    '''
+
+    def __init__(self, name, help_text, buckets=None):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.kind = 'histogram' if buckets else 'counter'
+
+    def empty(self):
+        # histogram: a count per bucket, then the +Inf count, the sum and the total count
+        return [0] * (len(self.buckets) + 3) if self.buckets else [0]
+
+
+METRICS = {metric.name: metric for metric in (
+    Metric('http_request_duration_seconds', 'Request latency by route', LATENCY_BUCKETS),
+    Metric('celery_task_queue_wait_seconds', 'Time between publishing a task and its start', TASK_BUCKETS),
+    Metric('celery_task_runtime_seconds', 'Task run time by final state', TASK_BUCKETS),
+    Metric('celery_task_peak_memory_bytes', 'Peak memory of a task run (tracemalloc, or process RSS)', MEMORY_BUCKETS),
+    Metric('celery_task_rows_processed_total', 'Rows processed by tasks'),
+    Metric('celery_task_retries_total', 'Task retries'),
+)}
+
+
+class Registry:
+    '''
+    Метрики процесса в памяти: запись - это блокировка и несколько сложений, без обращений к сети. Накопленные значения раз в METRICS_FLUSH_INTERVAL секунд записываются в общий кэш под ключом процесса, /metrics суммирует значения всех процессов (веб-приложение и обработчики celery).
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._values = {}
+        self._flushed = 0
+
+    def _series(self, name, labels):
+        # a forked worker starts from zero instead of reporting its parent's values twice
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._values = {}
+            self._flushed = 0
+        key = (name, tuple(sorted(labels.items())))
+        if key not in self._values:
+            self._values[key] = METRICS[name].empty()
+        return self._values[key]
+
+    def observe(self, name, value, **labels):
+        buckets = METRICS[name].buckets
+        with self._lock:
+            series = self._series(name, labels)
+            series[bisect.bisect_left(buckets, value)] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def increment(self, name, amount=1, **labels):
+        with self._lock:
+            self._series(name, labels)[0] += amount
+
+    def process_key(self):
+        return f'metrics:process:{socket.gethostname()}:{os.getpid()}'
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._flushed < settings.METRICS_FLUSH_INTERVAL:
+                return
+            self._flushed = now
+            snapshot = {key: list(series) for key, series in self._values.items()}
+        key = self.process_key()
+        cache.set(key, snapshot, settings.METRICS_PROCESS_TIMEOUT)
+        processes = cache.get(METRICS_PROCESSES_KEY) or []
+        # concurrent flushes may drop a key from the index; it is added back on the next flush
+        if key not in processes:
+            cache.set(METRICS_PROCESSES_KEY, processes + [key], None)
+
+
+registry = Registry()
+
+
+def observe(name, value, **labels):
+    registry.observe(name, value, **labels)
+
+
+def increment(name, amount=1, **labels):
+    registry.increment(name, amount, **labels)
+
+
+def collect():
+    '''
+    Сумма метрик всех процессов. Процессы, не обновлявшие метрики дольше METRICS_PROCESS_TIMEOUT секунд, исключаются из списка.
+    '''
+    registry.flush(force=True)
+    processes = cache.get(METRICS_PROCESSES_KEY) or []
+    snapshots = cache.get_many(processes)
+    if len(snapshots) != len(processes):
+        cache.set(METRICS_PROCESSES_KEY, [key for key in processes if key in snapshots], None)
+    totals = {}
+    for snapshot in snapshots.values():
+        for key, series in snapshot.items():
+            if key[0] not in METRICS:
+                continue
+            total = totals.setdefault(key, METRICS[key[0]].empty())
+            for position, value in enumerate(series):
+                total[position] += value
+    return totals
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = ('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for name, value in pairs)
+    return '{' + ','.join(escaped) + '}'
+
+
+def render(totals):
+    '''
+    Текстовый формат Prometheus (version 0.0.4).
+    '''
+    lines = []
+    for name, metric in METRICS.items():
+        series = sorted((labels, values) for (metric_name, labels), values in totals.items() if metric_name == name)
+        if not series:
+            continue
+        lines.append(f'# HELP {name} {metric.help_text}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        for labels, values in series:
+            if metric.kind == 'counter':
+                lines.append(f'{name}{_labels(labels)} {values[0]}')
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets + ('+Inf',), values):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(labels, le=bound)} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {values[-2]}')
+            lines.append(f'{name}_count{_labels(labels)} {values[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    return HttpResponse(render(collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class RequestMetricsMiddleware:
+    '''
+    Гистограмма времени обработки запросов по маршруту (шаблон url, а не сам путь - число рядов не растет), методу и статусу ответа.
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        resolver_match = getattr(request, 'resolver_match', None)
+        route = resolver_match.route if resolver_match else 'unmatched'
+        observe('http_request_duration_seconds', time.perf_counter() - started, route=route, method=request.method, status=response.status_code)
+        registry.flush()
+        return response
+
+
+_task_state = threading.local()
+
+
+def record_rows(count):
+    '''
+    Учет строк, обработанных текущей задачей celery. Возвращает count.
+    '''
+    if getattr(_task_state, 'task', None):
+        increment('celery_task_rows_processed_total', count, task=_task_state.task)
+    return count
+
+
+@signals.before_task_publish.connect
+def _task_published(headers=None, **kwargs):
+    if headers is not None:
+        headers['published_at'] = time.time()
+
+
+@signals.task_prerun.connect
+def _task_started(task=None, **kwargs):
+    _task_state.task = task.name
+    _task_state.started = time.perf_counter()
+    published_at = getattr(task.request, 'published_at', None) or (getattr(task.request, 'headers', None) or {}).get('published_at')
+    if published_at:
+        observe('celery_task_queue_wait_seconds', max(time.time() - published_at, 0), task=task.name)
+    _task_state.tracing = settings.TASK_TRACEMALLOC and not tracemalloc.is_tracing()
+    if _task_state.tracing:
+        tracemalloc.start()
+
+
+@signals.task_postrun.connect
+def _task_finished(task=None, state=None, **kwargs):
+    observe('celery_task_runtime_seconds', time.perf_counter() - _task_state.started, task=task.name, state=state or 'UNKNOWN')
+    if _task_state.tracing:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    else:
+        # ru_maxrss is in kilobytes on Linux
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    observe('celery_task_peak_memory_bytes', peak, task=task.name)
+    _task_state.task = None
+    registry.flush()
+
+
+@signals.task_retry.connect
+def _task_retried(sender=None, **kwargs):
+    increment('celery_task_retries_total', task=sender.name)
@@ -0,0 +1,41 @@
+# Generated by Django 2.2.16 on 2026-10-19 15:41
+
+from django.db import migrations, models
+
+ID_SEQUENCES = ('order_number', 'seller_vendor_id', 'store_cat_id', 'prod_cat_id')
+
+
+def create_sequences(apps, schema_editor):
+    # PostgreSQL hands out id blocks from native (non-transactional) sequences
+    if schema_editor.connection.vendor == 'postgresql':
+        for name in ID_SEQUENCES:
+            schema_editor.execute(f'CREATE SEQUENCE IF NOT EXISTS backend_code_id_{name}')
+
+
+def drop_sequences(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for name in ID_SEQUENCES:
+            schema_editor.execute(f'DROP SEQUENCE IF EXISTS backend_code_id_{name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend_code', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdSequence',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_block', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Id sequence',
+                'verbose_name_plural': 'Id sequences',
+            },
+        ),
+        migrations.RunPython(create_sequences, drop_sequences),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-19 15:43
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def remove_duplicate_basket_rows(apps, schema_editor):
+    # keep the most recent row of every (customer, product) pair
+    Basket = apps.get_model('backend_code', 'Basket')
+    duplicates = Basket.objects.values('b_customer', 'b_product').annotate(rows=Count('id'), last_id=Max('id')).filter(rows__gt=1)
+    for duplicate in duplicates:
+        Basket.objects.filter(b_customer=duplicate['b_customer'], b_product=duplicate['b_product']).exclude(id=duplicate['last_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend_code', '0002_id_sequence'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_basket_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='basket',
+            constraint=models.UniqueConstraint(fields=('b_customer', 'b_product'), name='unique_basket_product'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.16 on 2026-10-19 15:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend_code', '0003_basket_unique_product'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['order_customer', 'status', 'id'], name='order_customer_status_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-19 15:53
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+import django.db.models.deletion
+
+BACKFILL_BATCH_SIZE = 10000
+
+
+def backfill_order_vendor(apps, schema_editor):
+    # the vendor of an order line is the store that delivers its product
+    OrderItems = apps.get_model('backend_code', 'OrderItems')
+    Product = apps.get_model('backend_code', 'Product')
+    store = Subquery(Product.objects.filter(id=OuterRef('order_product')).values('delivery_store')[:1])
+    last_id = OrderItems.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+    for start in range(0, last_id + 1, BACKFILL_BATCH_SIZE):
+        OrderItems.objects.filter(id__gte=start, id__lt=start + BACKFILL_BATCH_SIZE, order_vendor__isnull=True).update(order_vendor=store)
+
+
+class Migration(migrations.Migration):
+    # the backfill commits batch by batch instead of holding one long transaction
+    atomic = False
+
+    dependencies = [
+        ('backend_code', '0004_order_customer_status_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitems',
+            name='order_vendor',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='vendor_order_items', to='backend_code.Store'),
+        ),
+        migrations.RunPython(backfill_order_vendor, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='orderitems',
+            index=models.Index(fields=['order_vendor', 'id'], name='order_items_vendor_idx'),
+        ),
+    ]
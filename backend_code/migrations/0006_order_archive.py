@@ -0,0 +1,79 @@
+# Generated by Django 2.2.16 on 2026-10-19 15:57
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend_code', '0005_order_items_vendor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('order_number', models.PositiveIntegerField(unique=True)),
+                ('order_slug', models.SlugField(max_length=100, unique=True, verbose_name='order_URL')),
+                ('area_code', models.PositiveIntegerField()),
+                ('final_delivery_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('express_delivery', models.BooleanField(default=False)),
+                ('total_price', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('new', 'NEW'), ('confirmed', 'CONFIRMED'), ('assembled', 'ASSEMBLED'), ('dispatched', 'DISPATCHED'), ('delivered', 'DELIVERED'), ('canceled', 'CANCELED')], max_length=30)),
+                ('status_changed', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Archived order',
+                'verbose_name_plural': 'Archived orders',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItems',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('order_prod_vendor', models.CharField(max_length=100)),
+                ('order_prod_amount', models.PositiveIntegerField()),
+            ],
+            options={
+                'verbose_name': 'Archived order items',
+                'verbose_name_plural': 'Archived orders items',
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='status_changed',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'status_changed'], name='order_status_changed_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedorderitems',
+            name='number_of_order',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_items_number', to='backend_code.ArchivedOrder'),
+        ),
+        migrations.AddField(
+            model_name='archivedorderitems',
+            name='order_product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_by_archived_order', to='backend_code.Product'),
+        ),
+        migrations.AddField(
+            model_name='archivedorderitems',
+            name='order_vendor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='vendor_archived_order_items', to='backend_code.Store'),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='order_customer',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_order_by_customer', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['order_customer', 'status', 'id'], name='archived_order_customer_idx'),
+        ),
+    ]
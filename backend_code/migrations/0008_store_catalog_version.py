@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-19 16:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend_code', '0007_queued_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='store',
+            name='catalog_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 2.2.16 on 2026-10-19 17:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend_code', '0010_order_items_vendor_do_nothing'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archivedorderitems',
+            name='order_vendor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='vendor_archived_order_items', to='backend_code.Store'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 2.2.16 on 2026-10-19 18:02
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+BACKFILL_BATCH_SIZE = 10000
+
+
+def backfill_feed_position(apps, schema_editor):
+    # existing order lines are committed: their id order is their commit order
+    OrderItems = apps.get_model('backend_code', 'OrderItems')
+    IdSequence = apps.get_model('backend_code', 'IdSequence')
+    last_id = OrderItems.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+    for start in range(0, last_id + 1, BACKFILL_BATCH_SIZE):
+        OrderItems.objects.filter(id__gte=start, id__lt=start + BACKFILL_BATCH_SIZE, feed_position__isnull=True).update(feed_position=F('id'))
+    IdSequence.objects.update_or_create(name='vendor_feed', defaults={'last_block': last_id})
+
+
+class Migration(migrations.Migration):
+    # the backfill commits batch by batch instead of holding one long transaction
+    atomic = False
+
+    dependencies = [
+        ('backend_code', '0011_archived_order_items_vendor_do_nothing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitems',
+            name='feed_position',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_feed_position, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='orderitems',
+            name='order_items_vendor_idx',
+        ),
+        migrations.AddIndex(
+            model_name='orderitems',
+            index=models.Index(fields=['order_vendor', 'feed_position'], name='order_items_feed_idx'),
+        ),
+    ]
@@ -1,9 +1,12 @@
 from django.contrib.auth.models import AbstractBaseUser, AbstractUser, UserManager, PermissionsMixin
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.db import models
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
 from django.template.defaultfilters import slugify
+from django.utils import timezone
 
-from backend_code.managers import CustomUserManager
+from backend_code.managers import CustomUserManager, BasketManager
 
 STATUS_CHOICES = (
     ('new', 'NEW'),
@@ -14,6 +17,19 @@ STATUS_CHOICES = (
     ('canceled', 'CANCELED'),
 )
 
+# statuses a vendor can move an order to from its current status
+ORDER_STATUS_TRANSITIONS = {
+    'new': ('confirmed', 'canceled'),
+    'confirmed': ('assembled', 'canceled'),
+    'assembled': ('dispatched', 'canceled'),
+    'dispatched': ('delivered', 'canceled'),
+    'delivered': (),
+    'canceled': (),
+}
+
+# orders in these statuses never change again and are moved to the archive after ORDER_ARCHIVE_AGE_DAYS
+TERMINAL_ORDER_STATUSES = ('delivered', 'canceled')
+
 
 class Store(models.Model):
     vendor_id = models.OneToOneField('Customer', related_name='unique_vendor_id', on_delete=models.CASCADE)
@@ -22,6 +38,7 @@ class Store(models.Model):
     url = models.URLField(null=True, blank=True)
     nominal_delivery_price = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.BooleanField(default=True)
+    catalog_version = models.PositiveIntegerField(default=0)
 
     class Meta:
         verbose_name = 'Store'
@@ -130,6 +147,13 @@ class Basket(models.Model):
     b_vendor = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='b_vend')
     amount = models.PositiveIntegerField()
 
+    objects = BasketManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['b_customer', 'b_product'], name='unique_basket_product'),
+        ]
+
     def __str__(self):
         return f'{self.b_customer}, {self.b_product}, {self.b_vendor}, {self.amount}'
 
@@ -143,6 +167,13 @@ class Order(models.Model):
     express_delivery = models.BooleanField(default=False)
     total_price = models.PositiveIntegerField()
     status = models.CharField(choices=STATUS_CHOICES, max_length=30)
+    status_changed = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['order_customer', 'status', 'id'], name='order_customer_status_idx'),
+            models.Index(fields=['status', 'status_changed'], name='order_status_changed_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         self.order_slug = slugify(self.order_number)
@@ -156,11 +187,123 @@ class OrderItems(models.Model):
     number_of_order = models.ForeignKey(Order, related_name='order_items_number', on_delete=models.CASCADE)
     order_product = models.ForeignKey(Product, related_name='product_by_order', on_delete=models.CASCADE)
     order_prod_vendor = models.CharField(max_length=100)
+    # cleared by clear_order_vendor when the store is deleted
+    order_vendor = models.ForeignKey(Store, related_name='vendor_order_items', on_delete=models.DO_NOTHING, null=True, blank=True, db_index=False)
     order_prod_amount = models.PositiveIntegerField()
+    # cursor of the vendor feed in commit order, set by backend_code.vendor_feed.assign_feed_positions
+    feed_position = models.BigIntegerField(null=True, blank=True)
 
 
     class Meta:
         verbose_name = 'Order items'
         verbose_name_plural = 'Orders items'
         ordering = ('-number_of_order',)
+        indexes = [
+            models.Index(fields=['order_vendor', 'feed_position'], name='order_items_feed_idx'),
+        ]
 
+
+
+class ArchivedOrder(models.Model):
+    id = models.IntegerField(primary_key=True)
+    order_number = models.PositiveIntegerField(unique=True)
+    order_slug = models.SlugField(unique=True, max_length=100, verbose_name='order_URL')
+    order_customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='archived_order_by_customer', db_index=False)
+    area_code = models.PositiveIntegerField()
+    final_delivery_price = models.DecimalField(max_digits=10, decimal_places=2)
+    express_delivery = models.BooleanField(default=False)
+    total_price = models.PositiveIntegerField()
+    status = models.CharField(choices=STATUS_CHOICES, max_length=30)
+    status_changed = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Archived order'
+        verbose_name_plural = 'Archived orders'
+        indexes = [
+            models.Index(fields=['order_customer', 'status', 'id'], name='archived_order_customer_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.order_number)
+
+
+class ArchivedOrderItems(models.Model):
+    id = models.IntegerField(primary_key=True)
+    number_of_order = models.ForeignKey(ArchivedOrder, related_name='order_items_number', on_delete=models.CASCADE)
+    order_product = models.ForeignKey(Product, related_name='product_by_archived_order', on_delete=models.CASCADE)
+    order_prod_vendor = models.CharField(max_length=100)
+    # cleared by clear_order_vendor when the store is deleted
+    order_vendor = models.ForeignKey(Store, related_name='vendor_archived_order_items', on_delete=models.DO_NOTHING, null=True, blank=True)
+    order_prod_amount = models.PositiveIntegerField()
+
+    class Meta:
+        verbose_name = 'Archived order items'
+        verbose_name_plural = 'Archived orders items'
+
+
+@receiver(pre_delete, sender=Store)
+def clear_order_vendor(sender, instance, using, **kwargs):
+    # one UPDATE per table and store: SET_NULL loads every order line of the store and updates them 100 at a time
+    OrderItems.objects.using(using).filter(order_vendor=instance).update(order_vendor=None)
+    ArchivedOrderItems.objects.using(using).filter(order_vendor=instance).update(order_vendor=None)
+
+
+QUEUED_EMAIL_STATUS_CHOICES = (
+    ('queued', 'QUEUED'),
+    ('failed', 'FAILED'),
+)
+
+
+class QueuedEmail(models.Model):
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = models.TextField()
+    attachment = models.CharField(max_length=255, null=True, blank=True)
+    status = models.CharField(choices=QUEUED_EMAIL_STATUS_CHOICES, max_length=10, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = 'Queued email'
+        verbose_name_plural = 'Queued emails'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt'], name='queued_email_due_idx'),
+        ]
+
+    def __str__(self):
+        return self.subject
+
+
+class IdSequence(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    last_block = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Id sequence'
+        verbose_name_plural = 'Id sequences'
+
+    def __str__(self):
+        return self.name
+
+
+class OutboxMessage(models.Model):
+    task = models.CharField(max_length=255)
+    args = models.TextField(default='[]')
+    kwargs = models.TextField(default='{}')
+    dedupe_key = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    created = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = 'Outbox message'
+        verbose_name_plural = 'Outbox messages'
+        indexes = [
+            models.Index(fields=['next_attempt'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return self.task
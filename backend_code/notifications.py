@@ -0,0 +1,62 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.template.loader import get_template
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from backend_code.models import Customer, Order, OrderItems
+from backend_code.token_gen import generate_token
+
+# notification name: (email subject, template)
+NOTIFICATIONS = {
+    'activation': ('Activation email', 'authentication/activate.html'),
+    'order_confirmation': ('Order confirmed', 'confirmation/order_confirm.html'),
+    'order_status': ('Order status changed', 'confirmation/order_status.html'),
+}
+
+
+@lru_cache(maxsize=None)
+def _template(template_name):
+    # templates are compiled once per worker process
+    return get_template(template_name)
+
+
+def render_notification(notification, context):
+    '''
+    Тема и текст уведомления notification (ключ NOTIFICATIONS).
+    '''
+    subject, template_name = NOTIFICATIONS[notification]
+    return subject, _template(template_name).render(context)
+
+
+def activation_mail(customer_id, domain):
+    '''
+    Письмо со ссылкой для подтверждения адреса пользователя: (subject, body, from_email, to).
+    '''
+    customer = Customer.objects.get(id=customer_id)
+    subject, body = render_notification('activation', {
+        'user': customer,
+        'domain': domain,
+        'uid': urlsafe_base64_encode(force_bytes(customer.pk)),
+        'token': generate_token.make_token(customer)})
+    return subject, body, settings.EMAIL_FROM_USER, [customer.email_login]
+
+
+def order_mail(notification, order_id):
+    '''
+    Письмо о заказе: заказ, покупатель, позиции и товары загружаются одним запросом (OrderItems JOIN Order JOIN Customer JOIN Product).
+    '''
+    items = list(OrderItems.objects.filter(number_of_order=order_id).select_related('number_of_order__order_customer', 'order_product').order_by('id'))
+    order = items[0].number_of_order if items else Order.objects.select_related('order_customer').get(id=order_id)
+    subject, body = render_notification(notification, {'user': order.order_customer, 'order': order, 'items': items})
+    return subject, body, settings.EMAIL_FROM_USER, [order.order_customer.email_login]
+
+
+def order_status_mails(order_ids):
+    '''
+    Письма об изменении статуса заказов, для всех заказов одним запросом.
+    '''
+    for order in Order.objects.filter(id__in=order_ids).select_related('order_customer'):
+        subject, body = render_notification('order_status', {'user': order.order_customer, 'order': order})
+        yield subject, body, settings.EMAIL_FROM_USER, [order.order_customer.email_login]
@@ -0,0 +1,39 @@
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from backend_code.models import Order, OrderItems, ORDER_STATUS_TRANSITIONS
+from backend_code.stock import release_stock
+
+
+def vendor_orders(store):
+    '''
+    Заказы, в которых есть товары магазина. shared - в заказе есть и товары других магазинов.
+    '''
+    return Order.objects.filter(id__in=OrderItems.objects.filter(order_vendor=store).values('number_of_order')).annotate(
+        shared=Exists(OrderItems.objects.filter(number_of_order=OuterRef('pk')).exclude(order_vendor=store)))
+
+
+def transition_orders(store, order_numbers, target_status):
+    '''
+    Пакетная смена статуса заказов поставщиком. Заказы и их текущие статусы проверяются одним запросом (строки блокируются до конца транзакции), статус заказа с товарами нескольких магазинов поставщик не меняет (отмена вернула бы на склад и чужие товары), допустимые переходы (ORDER_STATUS_TRANSITIONS) применяются одним UPDATE. При отмене заказов товар возвращается на склад. Возвращает список измененных заказов (id, номер) и причины отказа для остальных номеров.
+    '''
+    failed = {}
+    with transaction.atomic():
+        current = {order_number: (order_id, status, shared) for order_id, order_number, status, shared in
+                   vendor_orders(store).select_for_update().filter(order_number__in=order_numbers).values_list('id', 'order_number', 'status', 'shared')}
+        updated = []
+        for order_number in order_numbers:
+            if order_number not in current:
+                failed[order_number] = 'Order not found'
+            elif current[order_number][2]:
+                failed[order_number] = 'Order has items of other stores'
+            elif target_status not in ORDER_STATUS_TRANSITIONS[current[order_number][1]]:
+                failed[order_number] = f'Cannot change status from {current[order_number][1]} to {target_status}'
+            else:
+                updated.append(current[order_number][0])
+        if updated:
+            Order.objects.filter(id__in=updated).update(status=target_status, status_changed=timezone.now())
+            if target_status == 'canceled':
+                release_stock(updated)
+    return updated, [order_number for order_number in order_numbers if order_number not in failed], failed
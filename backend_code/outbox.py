@@ -0,0 +1,90 @@
+import functools
+import json
+from datetime import timedelta
+
+from celery import current_task
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from backend_code.models import OutboxMessage
+from marketplace.celery import app as celery_app
+
+OUTBOX_TASK_PREFIX = 'outbox:'
+
+
+def enqueue(task, *args, dedupe_key=None, **kwargs):
+    '''
+    Постановка задачи celery в outbox. Вызывается в транзакции бизнес-операции: задача записывается в БД вместе с изменением данных и не отправляется, если транзакция откатилась. В брокер задачи отправляет relay_outbox (команда relay_outbox), поэтому время ответа не зависит от брокера. Задача с уже записанным dedupe_key повторно не добавляется.
+    '''
+    message = OutboxMessage(task=task.name, args=json.dumps(args, cls=DjangoJSONEncoder),
+                            kwargs=json.dumps(kwargs, cls=DjangoJSONEncoder), dedupe_key=dedupe_key)
+    # ON CONFLICT DO NOTHING: a duplicate key does not break the surrounding transaction
+    OutboxMessage.objects.bulk_create([message], ignore_conflicts=True)
+
+
+def task_id(message):
+    # a message published twice (the relay died before deleting it) keeps its task id
+    return OUTBOX_TASK_PREFIX + (message.dedupe_key or str(message.id))
+
+
+def publish_batch(claimed):
+    '''
+    Отправка задач в брокер через одно соединение. Отправка останавливается на первой ошибке (брокер, скорее всего, недоступен): для этой задачи назначается следующая попытка с экспоненциальной задержкой, остальные задачи пачки остаются в outbox. Возвращает идентификаторы отправленных задач.
+    '''
+    published = []
+    with celery_app.producer_or_acquire() as producer:
+        for message in claimed:
+            try:
+                celery_app.send_task(message.task, args=json.loads(message.args), kwargs=json.loads(message.kwargs),
+                                     task_id=task_id(message), producer=producer)
+            except Exception as err:
+                message.attempts += 1
+                message.last_error = repr(err)
+                delay = min(settings.OUTBOX_RETRY_BACKOFF * 2 ** (message.attempts - 1), settings.OUTBOX_RETRY_BACKOFF_MAX)
+                message.next_attempt = timezone.now() + timedelta(seconds=delay)
+                message.save(update_fields=['attempts', 'last_error', 'next_attempt'])
+                break
+            published.append(message.id)
+    return published
+
+
+def relay_outbox(batch_size=None):
+    '''
+    Отправка задач из outbox в брокер пачками по OUTBOX_BATCH_SIZE в порядке записи. Пачка блокируется (SELECT ... FOR UPDATE SKIP LOCKED) до удаления отправленных задач, поэтому несколько процессов relay не отправляют одну задачу одновременно. Гарантия доставки - at least once: если процесс упадет между отправкой и удалением, задачи будут отправлены повторно с тем же идентификатором (повтор отсекает deliver_once). Возвращает количество отправленных задач.
+    '''
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    relayed = 0
+    while True:
+        with transaction.atomic():
+            claimed = list(OutboxMessage.objects.select_for_update(skip_locked=True)
+                           .filter(next_attempt__lte=timezone.now()).order_by('id')[:batch_size])
+            published = publish_batch(claimed)
+            OutboxMessage.objects.filter(id__in=published).delete()
+        relayed += len(published)
+        if len(claimed) < batch_size or len(published) < len(claimed):
+            return relayed
+
+
+def _delivered_key(task_id):
+    return f'outbox:delivered:{task_id}'
+
+
+def deliver_once(func):
+    '''
+    Декоратор задачи celery: задача из outbox, уже успешно выполненная с тем же идентификатором (повторная отправка relay_outbox), не выполняется второй раз. Отметка о выполнении хранится в кэше OUTBOX_DEDUPE_TIMEOUT секунд.
+    '''
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        task_id = current_task.request.id if current_task else None
+        if not (task_id and task_id.startswith(OUTBOX_TASK_PREFIX)):
+            return func(*args, **kwargs)
+        if cache.get(_delivered_key(task_id)):
+            return 'Duplicate delivery skipped'
+        result = func(*args, **kwargs)
+        # marked after success: a task that failed half way may run again
+        cache.set(_delivered_key(task_id), True, settings.OUTBOX_DEDUPE_TIMEOUT)
+        return result
+    return wrapper
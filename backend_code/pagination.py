@@ -0,0 +1,25 @@
+from django.conf import settings
+
+
+def page_limit(value):
+    '''
+    Размер страницы из параметра limit (по умолчанию ORDER_PAGE_SIZE, не больше ORDER_MAX_PAGE_SIZE).
+    '''
+    if value in (None, ''):
+        return settings.ORDER_PAGE_SIZE
+    limit = int(value)
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return min(limit, settings.ORDER_MAX_PAGE_SIZE)
+
+
+def keyset_page(queryset, before=None, limit=None):
+    '''
+    Постраничная выборка по ключу (keyset): записи отдаются от новых к старым (по убыванию id), курсор следующей страницы - id последней записи. В отличие от OFFSET стоимость запроса не растет с номером страницы.
+    '''
+    limit = page_limit(limit)
+    if before not in (None, ''):
+        queryset = queryset.filter(id__lt=int(before))
+    items = list(queryset.order_by('-id')[:limit + 1])
+    next_cursor = items[limit - 1].id if len(items) > limit else None
+    return items[:limit], next_cursor
@@ -32,3 +32,9 @@ class IsOrderOwner(BasePermission):
 
     def has_object_permission(self, request, view, obj):
         return obj.order_customer.email_login == request.data['email_login']
+
+
+class IsStaff(BasePermission):
+
+    def has_permission(self, request, view):
+        return Customer.objects.filter(email_login=request.data.get('email_login'), is_staff=True).exists()
@@ -0,0 +1,152 @@
+import hmac
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+PROFILING_CURSOR_KEY = 'profiling:cursor'
+
+
+def _slot_key(slot):
+    return f'profiling:slot:{slot}'
+
+
+def _authorized(request):
+    # profiling on demand and the profile views need PROFILING_TOKEN in the X-Profile header
+    token = request.META.get('HTTP_X_PROFILE')
+    return bool(settings.PROFILING_TOKEN and token and hmac.compare_digest(token, settings.PROFILING_TOKEN))
+
+
+def collapse(frame):
+    '''
+    Стек вызовов в формате collapsed stacks (flamegraph.pl, speedscope): функции от внешней к внутренней через ";".
+    '''
+    names = []
+    while frame is not None:
+        names.append(f'{frame.f_globals.get("__name__", "?")}.{frame.f_code.co_name}')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler:
+    '''
+    Сэмплирующий профилировщик: фоновый поток раз в PROFILING_INTERVAL секунд снимает стеки потоков, обрабатывающих выбранные запросы (sys._current_frames). Код запроса не инструментируется, а пока выбранных запросов нет, поток ждет и не потребляет процессор.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active = {}
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, stacks in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[collapse(frame)] += 1
+                if not self._active:
+                    self._wakeup.clear()
+            del frames
+            time.sleep(settings.PROFILING_INTERVAL)
+
+    def start(self):
+        thread_id = threading.get_ident()
+        with self._lock:
+            # a forked worker does not inherit the parent's thread
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='profiling-sampler', daemon=True)
+                self._thread.start()
+            self._active[thread_id] = Counter()
+            self._wakeup.set()
+
+    def stop(self):
+        with self._lock:
+            return self._active.pop(threading.get_ident(), Counter())
+
+
+sampler = Sampler()
+
+
+def store_profile(profile):
+    '''
+    Запись профиля в кольцевой буфер из PROFILING_BUFFER_SIZE ячеек в общем кэше: новый профиль занимает место самого старого, объем буфера не растет.
+    '''
+    cache.add(PROFILING_CURSOR_KEY, 0, None)
+    profile['id'] = cache.incr(PROFILING_CURSOR_KEY)
+    cache.set(_slot_key(profile['id'] % settings.PROFILING_BUFFER_SIZE), profile, None)
+    return profile['id']
+
+
+def stored_profiles():
+    '''
+    Профили из кольцевого буфера, от новых к старым.
+    '''
+    profiles = cache.get_many([_slot_key(slot) for slot in range(settings.PROFILING_BUFFER_SIZE)]).values()
+    return sorted(profiles, key=lambda profile: profile['id'], reverse=True)
+
+
+class ProfilingMiddleware:
+    '''
+    Профилирование доли запросов PROFILING_SAMPLE_RATE и запросов с заголовком X-Profile: <PROFILING_TOKEN>. Для остальных запросов проверка сводится к одному random() и чтению заголовка.
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() < settings.PROFILING_SAMPLE_RATE:
+            reason = 'sample'
+        elif 'HTTP_X_PROFILE' in request.META and _authorized(request):
+            reason = 'header'
+        else:
+            return self.get_response(request)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            stacks = sampler.stop()
+        resolver_match = getattr(request, 'resolver_match', None)
+        store_profile({
+            'started': timezone.now().isoformat(),
+            'method': request.method,
+            'path': request.path,
+            'route': resolver_match.route if resolver_match else 'unmatched',
+            'status': response.status_code,
+            'duration': round(time.perf_counter() - started, 6),
+            'reason': reason,
+            'samples': sum(stacks.values()),
+            'stacks': dict(stacks),
+        })
+        return response
+
+
+def profiles_view(request):
+    if not _authorized(request):
+        return JsonResponse({'Status': False, 'Error': 'Profiling token required'}, status=403)
+    profiles = [{key: value for key, value in profile.items() if key != 'stacks'} for profile in stored_profiles()]
+    return HttpResponse(json.dumps(profiles), content_type='application/json')
+
+
+def profile_stacks_view(request, profile_id):
+    '''
+    Стеки профиля в формате collapsed stacks: `flamegraph.pl stacks.txt > flame.svg` или загрузка в speedscope.
+    '''
+    if not _authorized(request):
+        return JsonResponse({'Status': False, 'Error': 'Profiling token required'}, status=403)
+    profile = cache.get(_slot_key(profile_id % settings.PROFILING_BUFFER_SIZE))
+    if not profile or profile['id'] != profile_id:
+        return JsonResponse({'Status': False, 'Error': 'Profile not found'}, status=404)
+    lines = ''.join(f'{stack} {count}\n' for stack, count in sorted(profile['stacks'].items()))
+    return HttpResponse(lines, content_type='text/plain; charset=utf-8')
@@ -65,6 +65,18 @@ class OrderItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'number_of_order', 'order_product', 'order_prod_vendor', 'order_prod_amount']
 
 
+class VendorOrderItemSerializer(serializers.ModelSerializer):
+    order_number = serializers.IntegerField(source='number_of_order.order_number', read_only=True)
+    order_status = serializers.CharField(source='number_of_order.status', read_only=True)
+    express_delivery = serializers.BooleanField(source='number_of_order.express_delivery', read_only=True)
+    stock_number = serializers.IntegerField(source='order_product.stock_number', read_only=True)
+    product_name = serializers.CharField(source='order_product.name', read_only=True)
+
+    class Meta:
+        model = OrderItems
+        fields = ['id', 'feed_position', 'order_number', 'order_status', 'express_delivery', 'stock_number', 'product_name', 'order_prod_amount']
+
+
 class OrderSerializer(serializers.ModelSerializer):
     # order_items_number = OrderItemSerializer(read_only=True, many=True)
 
@@ -0,0 +1,230 @@
+import logging
+import os
+import queue
+import re
+import socket
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction, DatabaseError
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+SQL_REPORT_PROCESSES_KEY = 'sql-report:processes'
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%s")
+_IN_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_ROWS = re.compile(r'(\([^()]*\))(?:\s*,\s*\1)+')
+_CASES = re.compile(r'(\bWHEN\b(?:(?!\bWHEN\b).)*?\bTHEN \?)(?:\s+\1)+')
+_UNIONS = re.compile(r'(\bSELECT (?:\?|NULL)(?:, (?:\?|NULL))*)(?:\s+UNION ALL\s+\1)+')
+_SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    '''
+    Нормализованный текст запроса: литералы и параметры заменяются на ?, списки IN (...), строки VALUES (...), (...), цепочки CASE WHEN ... THEN ? и строки SELECT ? UNION ALL SELECT ? (массовые UPDATE и INSERT) любой длины сводятся к одному виду. Запросы, отличающиеся только значениями и количеством строк, имеют одинаковый отпечаток.
+    '''
+    sql = _LITERALS.sub('?', sql)
+    sql = _IN_LISTS.sub('(...)', sql)
+    sql = _ROWS.sub(r'\1', sql)
+    sql = _CASES.sub(r'\1 ...', sql)
+    sql = _UNIONS.sub(r'\1 UNION ALL ...', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+class RequestQueries:
+    '''
+    Запросы к БД, выполненные при обработке одного запроса (connection.execute_wrapper): количество, общее время, количество выполнений каждого отпечатка и медленные запросы.
+    '''
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+        self.fingerprints = Counter()
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.duration += duration
+            self.fingerprints[fingerprint(sql)] += 1
+            if duration >= settings.SQL_SLOW_QUERY_SECONDS and len(self.slow) < settings.SQL_SLOW_QUERIES_PER_REQUEST:
+                self.slow.append((context['connection'].alias, sql, params, many, duration))
+
+    def n_plus_one(self):
+        # the same SELECT repeated with different values is a query per row of an earlier result
+        return {statement: count for statement, count in self.fingerprints.items()
+                if count >= settings.SQL_N_PLUS_ONE_THRESHOLD and statement.startswith('SELECT')}
+
+
+def explain(alias, sql, params):
+    '''
+    План медленного запроса (EXPLAIN без ANALYZE: запрос повторно не выполняется). Выполняется в точке сохранения, поэтому ошибка EXPLAIN не прерывает текущую транзакцию.
+    '''
+    try:
+        with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+            cursor.execute(f'EXPLAIN {sql}', params)
+            return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+    except DatabaseError as err:
+        return f'EXPLAIN failed: {err}'
+
+
+class SlowQueryLog:
+    '''
+    Запись медленных запросов в лог вместе с планом. EXPLAIN выполняется в фоновом потоке процесса (со своим соединением с БД), а не в потоке запроса, поэтому ответ не ждет лишнего обращения к БД. Очередь ограничена SQL_EXPLAIN_QUEUE_SIZE: при ее переполнении запрос записывается без плана.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+
+    def put(self, method, route, alias, sql, params, many, duration):
+        with self._lock:
+            if self._pid != os.getpid():
+                # the thread of the parent process does not survive a fork
+                self._pid = os.getpid()
+                self._queue = queue.Queue(settings.SQL_EXPLAIN_QUEUE_SIZE)
+                threading.Thread(target=self._run, args=(self._queue,), name='sql-explain', daemon=True).start()
+        try:
+            self._queue.put_nowait((method, route, alias, sql, params, many, duration))
+        except queue.Full:
+            logger.warning('Slow query on %s %s (%.3f s): %s\nno plan, explain queue is full', method, route, duration, sql)
+
+    def _run(self, pending):
+        while True:
+            method, route, alias, sql, params, many, duration = pending.get()
+            try:
+                plan = 'executemany, no plan' if many else explain(alias, sql, params)
+                logger.warning('Slow query on %s %s (%.3f s): %s\n%s', method, route, duration, sql, plan)
+                connections[alias].close_if_unusable_or_obsolete()
+            except Exception:
+                logger.exception('Slow query on %s %s (%.3f s) was not logged', method, route, duration)
+            finally:
+                pending.task_done()
+
+    def wait(self):
+        # blocks until the queued plans are logged (tests, benchmarks)
+        if self._queue is not None and self._pid == os.getpid():
+            self._queue.join()
+
+
+slow_query_log = SlowQueryLog()
+
+
+class SqlReport:
+    '''
+    Скользящий отчет по маршрутам: запросы к БД за последние SQL_REPORT_WINDOWS окон по SQL_REPORT_WINDOW секунд. Как и метрики (backend_code.metrics), накапливается в памяти процесса и раз в METRICS_FLUSH_INTERVAL секунд записывается в общий кэш; отчет суммирует окна всех процессов.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._windows = {}
+        self._flushed = 0
+
+    def record(self, route, queries, suspects):
+        window = int(time.time() // settings.SQL_REPORT_WINDOW)
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._windows = {}
+                self._flushed = 0
+            routes = self._windows.setdefault(window, {})
+            if len(self._windows) > settings.SQL_REPORT_WINDOWS:
+                del self._windows[min(self._windows)]
+            stats = routes.setdefault(route, {'requests': 0, 'queries': 0, 'max_queries': 0, 'sql_seconds': 0, 'slow_queries': 0, 'n_plus_one': {}})
+            stats['requests'] += 1
+            stats['queries'] += queries.count
+            stats['max_queries'] = max(stats['max_queries'], queries.count)
+            stats['sql_seconds'] += queries.duration
+            stats['slow_queries'] += len(queries.slow)
+            for statement, count in suspects.items():
+                stats['n_plus_one'][statement] = max(stats['n_plus_one'].get(statement, 0), count)
+
+    def process_key(self):
+        return f'sql-report:process:{socket.gethostname()}:{os.getpid()}'
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._flushed < settings.METRICS_FLUSH_INTERVAL:
+                return
+            self._flushed = now
+            snapshot = {window: {route: dict(stats, n_plus_one=dict(stats['n_plus_one'])) for route, stats in routes.items()}
+                        for window, routes in self._windows.items()}
+        key = self.process_key()
+        cache.set(key, snapshot, settings.SQL_REPORT_WINDOW * settings.SQL_REPORT_WINDOWS)
+        processes = cache.get(SQL_REPORT_PROCESSES_KEY) or []
+        if key not in processes:
+            cache.set(SQL_REPORT_PROCESSES_KEY, processes + [key], None)
+
+
+sql_report = SqlReport()
+
+
+def collect_report():
+    '''
+    Отчет по маршрутам за последние SQL_REPORT_WINDOWS окон, маршруты с наибольшим временем SQL - первыми.
+    '''
+    sql_report.flush(force=True)
+    oldest = int(time.time() // settings.SQL_REPORT_WINDOW) - settings.SQL_REPORT_WINDOWS + 1
+    processes = cache.get(SQL_REPORT_PROCESSES_KEY) or []
+    snapshots = cache.get_many(processes)
+    if len(snapshots) != len(processes):
+        cache.set(SQL_REPORT_PROCESSES_KEY, [key for key in processes if key in snapshots], None)
+    totals = {}
+    for snapshot in snapshots.values():
+        for window, routes in snapshot.items():
+            if window < oldest:
+                continue
+            for route, stats in routes.items():
+                total = totals.setdefault(route, {'route': route, 'requests': 0, 'queries': 0, 'max_queries': 0, 'sql_seconds': 0, 'slow_queries': 0, 'n_plus_one': {}})
+                for name in ('requests', 'queries', 'sql_seconds', 'slow_queries'):
+                    total[name] += stats[name]
+                total['max_queries'] = max(total['max_queries'], stats['max_queries'])
+                for statement, count in stats['n_plus_one'].items():
+                    total['n_plus_one'][statement] = max(total['n_plus_one'].get(statement, 0), count)
+    for total in totals.values():
+        total['avg_queries'] = round(total['queries'] / total['requests'], 2)
+        total['avg_sql_ms'] = round(total['sql_seconds'] * 1000 / total['requests'], 3)
+    return sorted(totals.values(), key=lambda total: total['sql_seconds'], reverse=True)
+
+
+def sql_report_view(request):
+    return JsonResponse({'window_seconds': settings.SQL_REPORT_WINDOW * settings.SQL_REPORT_WINDOWS, 'routes': collect_report()})
+
+
+class SqlStatsMiddleware:
+    '''
+    Учет запросов к БД по каждому запросу: количество, время SQL, повторяющиеся отпечатки (предполагаемый N+1 - SQL_N_PLUS_ONE_THRESHOLD и более одинаковых SELECT) и медленные запросы с планом выполнения (план строится в фоне, см. SlowQueryLog). Находки пишутся в лог backend_code.sql_stats, сводка - в скользящий отчет (/sql-report). На каждый запрос к БД добавляется замер времени и нормализация текста регулярными выражениями.
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = RequestQueries()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(queries))
+            response = self.get_response(request)
+        resolver_match = getattr(request, 'resolver_match', None)
+        route = resolver_match.route if resolver_match else 'unmatched'
+        suspects = queries.n_plus_one()
+        for statement, count in suspects.items():
+            logger.warning('Possible N+1 on %s %s: %d x %s', request.method, route, count, statement)
+        for alias, sql, params, many, duration in queries.slow:
+            slow_query_log.put(request.method, route, alias, sql, params, many, duration)
+        sql_report.record(route, queries, suspects)
+        sql_report.flush()
+        return response
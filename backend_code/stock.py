@@ -0,0 +1,49 @@
+from django.db.models import Case, F, PositiveIntegerField, Sum, Value, When
+
+from backend_code.models import Product, OrderItems
+
+
+class InsufficientStock(Exception):
+    '''
+    Недостаточно товара на складе. Содержит артикулы (stock_number) товаров, которых не хватает.
+    '''
+
+    def __init__(self, stock_numbers):
+        super().__init__(stock_numbers)
+        self.stock_numbers = stock_numbers
+
+
+def _amount_by_product(quantities):
+    return Case(*[When(id=product_id, then=Value(amount)) for product_id, amount in quantities.items()], output_field=PositiveIntegerField())
+
+
+def _lock_products(product_ids):
+    # rows are always locked in ascending id order, so concurrent checkouts cannot deadlock
+    return list(Product.objects.select_for_update().filter(id__in=product_ids).order_by('id').values_list('id', 'stock_number', 'amount'))
+
+
+def reserve_stock(quantities):
+    '''
+    Резервирование товара для заказа ({product_id: количество}). Выполняется внутри транзакции: строки товаров блокируются в детерминированном порядке, затем остатки уменьшаются одним условным UPDATE (amount >= n). Если хотя бы одной позиции не хватает, выбрасывается InsufficientStock, и транзакция откатывается целиком.
+    '''
+    if not quantities:
+        return
+    locked = _lock_products(sorted(quantities))
+    short = [stock_number for product_id, stock_number, amount in locked if amount < quantities[product_id]]
+    if short or len(locked) != len(quantities):
+        raise InsufficientStock(short)
+    amount_by_product = _amount_by_product(quantities)
+    updated = Product.objects.filter(id__in=quantities.keys(), amount__gte=amount_by_product).update(amount=F('amount') - amount_by_product)
+    if updated != len(quantities):
+        raise InsufficientStock(short)
+
+
+def release_stock(orders):
+    '''
+    Возврат зарезервированного товара на склад при отмене или удалении заказов. Выполняется внутри транзакции.
+    '''
+    quantities = dict(OrderItems.objects.filter(number_of_order__in=orders).order_by().values('order_product').annotate(total=Sum('order_prod_amount')).values_list('order_product', 'total'))
+    if not quantities:
+        return
+    _lock_products(sorted(quantities))
+    Product.objects.filter(id__in=quantities.keys()).update(amount=F('amount') + _amount_by_product(quantities))
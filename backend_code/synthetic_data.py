@@ -0,0 +1,275 @@
+import bisect
+import io
+import multiprocessing
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from backend_code.id_allocator import ID_OFFSET
+from backend_code.models import Customer, Store, ProductCategory, Product, ProductParameters, Basket, Order, OrderItems
+
+# categories, names, prices and parameters follow goods_yaml.yaml / goods_yaml-2.yaml
+CATEGORIES = (
+    {'prod_cat_id': 224, 'name': 'Смартфоны', 'share': 0.5, 'kind': 'Смартфон', 'median_price': 40000, 'weight_classes': (1, 2),
+     'lines': (('Apple', 'iPhone', ('XS Max', 'XR', '11', '12 Pro')), ('Samsung', 'Galaxy', ('S10', 'A50', 'Note 10')), ('Xiaomi', 'Redmi', ('Note 8', '9A')))},
+    {'prod_cat_id': 15, 'name': 'Аксессуары', 'share': 0.35, 'kind': 'Чехол', 'median_price': 1500, 'weight_classes': (1, 2, 3),
+     'lines': (('Apple', 'Silicone Case', ('XS Max', 'XR', '11')), ('Deppa', 'Air Case', ('Galaxy S10', 'Redmi 9A')), ('Baseus', 'Wing', ('XR', '12 Pro')))},
+    {'prod_cat_id': 19, 'name': 'Flash-накопители', 'share': 0.15, 'kind': 'Флешка', 'median_price': 900, 'weight_classes': (1,),
+     'lines': (('SanDisk', 'Ultra', ('Flair', 'Dual Drive')), ('Kingston', 'DataTraveler', ('Exodia', 'SE9')), ('Transcend', 'JetFlash', ('790', '380')))},
+)
+COLORS = ('черный', 'белый', 'красный', 'синий', 'золотистый', 'серебристый', 'зеленый')
+RESOLUTIONS = ('2688x1242', '1792x828', '2340x1080', '1520x720', '2400x1080')
+MEMORY = (16, 32, 64, 128, 256, 512)
+FIRST_NAMES = ('Иван', 'Мария', 'Алексей', 'Анна', 'Дмитрий', 'Елена', 'Сергей', 'Ольга')
+LAST_NAMES = ('Иванов', 'Смирнова', 'Кузнецов', 'Попова', 'Соколов', 'Лебедева', 'Козлов', 'Новикова')
+# order statuses: most orders in a long-running shop are finished
+ORDER_STATUSES = (('delivered', 60), ('canceled', 10), ('new', 10), ('confirmed', 8), ('assembled', 6), ('dispatched', 6))
+
+# loaded columns per model (attnames); ids of rows nobody references are left to the database
+FIELDS = {
+    Customer: ('id', 'last_login', 'email_login', 'email_verified', 'password', 'user_name', 'first_name', 'last_name', 'phone_number', 'address',
+               'registered_vendor', 'is_active', 'organization', 'area_code', 'seller_vendor_id', 'is_staff', 'is_superuser'),
+    Store: ('id', 'vendor_id_id', 'name', 'address', 'url', 'nominal_delivery_price', 'status', 'catalog_version'),
+    Product: ('id', 'stock_number', 'slug', 'name', 'model', 'delivery_store_id', 'amount', 'price', 'product_cat_id', 'weight_class',
+              'recommended_price', 'custom_description'),
+    ProductParameters: ('pr_id_id', 'screen_size', 'dimension', 'RAM', 'color'),
+    Basket: ('b_customer_id', 'b_product_id', 'b_vendor_id', 'amount'),
+    Order: ('id', 'order_number', 'order_slug', 'order_customer_id', 'area_code', 'final_delivery_price', 'express_delivery', 'total_price', 'status',
+            'status_changed'),
+    OrderItems: ('number_of_order_id', 'order_product_id', 'order_prod_vendor', 'order_vendor_id', 'order_prod_amount'),
+}
+
+
+def _next_value(model, field):
+    # public ids from backend_code.id_allocator start at ID_OFFSET: synthetic ones stay below
+    return (model.objects.filter(**{f'{field}__lt': ID_OFFSET}).aggregate(last=Max(field))['last'] or 0) + 1
+
+
+class SeedPlan:
+    '''
+    Параметры генерации: количество строк, начальные значения идентификаторов (после уже существующих строк), размеры магазинов. Все строки определяются seed и номером строки, поэтому результат не зависит от количества процессов и размера пачек.
+    '''
+
+    def __init__(self, customers, vendors, products, orders, baskets_per_customer=2, items_per_order=3, seed=0):
+        self.customers = customers
+        self.vendors = min(vendors, customers)
+        self.products = products
+        self.orders = orders
+        self.baskets_per_customer = baskets_per_customer
+        self.items_per_order = items_per_order
+        self.seed = seed
+        self.customer_id = _next_value(Customer, 'id')
+        self.seller_vendor_id = _next_value(Customer, 'seller_vendor_id')
+        self.store_id = _next_value(Store, 'id')
+        self.product_id = _next_value(Product, 'id')
+        self.stock_number = max(_next_value(Product, 'stock_number'), 10 ** 7)
+        self.order_id = _next_value(Order, 'id')
+        self.order_number = max(_next_value(Order, 'order_number'), 10 ** 7)
+        self.password = make_password('valid0_password')
+        self.now = timezone.now()
+        self.categories = dict(ProductCategory.objects.filter(prod_cat_id__in=[category['prod_cat_id'] for category in CATEGORIES])
+                               .values_list('prod_cat_id', 'id'))
+        # a few large vendors and a long tail of small ones (Pareto sizes)
+        rng = random.Random(f'{seed}:stores')
+        sizes = [rng.paretovariate(1.2) for _ in range(self.vendors)]
+        total = sum(sizes)
+        self.store_bounds = []
+        share = 0
+        for size in sizes[:-1]:
+            share += size / total
+            self.store_bounds.append(int(share * products))
+
+    def store_of(self, product):
+        return bisect.bisect_right(self.store_bounds, product)
+
+
+def _rng(plan, table, row):
+    # one generator per row: any row can be rebuilt on its own (order items need product prices)
+    return random.Random(f'{plan.seed}:{table}:{row}')
+
+
+def customer_rows(plan, start, stop):
+    for row in range(start, stop):
+        rng = _rng(plan, 'customer', row)
+        customer_id = plan.customer_id + row
+        vendor = row < plan.vendors
+        yield (customer_id, None, f'user{customer_id}@synthetic.test', rng.random() < 0.9, plan.password, f'user{customer_id}', rng.choice(FIRST_NAMES),
+               rng.choice(LAST_NAMES), f'+7{rng.randrange(10 ** 9, 10 ** 10)}', f'ул. Тестовая, д. {rng.randint(1, 200)}', vendor, True, '',
+               rng.choices((1, 2, 3, 4, 5), (40, 25, 15, 12, 8))[0], plan.seller_vendor_id + row if vendor else None, False, False)
+
+
+def store_name(store):
+    return f'Магазин {store + 1}'
+
+
+def store_rows(plan, start, stop):
+    for row in range(start, stop):
+        rng = _rng(plan, 'store', row)
+        yield (plan.store_id + row, plan.customer_id + row, store_name(row), f'ул. Складская, д. {rng.randint(1, 200)}', None,
+               rng.choice((50, 100, 150, 200, 300, 500)), True, 0)
+
+
+def product_row(plan, row):
+    rng = _rng(plan, 'product', row)
+    category = rng.choices(CATEGORIES, [category['share'] for category in CATEGORIES])[0]
+    brand, line, model = rng.choice(category['lines'])
+    model = rng.choice(model)
+    memory = rng.choice(MEMORY)
+    color = rng.choice(COLORS)
+    price = max(int(rng.lognormvariate(0, 0.5) * category['median_price']) // 10 * 10, 100)
+    stock_number = plan.stock_number + row
+    product = (plan.product_id + row, stock_number, str(stock_number), f'{category["kind"]} {brand} {line} {model} {memory}GB ({color})',
+               f'{brand}/{line}/{model}'.lower().replace(' ', '-'), plan.store_id + plan.store_of(row), int(rng.expovariate(1 / 8)), price,
+               plan.categories[category['prod_cat_id']], rng.choice(category['weight_classes']), int(price * rng.uniform(1.03, 1.1)) // 100 * 100 + 90, None)
+    screen_size = round(rng.uniform(4.7, 6.7), 1) if category['prod_cat_id'] == 224 else 0
+    parameters = (plan.product_id + row, screen_size, rng.choice(RESOLUTIONS), memory, color)
+    return product, parameters
+
+
+def product_rows(plan, start, stop):
+    products, parameters = [], []
+    for row in range(start, stop):
+        product, product_parameters = product_row(plan, row)
+        products.append(product)
+        parameters.append(product_parameters)
+    return {Product: products, ProductParameters: parameters}
+
+
+def _popular_product(plan, rng):
+    # skewed towards the start of the catalog: popular products get most baskets and orders
+    return min(int(plan.products * rng.random() ** 2), plan.products - 1)
+
+
+def basket_rows(plan, start, stop):
+    baskets = []
+    for row in range(start, stop):
+        rng = _rng(plan, 'basket', row)
+        count = min(int(rng.expovariate(1 / plan.baskets_per_customer)), plan.products) if plan.baskets_per_customer else 0
+        products = set()
+        while len(products) < count:
+            products.add(_popular_product(plan, rng))
+        baskets.extend((plan.customer_id + row, plan.product_id + product, plan.store_id + plan.store_of(product), rng.randint(1, 3))
+                       for product in sorted(products))
+    return {Basket: baskets}
+
+
+def order_rows(plan, start, stop):
+    orders, items = [], []
+    prices = {}
+    for row in range(start, stop):
+        rng = _rng(plan, 'order', row)
+        order_id = plan.order_id + row
+        total_price = 0
+        for _ in range(1 + int(rng.expovariate(1 / max(plan.items_per_order - 1, 0.1)))):
+            product = _popular_product(plan, rng)
+            amount = rng.randint(1, 3)
+            if product not in prices:
+                prices[product] = product_row(plan, product)[0][7]
+            total_price += prices[product] * amount
+            store = plan.store_of(product)
+            items.append((order_id, plan.product_id + product, store_name(store), plan.store_id + store, amount))
+        order_number = plan.order_number + row
+        status = rng.choices([status for status, _ in ORDER_STATUSES], [weight for _, weight in ORDER_STATUSES])[0]
+        orders.append((order_id, order_number, str(order_number), plan.customer_id + int(plan.customers * rng.random() ** 2), rng.randint(1, 5),
+                       rng.choice((100, 200, 300, 500)), rng.random() < 0.2, total_price, status,
+                       plan.now - timedelta(seconds=rng.randrange(365 * 24 * 3600))))
+    return {Order: orders, OrderItems: items}
+
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def copy_rows(model, rows):
+    '''
+    Загрузка строк командой COPY ... FROM STDIN (Postgres, текстовый формат).
+    '''
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(model._meta.get_field(field).column) for field in FIELDS[model])
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_copy_value(value) for value in row))
+        buffer.write('\n')
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f'COPY {quote(model._meta.db_table)} ({columns}) FROM STDIN', buffer)
+
+
+def insert_rows(model, rows):
+    if connection.vendor == 'postgresql':
+        copy_rows(model, rows)
+    else:
+        model.objects.bulk_create([model(**dict(zip(FIELDS[model], row))) for row in rows], batch_size=500)
+
+
+GENERATORS = {
+    'customers': lambda plan, start, stop: {Customer: customer_rows(plan, start, stop)},
+    'stores': lambda plan, start, stop: {Store: store_rows(plan, start, stop)},
+    'products': product_rows,
+    'baskets': basket_rows,
+    'orders': order_rows,
+}
+
+
+def load_chunk(task):
+    '''
+    Генерация и загрузка одной пачки строк в отдельной транзакции. Выполняется в процессах пула, у каждого процесса свое соединение с БД.
+    '''
+    phase, plan, start, stop = task
+    loaded = 0
+    with transaction.atomic():
+        for model, rows in GENERATORS[phase](plan, start, stop).items():
+            rows = list(rows)
+            insert_rows(model, rows)
+            loaded += len(rows)
+    return loaded
+
+
+def seed_data(plan, workers=1, chunk_size=50000, log=print):
+    '''
+    Загрузка синтетических данных по плану: покупатели, магазины, товары с параметрами, корзины, заказы с позициями. Каждый этап делится на пачки по chunk_size строк, пачки загружаются параллельно workers процессами (Postgres, COPY); для SQLite - в одном процессе через bulk_create. Возвращает количество строк по этапам.
+    '''
+    categories = [ProductCategory(prod_cat_id=category['prod_cat_id'], name=category['name']) for category in CATEGORIES
+                  if category['prod_cat_id'] not in plan.categories]
+    if categories:
+        # bulk_create does not return ids on every backend
+        ProductCategory.objects.bulk_create(categories)
+        plan.categories = dict(ProductCategory.objects.filter(prod_cat_id__in=[category['prod_cat_id'] for category in CATEGORIES])
+                               .values_list('prod_cat_id', 'id'))
+    if connection.vendor != 'postgresql':
+        workers = 1
+    phases = (('customers', plan.customers), ('stores', plan.vendors), ('products', plan.products), ('baskets', plan.customers), ('orders', plan.orders))
+    loaded = {}
+    pool = None
+    if workers > 1:
+        # forked workers must not share the parent's database connection
+        connections.close_all()
+        pool = multiprocessing.get_context('fork').Pool(workers)
+    try:
+        for phase, rows in phases:
+            started = time.perf_counter()
+            tasks = [(phase, plan, start, min(start + chunk_size, rows)) for start in range(0, rows, chunk_size)]
+            loaded[phase] = sum(pool.imap_unordered(load_chunk, tasks) if pool else map(load_chunk, tasks))
+            elapsed = time.perf_counter() - started
+            log(f'{phase}: {loaded[phase]} rows in {elapsed:.1f} s ({loaded[phase] / max(elapsed, 1e-9):.0f} rows/s)')
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    # explicit ids were written past the sequences
+    with connection.cursor() as cursor:
+        for statement in connection.ops.sequence_reset_sql(no_style(), [Customer, Store, Product, Order]):
+            cursor.execute(statement)
+        if connection.vendor == 'postgresql':
+            cursor.execute('ANALYZE')
+    return loaded
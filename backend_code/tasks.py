@@ -1,16 +1,20 @@
-import json
-
 import yaml
 from celery import shared_task
 from django.core.exceptions import FieldError
-from django.core.mail import send_mail, EmailMessage
-import time
-
-from django.core.serializers.json import DjangoJSONEncoder
+from django.core.mail import send_mail
 from django.db import IntegrityError
 from django.http import JsonResponse
 from django.template.loader import render_to_string
 
+from backend_code import db_connections  # noqa: F401 - checks database connections before every task
+from backend_code.archive import archive_orders
+from backend_code.basket import invalidate_product_basket_quotes
+from backend_code.export_artifacts import bump_catalog_version, cached_artifact, write_artifact, download_url
+from backend_code.jobs import vendor_job_lease
+from backend_code.metrics import record_rows
+from backend_code.mail import queue_mail, queue_mail_batch, deliver_mail
+from backend_code.notifications import activation_mail, order_mail, order_status_mails
+from backend_code.outbox import deliver_once
 from backend_code.models import ProductCategory, Product, ProductParameters, Store, Customer
 from backend_code.serializers import ProductSerializer
 from marketplace import settings
@@ -18,19 +22,55 @@ from marketplace import settings
 
 @shared_task()
 def send_mail_async(subject, body, from_email, to, file_path=None):
-    time.sleep(2)
-    mail = EmailMessage(subject, body, from_email, to)
-    if file_path:
-        mail.attach_file(file_path)
-    mail.send()
-    return 'Mail sent'
+    queue_mail(subject, body, from_email, to, file_path)
+    # the worker sends everything that is due, including mail queued by other tasks
+    return f'Mail sent - {record_rows(deliver_mail())}'
 
 
 @shared_task()
-def import_product_list_async(file, data):
+def deliver_mail_async():
+    return f'Mail sent - {record_rows(deliver_mail())}'
+
+
+@shared_task()
+@deliver_once
+def activation_email_async(customer_id, domain):
+    queue_mail(*activation_mail(customer_id, domain))
+    return f'Mail sent - {record_rows(deliver_mail())}'
+
+
+@shared_task()
+@deliver_once
+def order_email_async(notification, order_id):
+    queue_mail(*order_mail(notification, order_id))
+    return f'Mail sent - {record_rows(deliver_mail())}'
+
+
+@shared_task()
+@deliver_once
+def order_status_emails_async(order_ids):
+    queue_mail_batch(order_status_mails(order_ids))
+    return f'Mail sent - {record_rows(deliver_mail())}'
+
+
+@shared_task()
+def archive_orders_async():
+    return f'Archived - {record_rows(archive_orders())}'
+
+
+@shared_task()
+def import_product_list_async(file, data, job=None):
+    with vendor_job_lease('import', data['email_login'], job) as owned:
+        if not owned:
+            return 'Another import is running for this vendor'
+        return import_product_list(file, data)
+
+
+def import_product_list(file, data):
     current_customer = Customer.objects.filter(email_login=data['email_login']).first()
     from_email = settings.EMAIL_FROM_USER
     to = [current_customer.email_login]
+    imported = []
     try:
         store_check = Store.objects.filter(vendor_id=current_customer.id).first()
         if not current_customer.is_active or not store_check:
@@ -74,12 +114,17 @@ def import_product_list_async(file, data):
                         product_specifications = deserializer.validated_data
                         current_item, _ = Product.objects.update_or_create(stock_number=item['stock_number'], defaults={**product_specifications}, delivery_store=current_customer.unique_vendor_id, product_cat=current_pr_cat)
                         current_item.save()
+                        imported.append(current_item.id)
                         prod_params, __ = ProductParameters.objects.update_or_create(pr_id=current_item, defaults={
                                 'screen_size': item['parameters']['Диагональ (дюйм)'],
                                 'dimension': item['parameters']['Разрешение (пикс)'],
                                 'RAM': item['parameters']['Встроенная память (Гб)'],
                                 'color': item['parameters']['Цвет']})
                         prod_params.save()
+                bump_catalog_version(Store.objects.filter(vendor_id=current_customer).values('id'))
+                # cached basket quotes use the price and the weight class of the products
+                invalidate_product_basket_quotes(imported)
+                record_rows(len(data_loaded['goods']))
                 subject = 'Product list imported successfully'
                 body = render_to_string('import_export/import-export.html', {
                         'user': current_customer,
@@ -87,6 +132,9 @@ def import_product_list_async(file, data):
                 send_mail_async.delay(subject, body, from_email, to)
                 return f'OK - {skipped}'
     except ValueError as err:
+        # products written before the error are part of the catalog too
+        bump_catalog_version(Store.objects.filter(vendor_id=current_customer).values('id'))
+        invalidate_product_basket_quotes(imported)
         subject = 'Product list import failed'
         body = render_to_string('import_export/import-export.html', {
             'user': current_customer,
@@ -96,11 +144,22 @@ def import_product_list_async(file, data):
 
 
 @shared_task()
-def export_product_list_async(export_file, data):
+def export_product_list_async(domain, data, job=None):
+    with vendor_job_lease('export', data['email_login'], job) as owned:
+        if not owned:
+            return 'Another export is running for this vendor'
+        return export_product_list(domain, data, job)
+
+
+def export_product_list(domain, data, job=None):
     current_customer = Customer.objects.filter(email_login=data['email_login']).first()
     from_email = settings.EMAIL_FROM_USER
     to = [current_customer.email_login]
-    all_products_export = Product.objects.filter(delivery_store__vendor_id=current_customer).values()
+    store = Store.objects.filter(vendor_id=current_customer).first()
+    # an unchanged catalog is served from the previous export
+    if store and cached_artifact(store):
+        return send_export_link(current_customer, domain, store, store.catalog_version, 'Product list has been exported (cached)')
+    all_products_export = list(Product.objects.filter(delivery_store__vendor_id=current_customer).values())
     if not all_products_export:
         subject = 'Product list cannot be exported'
         body = render_to_string('import_export/import-export.html', {
@@ -109,12 +168,16 @@ def export_product_list_async(export_file, data):
         send_mail_async.delay(subject, body, from_email, to)
         return 'Product list empty'
     else:
-        serialized_export = json.dumps(list(all_products_export), cls=DjangoJSONEncoder)
-        with open(export_file, 'w', encoding="utf-8") as file:
-            prods = yaml.dump(serialized_export, file)
-        subject = 'Product list'
-        body = render_to_string('import_export/import-export.html', {
-            'user': current_customer,
-            'message_body': 'Please see attached file.'})
-        send_mail_async.delay(subject, body, from_email, to, export_file)
-        return 'Product list has been exported'
+        # the version is the one read before the product query, so the file is never older than its name
+        write_artifact(store, store.catalog_version, all_products_export, job)
+        record_rows(len(all_products_export))
+        return send_export_link(current_customer, domain, store, store.catalog_version, 'Product list has been exported')
+
+
+def send_export_link(current_customer, domain, store, version, result):
+    subject = 'Product list'
+    body = render_to_string('import_export/import-export.html', {
+        'user': current_customer,
+        'message_body': f'Download link (valid for {settings.EXPORT_LINK_MAX_AGE // 3600} hours): {download_url(domain, store, version)}'})
+    send_mail_async.delay(subject, body, settings.EMAIL_FROM_USER, [current_customer.email_login])
+    return result
@@ -3,7 +3,8 @@ from rest_framework.routers import DefaultRouter
 
 from backend_code.views import VendorSupply, StoreViewSet, BasketViewSet, StoreCatViewSet, \
     ProductCatViewSet, LoginView, OrderViewSet, OrderDetailViewSet, activate_user, ProductExportViewSet, \
-    ProductViewSet, CustomerViewSet, CustomerSignUp
+    ProductViewSet, CustomerViewSet, CustomerSignUp, DeliveryQuoteView, VendorOrderStatusView, \
+    VendorOrderFeedView, ExportDownloadView
 
 router = DefaultRouter()
 router.register(r'goods', ProductViewSet, basename="product-set")
@@ -18,13 +19,18 @@ urlpatterns = [
     path('user-signup/', CustomerSignUp.as_view(), name='user_signup'),
     path('store/', StoreViewSet.as_view({'post': 'create', 'get': 'retrieve', 'delete': 'destroy', 'patch': 'update'}), name='store-set'),
     path('basket/', BasketViewSet.as_view({'post': 'create', 'get': 'list', 'delete': 'destroy'}), name='basket-viewset'),
+    path('basket-quote/', BasketViewSet.as_view({'get': 'quote'}), name='basket-quote'),
     path('store-cat/', StoreCatViewSet.as_view({'post': 'create', 'get': 'retrieve', 'delete': 'destroy'}), name='store-cat-view'),
     path('prod-cat/', ProductCatViewSet.as_view({'post': 'create', 'get': 'retrieve', 'delete': 'destroy'}), name='product-cat-view'),
     path('login/', LoginView.as_view(), name='login-view'),
     path('order/', OrderViewSet.as_view({'post': 'create', 'get': 'order_list', 'delete': 'destroy'}), name='order-view'),
+    path('order-status/', VendorOrderStatusView.as_view(), name='order-status'),
+    path('vendor-orders/', VendorOrderFeedView.as_view(), name='vendor-orders'),
     # path('order-detail/<slug:order_slug>/', OrderDetailViewSet.as_view({'get': 'retrieve'}), name='order-detail-view'),
     path('email-activation/<uidb64>/<token>/', activate_user, name='activate-by-mail'),
     path('product-export/', ProductExportViewSet.as_view({'get': 'export_product_list'}), name='export_product_list'),
+    path('product-export/download/<str:token>/', ExportDownloadView.as_view(), name='export_download'),
+    path('delivery-quotes/', DeliveryQuoteView.as_view(), name='delivery-quotes'),
     path('', include(router.urls)),
 ]
 
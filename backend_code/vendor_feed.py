@@ -0,0 +1,133 @@
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F, Max, Min
+from django.http import HttpResponse
+
+from backend_code.models import IdSequence, OrderItems
+from backend_code.pagination import page_limit
+from backend_code.serializers import VendorOrderItemSerializer
+
+# how often a waiting client checks the change marker in the cache
+VENDOR_FEED_POLL_INTERVAL = 0.5
+
+# IdSequence row with the last assigned feed position
+FEED_SEQUENCE = 'vendor_feed'
+
+# WSGI environ key set by the ASGI application (backend_code.async_views): the feed waits in its event loop
+ASYNC_WAIT_KEY = 'backend_code.async_wait'
+
+
+def _feed_key(store_id):
+    return f'vendor-feed:{store_id}'
+
+
+def notify_vendor_feeds(store_ids):
+    '''
+    Отметка о новых позициях заказов магазинов. Метка в кэше меняется после фиксации транзакции, поэтому ожидающие клиенты перечитывают ленту, только когда новые строки уже видны.
+    '''
+    keys = [_feed_key(store_id) for store_id in set(store_ids)]
+    transaction.on_commit(lambda: cache.set_many({key: uuid.uuid4().hex for key in keys}, None))
+
+
+def assign_feed_positions(items):
+    '''
+    Номера позиций заказов в ленте магазинов (feed_position) в порядке фиксации транзакций. id выдается при вставке строки, а транзакции фиксируются в другом порядке: курсор по id пропустил бы позицию, зафиксированную после позиции с большим id. Вызывается в конце транзакции, создавшей позиции items: блок номеров берется из строки счетчика IdSequence (не из последовательности PostgreSQL), строка заблокирована до фиксации, поэтому номера становятся видны клиентам только по возрастанию.
+    '''
+    ids = items.aggregate(first=Min('id'), last=Max('id'))
+    if ids['last'] is None:
+        return
+    span = ids['last'] - ids['first'] + 1
+    counter = IdSequence.objects.filter(name=FEED_SEQUENCE)
+    if not counter.update(last_block=F('last_block') + span):
+        # the counter row is created by migration 0012, a flushed database starts after the assigned positions
+        start = OrderItems.objects.aggregate(last=Max('feed_position'))['last'] or 0
+        IdSequence.objects.get_or_create(name=FEED_SEQUENCE, defaults={'last_block': start})
+        counter.update(last_block=F('last_block') + span)
+    first_position = counter.values_list('last_block', flat=True).get() - span + 1
+    items.update(feed_position=F('id') - ids['first'] + first_position)
+
+
+def vendor_feed(store, after=None, limit=None):
+    '''
+    Лента позиций заказов магазина в порядке фиксации (по возрастанию feed_position, keyset, индекс order_items_feed_idx). after - номер последней полученной позиции. Возвращает позиции и курсор для следующего запроса.
+    '''
+    items = OrderItems.objects.filter(order_vendor=store, feed_position__gt=int(after or 0)).select_related('number_of_order', 'order_product')
+    items = list(items.order_by('feed_position')[:page_limit(limit)])
+    return items, items[-1].feed_position if items else after
+
+
+def poll_items(store, after=None, limit=None, timeout=0):
+    '''
+    Long polling по шагам: генератор отдает паузы (секунды) между проверками, результат (позиции, курсор) - значение StopIteration. Если новых позиций нет, ожидание длится до timeout секунд (не больше VENDOR_FEED_MAX_WAIT). Пока метка магазина в кэше не изменилась, БД не опрашивается (кроме контрольной проверки раз в VENDOR_FEED_RECHECK_SECONDS на случай кэша, не общего для всех процессов). Паузы выдерживает вызывающий код: wait_for_items в потоке обработчика, backend_code.async_views - в цикле событий.
+    '''
+    deadline = time.monotonic() + min(timeout, settings.VENDOR_FEED_MAX_WAIT)
+    # the marker is read before the query, so a commit in between is not missed
+    marker = cache.get(_feed_key(store.id))
+    items, cursor = vendor_feed(store, after, limit)
+    checked = time.monotonic()
+    while not items and time.monotonic() < deadline:
+        yield min(VENDOR_FEED_POLL_INTERVAL, max(deadline - time.monotonic(), 0))
+        current = cache.get(_feed_key(store.id))
+        if current != marker or time.monotonic() - checked >= settings.VENDOR_FEED_RECHECK_SECONDS:
+            marker = current
+            items, cursor = vendor_feed(store, after, limit)
+            checked = time.monotonic()
+    return items, cursor
+
+
+def poll_step(polling):
+    # one check of poll_items: (pause, None) while waiting, (None, (items, cursor)) when done
+    try:
+        return next(polling), None
+    except StopIteration as done:
+        return None, done.value
+
+
+def wait_for_items(store, after=None, limit=None, timeout=0):
+    '''
+    Long polling в потоке обработчика (см. poll_items).
+    '''
+    polling = poll_items(store, after, limit, timeout)
+    while True:
+        pause, result = poll_step(polling)
+        if result is not None:
+            return result
+        time.sleep(pause)
+
+
+def feed_event(item):
+    data = json.dumps(VendorOrderItemSerializer(item).data, cls=DjangoJSONEncoder)
+    return f'id: {item.feed_position}\nevent: order_item\ndata: {data}\n\n'
+
+
+def event_stream(store, after=None, duration=None):
+    '''
+    Поток Server-Sent Events: новые позиции заказов отправляются по мере фиксации, между ними - комментарии keep-alive. Поток закрывается через duration секунд (по умолчанию VENDOR_FEED_STREAM_SECONDS), клиент переподключается с заголовком Last-Event-ID.
+    '''
+    deadline = time.monotonic() + (settings.VENDOR_FEED_STREAM_SECONDS if duration is None else duration)
+    yield f'retry: {settings.VENDOR_FEED_RETRY_MS}\n\n'
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        items, after = wait_for_items(store, after, None, min(settings.VENDOR_FEED_KEEPALIVE_SECONDS, remaining))
+        if not items:
+            yield ': keep-alive\n\n'
+        for item in items:
+            yield feed_event(item)
+
+
+class FeedWait(HttpResponse):
+    '''
+    Ответ ленты под ASGI, когда клиент ждет новых позиций (wait или stream): проверки доступа проходят в обработчике, а ожидание и тело ответа - в цикле событий AsgiRouter, поэтому ожидающий клиент не занимает поток.
+    '''
+
+    def __init__(self, store, after, limit, wait, stream):
+        super().__init__(content_type='text/event-stream' if stream else 'application/json')
+        self.store, self.after, self.limit, self.wait, self.stream = store, after, limit, wait, stream
@@ -1,5 +1,5 @@
 import json
-import random
+import os
 import threading
 
 import requests.utils
@@ -7,20 +7,20 @@ from django.conf import settings
 from django.contrib.auth.hashers import make_password, check_password
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.sites.shortcuts import get_current_site
+from django.core import signing
 from django.core.mail import EmailMessage
 from django.core.serializers import get_serializer
 from django.core.serializers.json import DjangoJSONEncoder
-from django.db import IntegrityError
-from django.db.models import Q
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch, Q
 from django.forms import forms
-from django.template.loader import render_to_string
 from django.utils.datastructures import MultiValueDictKeyError
-from django.utils.encoding import force_bytes, force_text
-from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+from django.utils.encoding import force_text
+from django.utils.http import urlsafe_base64_decode
 from drf_spectacular.utils import extend_schema, extend_schema_view
 from rest_framework import viewsets, status
 from rest_framework.authtoken.models import Token
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse, FileResponse, Http404
 from django.shortcuts import render, redirect
 from rest_framework.decorators import action, permission_classes, api_view, throttle_classes
 from rest_framework.generics import RetrieveDestroyAPIView, get_object_or_404
@@ -30,33 +30,38 @@ from rest_framework.views import APIView
 from datetime import datetime, timedelta
 import yaml
 from rest_framework.viewsets import ViewSet
-from silk.profiling.profiler import silk_profile
 
+from backend_code.archive import order_history_page
+from backend_code.basket import apply_operations, parse_operations, customer_basket, basket_quote, invalidate_basket_quote, \
+    invalidate_store_basket_quotes, invalidate_product_basket_quotes, BasketError
+from backend_code.checkout import checkout, CheckoutError
 from backend_code.custom_throttles import UserSignUpThrottle
+from backend_code.delivery import quote_baskets, quote_orders
+from backend_code.export_artifacts import bump_catalog_version, artifact_from_token
+from backend_code.jobs import start_vendor_job
+from backend_code.id_allocator import vendor_ids, store_category_ids, product_category_ids
 from backend_code.models import Product, ProductCategory, Store, Customer, Basket, ProductParameters, StoreCategory, \
-    Order, OrderItems
-from backend_code.permissions import IsAuthenticated, IsProductOwner, IsStoreCatOwner, IsOrderOwner
+    Order, OrderItems, ArchivedOrder, STATUS_CHOICES
+from backend_code.order_status import transition_orders
+from backend_code.outbox import enqueue
+from backend_code.pagination import page_limit
+from backend_code.permissions import IsAuthenticated, IsProductOwner, IsStoreCatOwner, IsOrderOwner, IsStaff
 from backend_code.serializers import ProductSerializer, CustomerSerializer, StoreSerializer, BasketSerializer, \
-    StoreCatSerializer, ProdCatSerializer, OrderSerializer, OrderDetailSerializer
+    StoreCatSerializer, ProdCatSerializer, OrderSerializer, OrderDetailSerializer, VendorOrderItemSerializer
+from backend_code.stock import release_stock
 from backend_code.token_gen import generate_token
+from backend_code.vendor_feed import ASYNC_WAIT_KEY, FeedWait, wait_for_items, event_stream
 
-from backend_code.tasks import send_mail_async, import_product_list_async, export_product_list_async
+from backend_code.tasks import import_product_list_async, export_product_list_async, order_status_emails_async, \
+    activation_email_async, order_email_async
 
 
 def send_activation_email(user, request):
     '''
     Отправка имейла после регистрации пользователя. Сообщение содержит ссылку для подтверждения адреса пользователя (необходимо для авторизации и дальнейшей работы).
     '''
-    current_site = get_current_site(request)
-    email_subject = "Activation email"
-    email_body = render_to_string('authentication/activate.html', {
-        'user': user,
-        'domain': current_site,
-        'uid': urlsafe_base64_encode(force_bytes(user.pk)),
-        'token': generate_token.make_token(user)
-    })
-
-    send_mail_async.delay(email_subject, email_body, settings.EMAIL_FROM_USER, [user.email_login])
+    # the worker loads the user and renders the message, only ids go through the outbox and the broker
+    enqueue(activation_email_async, user.id, get_current_site(request).domain)
 
 
 def activate_user(request, uidb64, token):
@@ -82,13 +87,7 @@ def order_confirmation_email(user, order, request):
     '''
     Отправка имейла для подтверждения заказа. Сообщение носит информативный характер, содержит сведения о пользователе и заказе.
     '''
-    email_subject = "Order confirmed"
-    email_body = render_to_string('confirmation/order_confirm.html', {
-        'user': user,
-        'order': order
-    })
-
-    send_mail_async.delay(email_subject, email_body, settings.EMAIL_FROM_USER, [user.email_login])
+    enqueue(order_email_async, 'order_confirmation', order.id, dedupe_key=f'order-confirmation:{order.id}')
 
 
 @extend_schema(tags=["Пользователь"], summary="Аутентификация пользователя")
@@ -97,7 +96,6 @@ class LoginView(APIView):
     Аутентификация пользователя. Требуется ввести имейл и пароль. Для успешной аутентификации необходимо сначала зарегистрироваться (class CustomerSignUp, path('user-signup/')) и подтвердить имейл по ссылке, которая приходит на указанный адрес.
     '''
 
-    @silk_profile(name='User login')
     def post(self, request, *args, **kwargs):
         if {'email_login', 'password'}.issubset(request.data):
             current_customer = Customer.objects.filter(email_login=request.data['email_login']).first()
@@ -135,7 +133,7 @@ class ProductViewSet(viewsets.ModelViewSet):
     '''
     С помощью данного url пользователь может найти товар по "слагу" (артикулу - stock number), а также найти товар по названию или модели (например, goods/?s=iphone). Для этих действий аутентифиация не требуется. Для удаления товара требуется аутентификация пользователя в системе, кроме того, пользователь должен быть владельцем этого товара (IsProductOwner).
     '''
-    queryset = Product.objects.all()
+    queryset = Product.objects.select_related('product_cat')
     lookup_field = 'slug'
     serializer_class = ProductSerializer
     search_fields = ['name', 'model']
@@ -145,20 +143,32 @@ class ProductViewSet(viewsets.ModelViewSet):
             self.permission_classes = [IsAuthenticated, IsProductOwner,]
         return super().get_permissions()
 
+    # cached exports of the store are outdated after any product change
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        bump_catalog_version([serializer.instance.delivery_store_id])
+        if {'price', 'weight_class'} & set(serializer.validated_data):
+            invalidate_product_basket_quotes([serializer.instance.id])
+
+    def perform_destroy(self, instance):
+        # the basket lines of the product are deleted with it, their customers are read before
+        invalidate_product_basket_quotes([instance.id])
+        super().perform_destroy(instance)
+        bump_catalog_version([instance.delivery_store_id])
+
 
 @extend_schema(tags=["Импорт товаров"], summary="Импорт списка товаров поставщика")
 class VendorSupply(APIView):
     '''
-    Импорт списка товаров поставщика из файла yaml. Для успешного импорта идентификатор текущего пользователя (vendor_id) должен соответствовать идентификатору (vendor_id) в файле yaml. Функция выполняется асинхронно с помощью celery. Пользователь получает имейл с информацией об успешном или неуспешном завершении операции. При этом работа веб-приложения не останавливается.
+    Импорт списка товаров поставщика из файла yaml. Для успешного импорта идентификатор текущего пользователя (vendor_id) должен соответствовать идентификатору (vendor_id) в файле yaml. Функция выполняется асинхронно с помощью celery. Пользователь получает имейл с информацией об успешном или неуспешном завершении операции. При этом работа веб-приложения не останавливается. Для поставщика одновременно выполняется не больше одного импорта: повторный запрос, пока импорт в очереди или выполняется, присоединяется к нему (в ответе тот же Job и Attached = True).
     '''
     permission_classes = [IsAuthenticated,]
 
     # update vendor's product list
-    @silk_profile(name='Vendor supply list')
     def post(self, request, *args, **kwargs):
         file = "goods_yaml.yaml"
-        import_product_list_async.delay(file, request.data)
-        return JsonResponse({'Status': True, 'Message': 'Details will be sent to your email'})
+        job, attached = start_vendor_job('import', request.data['email_login'], lambda job: import_product_list_async.delay(file, request.data, job))
+        return JsonResponse({'Status': True, 'Message': 'Details will be sent to your email', 'Job': job, 'Attached': attached})
 
 
 @extend_schema(tags=["Пользователь"], summary="Регистрация нового пользователя")
@@ -168,7 +178,6 @@ class CustomerSignUp(APIView):
     '''
     throttle_classes = [UserSignUpThrottle]
 
-    @silk_profile(name='User sign up')
     def post(self, request, *args, **kwargs):
         if {'first_name', 'last_name', 'email_login', 'password', 'user_name', 'phone_number', 'area_code', 'registered_vendor', 'is_active'}.issubset(request.data):
             try:
@@ -181,14 +190,15 @@ class CustomerSignUp(APIView):
             request.data._mutable = True
             request.data['password'] = make_password(request.data['password'])
             if request.data['registered_vendor'] == 'True':
-                # request.data['seller_vendor_id'] = 56120
-                request.data['seller_vendor_id'] = random.randint(200,20000)
+                request.data['seller_vendor_id'] = vendor_ids.next_id()
             else:
                 request.data['seller_vendor_id'] = None
             user_serializer = CustomerSerializer(data=request.data)
             if user_serializer.is_valid():
-                current_user = user_serializer.save()
-                send_activation_email(current_user, request)
+                # the activation email is written to the outbox together with the user
+                with transaction.atomic():
+                    current_user = user_serializer.save()
+                    send_activation_email(current_user, request)
                 return Response(user_serializer.data, status=201)
             else:
                 return JsonResponse({'Status': False, 'Error': user_serializer.errors}, status=401)
@@ -229,8 +239,7 @@ class CustomerViewSet(viewsets.ModelViewSet):
                 return JsonResponse({'Status': False, 'Errors': {'password': pass_errors}}, status=401)
         current_customer = self.get_object()
         if request.data.get('registered_vendor') == 'True' and not current_customer.seller_vendor_id:
-            # request.data['seller_vendor_id'] = 56120
-            request.data['seller_vendor_id'] = random.randint(200,20000)
+            request.data['seller_vendor_id'] = vendor_ids.next_id()
         serializer = CustomerSerializer(current_customer, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
@@ -314,6 +323,8 @@ class StoreViewSet(viewsets.ModelViewSet):
                 serializer = StoreSerializer(current_store, data=request.data, partial=True)
                 if serializer.is_valid():
                     serializer.save()
+                    if 'nominal_delivery_price' in serializer.validated_data:
+                        invalidate_store_basket_quotes(current_store)
                     return Response(serializer.data, status=200)
                 else:
                     return JsonResponse({'Status': False, 'Error': serializer.errors}, status=401)
@@ -333,7 +344,7 @@ class StoreViewSet(viewsets.ModelViewSet):
         summary='Добавление товара в корзину, обновление товара в корзине'))
 class BasketViewSet(viewsets.ModelViewSet):
     '''
-    По этому url можно получить список товаров в корзине для текущего пользователя, добавить товар в корзину (обновить товар в корзине) и удалить товар из корзины. Для всех действий требуется аутентификация. Для обработки запроса list надо указать имейл пользователя, для destroy - имейл и актикул товара (stock_number), для create - имейл, артикул и количество товара. Метод POST (create) обрабатывает запросы на добавление и обновление товара в корзине. Артикул товара передается не через "слаг", а через тело запроса.
+    По этому url можно получить список товаров в корзине для текущего пользователя, добавить товар в корзину (обновить товар в корзине) и удалить товар из корзины. Для всех действий требуется аутентификация. Для обработки запроса list надо указать имейл пользователя, для destroy - имейл и актикул товара (stock_number), для create - имейл, артикул и количество товара. Метод POST (create) обрабатывает запросы на добавление и обновление товара в корзине. Артикул товара передается не через "слаг", а через тело запроса. Вместо одного товара можно передать список операций items: [{"stock_number": ..., "amount": ..., "op": "set" | "increment" | "remove"}], тогда все изменения применяются одним пакетом, а в ответе возвращается вся корзина. По url basket-quote/ можно получить итоги корзины: количество товаров, общую стоимость и стоимость обычной и экспресс-доставки (с учетом региона пользователя).
     '''
     queryset = Basket.objects.all()
     serializer_class = BasketSerializer
@@ -341,27 +352,40 @@ class BasketViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         current_customer = Customer.objects.filter(email_login=self.request.data['email_login']).first()
-        return Basket.objects.filter(b_customer=current_customer.id).all()
+        return customer_basket(current_customer)
 
     # basket create and update
     def create(self, request, *args, **kwargs):
-        if {'stock_number', 'amount'}.issubset(request.data):
+        current_customer = Customer.objects.filter(email_login=self.request.data['email_login']).first()
+        # batch of operations: [{'stock_number': ..., 'amount': ..., 'op': 'set' | 'increment' | 'remove'}]
+        if {'items'}.issubset(request.data):
             try:
-                current_customer = Customer.objects.filter(email_login=self.request.data['email_login']).first()
-                basket_product = Product.objects.filter(stock_number=request.data['stock_number']).first()
-                basket_vendor = Store.objects.filter(delivery_by_store=basket_product, status=True).first()
-                if basket_product and basket_vendor:
-                    new_purchase_item, _ = Basket.objects.update_or_create(b_product=basket_product,
-                     b_customer=current_customer,
-                     b_vendor=basket_vendor,
-                     defaults={'amount': request.data['amount']})
-                    basket_serializer = BasketSerializer(new_purchase_item)
-                    return Response(basket_serializer.data, status=200)
-                return JsonResponse({'Status': False, 'Errors': 'Product or store not found'}, status=404)
+                items = request.data['items']
+                if isinstance(items, str):
+                    items = json.loads(items)
+                apply_operations(current_customer, parse_operations(items))
             except ValueError as err:
                 return JsonResponse({'Status': False, 'Error': 'Invalid data'}, status=401)
+            except BasketError as err:
+                return JsonResponse({'Status': False, 'Error': err.error}, status=err.status)
+            return Response(BasketSerializer(customer_basket(current_customer), many=True).data, status=200)
+        if {'stock_number', 'amount'}.issubset(request.data):
+            try:
+                apply_operations(current_customer, parse_operations([{'stock_number': request.data['stock_number'], 'amount': request.data['amount']}]))
+            except BasketError as err:
+                if err.status == 404:
+                    return JsonResponse({'Status': False, 'Errors': 'Product or store not found'}, status=404)
+                return JsonResponse({'Status': False, 'Error': err.error}, status=err.status)
+            new_purchase_item = customer_basket(current_customer).get(b_product__stock_number=request.data['stock_number'])
+            return Response(BasketSerializer(new_purchase_item).data, status=200)
         return JsonResponse({'Status': False, 'Error': 'Please fill all required fields'}, status=401)
 
+    # basket totals and delivery cost
+    @extend_schema(summary='Стоимость товаров в корзине и стоимость доставки')
+    def quote(self, request, *args, **kwargs):
+        current_customer = Customer.objects.filter(email_login=request.data['email_login']).first()
+        return Response(basket_quote(current_customer), status=200)
+
     # basket delete
     def destroy(self, request, *args, **kwargs):
         if {'stock_number'}.issubset(request.data):
@@ -369,6 +393,7 @@ class BasketViewSet(viewsets.ModelViewSet):
                 current_item = self.get_queryset().filter(b_product__stock_number=request.data['stock_number']).first()
                 if current_item:
                     current_item.delete()
+                    invalidate_basket_quote(current_item.b_customer_id)
                     return JsonResponse({'Status': True, 'Message': 'Item removed from basket'}, status=200)
                 else:
                     return JsonResponse({'Status': False, 'Error': 'Item not found'}, status=404)
@@ -393,8 +418,13 @@ class StoreCatViewSet(viewsets.ModelViewSet):
     serializer_class = StoreCatSerializer
     permission_classes = [IsAuthenticated, IsStoreCatOwner,]
 
+    def get_queryset(self):
+        # stores of the category with their vendors and categories are loaded up front for StoreCatSerializer
+        return StoreCategory.objects.select_related('store_cat_creator').prefetch_related(
+            Prefetch('stores', queryset=Store.objects.select_related('vendor_id').prefetch_related('cats')))
+
     def get_object(self):
-        obj = get_object_or_404(StoreCategory, store_cat_id=self.request.data['store_cat_id'])
+        obj = get_object_or_404(self.get_queryset(), store_cat_id=self.request.data['store_cat_id'])
         self.check_object_permissions(self.request, obj)
         return obj
 
@@ -406,12 +436,13 @@ class StoreCatViewSet(viewsets.ModelViewSet):
                     try:
                         store_cat_id = int(request.data.get('store_cat_id'))
                     except ValueError as err:
-                        store_cat_id = random.randint(100, 2000000)
+                        store_cat_id = store_category_ids.next_id()
                 else:
-                    store_cat_id = random.randint(100, 2000000)
+                    store_cat_id = store_category_ids.next_id()
                 current_customer = Customer.objects.filter(email_login=request.data['email_login']).first()
                 store_cat, _ = StoreCategory.objects.update_or_create(store_cat_id=store_cat_id, store_cat_creator=current_customer, defaults={'name': request.data['name']})
-                store_cat__ser = StoreCatSerializer(store_cat)
+                # an updated category can have many stores: reloaded with the prefetch of get_queryset
+                store_cat__ser = StoreCatSerializer(self.get_queryset().get(pk=store_cat.pk))
                 return Response(store_cat__ser.data, status=200)
             except IntegrityError as err:
                 return JsonResponse({'Status': False, 'Error': 'Category cannot be updated.'}, status=406)
@@ -471,7 +502,7 @@ class ProductCatViewSet(viewsets.ModelViewSet):
             if request.data.get('prod_cat_id'):
                 prod_cat_id = request.data.get('prod_cat_id')
             else:
-                prod_cat_id = random.randint(100, 2000000)
+                prod_cat_id = product_category_ids.next_id()
             try:
                 prod_cat, _ = ProductCategory.objects.update_or_create(prod_cat_id=prod_cat_id, defaults={'name': request.data['name']},)
                 return Response(ProdCatSerializer(prod_cat).data, status=200)
@@ -502,7 +533,7 @@ class ProductCatViewSet(viewsets.ModelViewSet):
         summary='Создание заказа пользователя'))
 class OrderViewSet(viewsets.ModelViewSet):
     '''
-    По данному url можно просмотреть список заказов пользователя, удалить заказ и создать заказ. Изменение созданного заказа в веб-приложении не предусмотрено. Пользователь может удалить свой заказ, только если он еще не был отгружен (dispatched). При создании заказа надо указать параметр "экспресс-доставки" (True/False). При создании заказа стоимость доставки рассчитывается в зависимости от поставщика, габаритов (weight_class), региона (area_code) и экспресс-доставки. После создания заказа корзина автоматически очищается. Если корзина пуста или пользователь не указал при регистрации свой адрес, заказ не оформляется. Метод GET (order_list) выдает сведения обо всех заказах пользователя (без деталей). Для выполнения всех действий требуется аутентификация. Для просмотра заказов и удаления заказа пользователь должен быть владельцем заказа (IsOrderOwner).
+    По данному url можно просмотреть список заказов пользователя, удалить заказ и создать заказ. Изменение созданного заказа в веб-приложении не предусмотрено. Пользователь может удалить свой заказ, только если он еще не был отгружен (dispatched). При создании заказа надо указать параметр "экспресс-доставки" (True/False). При создании заказа стоимость доставки рассчитывается в зависимости от поставщика, габаритов (weight_class), региона (area_code) и экспресс-доставки. При создании заказа товар резервируется на складе (если какого-либо товара не хватает, заказ не оформляется), при удалении заказа резерв возвращается. После создания заказа корзина автоматически очищается. Если корзина пуста или пользователь не указал при регистрации свой адрес, заказ не оформляется. Метод GET (order_list) выдает сведения о заказах пользователя (без деталей) постранично, от новых к старым: размер страницы задается параметром limit, следующая страница запрашивается с параметром before (значение next из предыдущего ответа), параметр status позволяет выбрать заказы с определенным статусом. Завершенные заказы, перенесенные в архив (см. archive.py), отдаются в той же ленте: архивная таблица запрашивается, только когда клиент пролистал заказы основной таблицы. Для выполнения всех действий требуется аутентификация. Для просмотра заказов и удаления заказа пользователь должен быть владельцем заказа (IsOrderOwner).
     '''
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
@@ -515,61 +546,33 @@ class OrderViewSet(viewsets.ModelViewSet):
     def create(self, request, *args, **kwargs):
         if {'express_delivery'}.issubset(request.data):
             current_customer = Customer.objects.filter(email_login=request.data['email_login']).first()
-            basket_ = Basket.objects.filter(b_customer=current_customer)
-            if not basket_:
-                return JsonResponse({'Status': False, 'Error': 'Basket empty'}, status=404)
-            else:
-                if not current_customer.address:
-                    return JsonResponse({'Status': False, 'Error': 'Please provide customer address'}, status=401)
-                else:
-                # calculating max nominal delivery price and max weight class for all products in basket; actual delivery price and weight class is equal to the largest figure
-                    vendor_nominal_del = []
-                    basket_pr_weight = []
-                    total_price = 0
-                    for basket_item in basket_:
-                        vendor_nominal_del.append(basket_item.b_vendor.nominal_delivery_price)
-                        basket_pr_weight.append(basket_item.b_product.weight_class)
-                        # adding the price of all products in basket
-                        total_price += basket_item.b_product.price
-
-                    request.data._mutable = True
-                    request.data['order_customer'] = current_customer.id
-                    request.data['order_number'] = random.randint(2000,200000000)
-                    request.data['status'] = 'new'
-                    request.data['area_code'] = current_customer.area_code
-                    weight_cl_ = max(basket_pr_weight)
-                    del_price = max(vendor_nominal_del)
-                    request.data['total_price'] = total_price
-                    if request.data['express_delivery'] == "True":
-                        express_delivery = 3
-                    else:
-                        express_delivery = 1
-                    request.data['final_delivery_price'] = int(request.data['area_code']) * int(del_price) * int(weight_cl_) * int(express_delivery)
-
-                    order_creation = OrderSerializer(data=request.data, partial=True)
-                    if order_creation.is_valid():
-                        current_order = order_creation.save()
-                    else:
-                        return JsonResponse(
-                                {'Status': False,
-                                 'Error': order_creation.errors}, status=401)
-                    for basket_item in basket_:
-                        current_product = Product.objects.filter(id=basket_item.b_product.id).first()
-                        order_item = OrderItems.objects.create(number_of_order=current_order, order_product=current_product, order_prod_vendor=basket_item.b_vendor, order_prod_amount=basket_item.amount)
-                    basket_.delete()
+            try:
+                with transaction.atomic():
+                    current_order, order_data = checkout(current_customer, request.data['express_delivery'])
                     order_confirmation_email(current_customer, current_order, request)
-                    return Response(order_creation.data, status=201)
+            except CheckoutError as err:
+                return JsonResponse({'Status': False, 'Error': err.error}, status=err.status)
+            return Response(order_data, status=201)
         return JsonResponse({'Status': False, 'Error': 'Please provide express delivery info'}, status=401)
 
     # orders view
     @extend_schema(summary="Список заказов пользователя")
     def order_list(self, request, *args, **kwargs):
+        params = {name: request.query_params.get(name, request.data.get(name)) for name in ('status', 'before', 'limit')}
         order_set = self.get_queryset()
-        if order_set:
-            order_set_ser = OrderSerializer(order_set, many=True)
-            return Response(order_set_ser.data, status=200)
-        else:
+        archived_set = ArchivedOrder.objects.filter(order_customer__email_login=request.data['email_login'])
+        if params['status']:
+            if params['status'] not in dict(STATUS_CHOICES):
+                return JsonResponse({'Status': False, 'Error': 'Unknown order status'}, status=401)
+            order_set = order_set.filter(status=params['status'])
+            archived_set = archived_set.filter(status=params['status'])
+        try:
+            orders, next_cursor = order_history_page(order_set, archived_set, before=params['before'], limit=params['limit'])
+        except ValueError as err:
+            return JsonResponse({'Status': False, 'Error': 'Invalid data'}, status=401)
+        if not orders and not params['before']:
             return JsonResponse({'Status': False, 'Error': 'You have no orders'}, status=404)
+        return Response({'results': OrderSerializer(orders, many=True).data, 'next': next_cursor}, status=200)
 
     # order delete
     def destroy(self, request, *args, **kwargs):
@@ -580,7 +583,9 @@ class OrderViewSet(viewsets.ModelViewSet):
                     return JsonResponse({'Status': False, 'Error': 'Order not found'}, status=404)
                 else:
                     if current_order.status == 'new' or current_order.status == 'confirmed' or current_order.status == 'assembled':
-                        current_order.delete()
+                        with transaction.atomic():
+                            release_stock([current_order])
+                            current_order.delete()
                         return JsonResponse({'Status': True, 'Message': 'Order deleted'}, status=200)
                     else:
                         return JsonResponse({'Status': False, 'Error': f'Order {request.data["order_number"]} cannot be deleted as it has already been dispatched. If you dont pick it up, it will be automatically cancelled'}, status=406)
@@ -589,29 +594,150 @@ class OrderViewSet(viewsets.ModelViewSet):
         return JsonResponse({'Status': False, 'Error': 'Please provide order number'}, status=401)
 
 
+@extend_schema(tags=['Заказ'], summary='Пакетная смена статуса заказов поставщиком')
+class VendorOrderStatusView(APIView):
+    '''
+    Пакетная смена статуса заказов поставщиком. Передается список номеров заказов (order_numbers) и новый статус (status). Допустимые переходы: new -> confirmed -> assembled -> dispatched -> delivered, отменить (canceled) можно любой не доставленный заказ. Изменить статус можно только у заказов, все товары которых принадлежат магазину текущего пользователя. В ответе возвращаются измененные заказы и причины отказа для остальных. Покупатели получают уведомления об изменении статуса одной пакетной рассылкой.
+    '''
+    permission_classes = [IsAuthenticated,]
+
+    def post(self, request, *args, **kwargs):
+        if {'order_numbers', 'status'}.issubset(request.data):
+            current_store = Store.objects.filter(vendor_id__email_login=request.data['email_login']).first()
+            if not current_store:
+                return JsonResponse({'Status': False, 'Error': 'Store not found'}, status=404)
+            if request.data['status'] not in dict(STATUS_CHOICES):
+                return JsonResponse({'Status': False, 'Error': 'Unknown order status'}, status=401)
+            try:
+                order_numbers = request.data['order_numbers']
+                if isinstance(order_numbers, str):
+                    order_numbers = json.loads(order_numbers)
+                order_numbers = list(dict.fromkeys(int(order_number) for order_number in order_numbers))
+            except (TypeError, ValueError) as err:
+                return JsonResponse({'Status': False, 'Error': 'Invalid data'}, status=401)
+            if len(order_numbers) > settings.ORDER_STATUS_BATCH_LIMIT:
+                return JsonResponse({'Status': False, 'Error': f'No more than {settings.ORDER_STATUS_BATCH_LIMIT} orders per request'}, status=401)
+            with transaction.atomic():
+                updated_ids, updated, failed = transition_orders(current_store, order_numbers, request.data['status'])
+                if updated_ids:
+                    enqueue(order_status_emails_async, updated_ids)
+            return JsonResponse({'Status': True, 'Updated': updated, 'Failed': failed}, status=200)
+        return JsonResponse({'Status': False, 'Error': 'Please provide order numbers and status'}, status=401)
+
+
+@extend_schema(tags=['Заказ'], summary='Лента новых позиций заказов поставщика')
+class VendorOrderFeedView(APIView):
+    '''
+    Лента позиций заказов с товарами магазина текущего пользователя, по возрастанию id. Позиции идут в порядке оформления заказов (feed_position, а не id: заказы фиксируются не в порядке id). Параметр after - значение next из предыдущего ответа (или feed_position последней полученной позиции), limit - размер страницы. С параметром wait (секунды, не больше VENDOR_FEED_MAX_WAIT) запрос ждет появления новых позиций (long polling). Ожидание без потока обработчика возможно только под ASGI (backend_code.async_views), в WSGI-приложении ожидание и поток ограничены VENDOR_FEED_SYNC_MAX_WAIT секундами. С параметром stream = True ответ отдается потоком Server-Sent Events (text/event-stream): новые позиции отправляются сразу после оформления заказа, при переподключении продолжение определяется заголовком Last-Event-ID.
+    '''
+    permission_classes = [IsAuthenticated,]
+
+    def get(self, request, *args, **kwargs):
+        params = {name: request.query_params.get(name, request.data.get(name)) for name in ('after', 'limit', 'wait', 'stream')}
+        current_store = Store.objects.filter(vendor_id__email_login=request.data['email_login']).first()
+        if not current_store:
+            return JsonResponse({'Status': False, 'Error': 'Store not found'}, status=404)
+        try:
+            after = int(request.headers.get('Last-Event-ID') or params['after'] or 0)
+            limit, wait = page_limit(params['limit']), float(params['wait'] or 0)
+            stream = params['stream'] in (True, 'True', 'true')
+            if request.META.get(ASYNC_WAIT_KEY) and (stream or wait > 0):
+                # the ASGI router waits for the items in its event loop
+                response = FeedWait(current_store, after, limit, wait, stream)
+            elif stream:
+                response = StreamingHttpResponse(event_stream(current_store, after, min(settings.VENDOR_FEED_STREAM_SECONDS, settings.VENDOR_FEED_SYNC_MAX_WAIT)), content_type='text/event-stream')
+            else:
+                items, next_cursor = wait_for_items(current_store, after, limit, min(wait, settings.VENDOR_FEED_SYNC_MAX_WAIT))
+                return Response({'results': VendorOrderItemSerializer(items, many=True).data, 'next': next_cursor}, status=200)
+        except ValueError as err:
+            return JsonResponse({'Status': False, 'Error': 'Invalid data'}, status=401)
+        if stream:
+            response['Cache-Control'] = 'no-cache'
+            # nginx must pass events through without buffering
+            response['X-Accel-Buffering'] = 'no'
+        return response
+
+
 @extend_schema(tags=['Подробности заказа'])
 @extend_schema_view(
     retrieve=extend_schema(
         summary='Детали одного заказа пользователя'))
 class OrderDetailViewSet(viewsets.ModelViewSet):
     '''
-    По этому url можно просмотреть полные сведения об определенном заказе пользователя. Номер заказа передается через slug. Для просмотра требуется аутентификация, кроме того, пользователь должен быть владельцем заказа (IsOrderOwner). Информация о товарах в заказе выводится с помощью сериализаторов OrderItemSerializer, ProductSerializer.
+    По этому url можно просмотреть полные сведения об определенном заказе пользователя. Номер заказа передается через slug. Для просмотра требуется аутентификация, кроме того, пользователь должен быть владельцем заказа (IsOrderOwner). Информация о товарах в заказе выводится с помощью сериализаторов OrderItemSerializer, ProductSerializer. Позиции заказа, товары и категории загружаются заранее (prefetch), поэтому количество запросов не зависит от размера заказа. Если заказа нет в основной таблице, он ищется в архиве.
     '''
-    queryset = Order.objects.all()
+    queryset = Order.objects.select_related('order_customer').prefetch_related(
+        Prefetch('order_items_number', queryset=OrderItems.objects.select_related('order_product__product_cat')))
     serializer_class = OrderDetailSerializer
     lookup_field = 'order_slug'
     permission_classes = [IsAuthenticated, IsOrderOwner]
 
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            # orders moved to the archive are still available by their slug
+            self.queryset = ArchivedOrder.objects.select_related('order_customer').prefetch_related('order_items_number__order_product__product_cat')
+            return super().get_object()
+
+
+@extend_schema(tags=["Доставка"], summary="Пакетный расчет стоимости доставки (для сотрудников)")
+class DeliveryQuoteView(APIView):
+    '''
+    Пакетный пересчет стоимости доставки для всех открытых корзин (target = baskets) или для заказов (target = orders). Расчет выполняется в БД одним запросом. Параметр nominal_prices ({store_id: цена}) позволяет смоделировать изменение номинальной стоимости доставки магазинов, express_delivery - рассчитать экспресс-доставку для корзин. Результат выдается страницами (limit, after - значение next из предыдущего ответа). Доступно только сотрудникам (is_staff).
+    '''
+    permission_classes = [IsAuthenticated, IsStaff]
+
+    def post(self, request, *args, **kwargs):
+        target = request.data.get('target', 'baskets')
+        if target not in ('baskets', 'orders'):
+            return JsonResponse({'Status': False, 'Error': 'Unknown quote target'}, status=401)
+        try:
+            nominal_prices = request.data.get('nominal_prices') or {}
+            if isinstance(nominal_prices, str):
+                nominal_prices = json.loads(nominal_prices)
+            nominal_prices = {int(store_id): float(price) for store_id, price in nominal_prices.items()}
+            after = int(request.data['after']) if request.data.get('after') else None
+            limit = int(request.data['limit']) if request.data.get('limit') else None
+            if target == 'baskets':
+                quotes = list(quote_baskets(nominal_prices=nominal_prices, express_delivery=request.data.get('express_delivery') in (True, 'True'), after=after, limit=limit))
+                key = 'b_customer'
+            else:
+                quotes = list(quote_orders(nominal_prices=nominal_prices, after=after, limit=limit))
+                key = 'number_of_order'
+        except (AttributeError, ValueError) as err:
+            return JsonResponse({'Status': False, 'Error': 'Invalid data'}, status=401)
+        return JsonResponse({'results': quotes, 'next': quotes[-1][key] if quotes else None}, status=200)
+
 
 @extend_schema(tags=["Экспорт товаров"], summary="Экспорт списка товаров поставщика и отправка на имейл")
 class ProductExportViewSet(viewsets.ModelViewSet):
     '''
-    Экспорт списка товаров поставщика в файл yaml и отправка в виде вложения на его адрес эл. почты. Функция выполняется асинхронно с помощью celery. При этом работа веб-приложения не останавливается.
+    Экспорт списка товаров поставщика в файл yaml (gzip) и отправка на его адрес эл. почты подписанной ссылки для скачивания (действительна EXPORT_LINK_MAX_AGE секунд). Функция выполняется асинхронно с помощью celery. При этом работа веб-приложения не останавливается. Если каталог магазина не менялся (catalog_version), используется готовая выгрузка. Повторный запрос, пока экспорт поставщика в очереди или выполняется, присоединяется к нему.
     '''
     permission_classes = [IsAuthenticated,]
 
     # export all products by specific vendor
     def export_product_list(self, request, *args, **kwargs):
-        file = "export_file.yaml"
-        export_product_list_async.delay(file, request.data)
-        return JsonResponse({'Status': True, 'Message': 'Details will be sent to your email'})
+        domain = get_current_site(request).domain
+        job, attached = start_vendor_job('export', request.data['email_login'], lambda job: export_product_list_async.delay(domain, request.data, job))
+        return JsonResponse({'Status': True, 'Message': 'Details will be sent to your email', 'Job': job, 'Attached': attached})
+
+
+@extend_schema(tags=["Экспорт товаров"], summary="Скачивание выгрузки товаров по подписанной ссылке")
+class ExportDownloadView(APIView):
+    '''
+    Скачивание выгрузки товаров по ссылке из письма. Ссылка подписана (django.core.signing) и действительна EXPORT_LINK_MAX_AGE секунд, аутентификация не требуется. Файл отдается потоком (FileResponse), без загрузки в память.
+    '''
+    permission_classes = [AllowAny,]
+
+    def get(self, request, token, *args, **kwargs):
+        try:
+            path = artifact_from_token(token)
+        except signing.SignatureExpired:
+            return JsonResponse({'Status': False, 'Error': 'Download link expired, please request the export again'}, status=410)
+        except signing.BadSignature:
+            return JsonResponse({'Status': False, 'Error': 'Invalid download link'}, status=403)
+        except FileNotFoundError:
+            return JsonResponse({'Status': False, 'Error': 'Export expired, please request the export again'}, status=410)
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=os.path.basename(path), content_type='application/gzip')
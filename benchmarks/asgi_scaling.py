@@ -0,0 +1,114 @@
+'''
+Сравнение WSGI (gunicorn, синхронные процессы) и ASGI (gunicorn с процессами uvicorn, асинхронные представления чтения) при одинаковом количестве процессов: пропускная способность и задержки сценария чтения (benchmarks.load.READ_SCENARIO) при росте числа одновременных клиентов, а также память процессов сервера (RSS) после нагрузки.
+
+Оба сервера запускаются этим скриптом на свободных портах с БД из настроек:
+    python -m benchmarks.asgi_scaling --workers 2 --concurrency 1 8 32 --duration 20 --slow-clients 4 --output scaling.json
+На локальной БД обработка запроса упирается в процессор (GIL), и разница видна только при ожидании ввода-вывода: --slow-clients открывает соединения, передающие заголовки запроса по байту в секунду (медленная мобильная сеть).
+'''
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+from benchmarks.load import READ_SCENARIO, run_load, seed
+
+SERVERS = {
+    'wsgi': lambda port, workers: ['gunicorn', 'marketplace.wsgi:application', '--bind', f'127.0.0.1:{port}', '--workers', str(workers)],
+    'asgi': lambda port, workers: ['gunicorn', 'marketplace.asgi:application', '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+                                   '--worker-class', 'uvicorn.workers.UvicornWorker'],
+}
+
+
+def process_tree(pid):
+    children = []
+    for task in os.listdir(f'/proc/{pid}/task'):
+        with open(f'/proc/{pid}/task/{task}/children') as file:
+            children.extend(int(child) for child in file.read().split())
+    return [pid] + [process for child in children for process in process_tree(child)]
+
+
+def rss_bytes(pid):
+    # resident memory of the server and its worker processes (Linux /proc)
+    total = 0
+    for process in process_tree(pid):
+        with open(f'/proc/{process}/status') as file:
+            total += next(int(line.split()[1]) for line in file if line.startswith('VmRSS:')) * 1024
+    return total
+
+
+def slow_client(port, stop):
+    # a client on a slow network: the request arrives a byte at a time
+    with socket.create_connection(('127.0.0.1', port)) as connection:
+        connection.sendall(b'GET /api/v1/goods/ HTTP/1.1\r\nHost: localhost\r\n')
+        while not stop.wait(1):
+            try:
+                connection.sendall(b'X')
+            except OSError:
+                return
+
+
+def start_server(kind, port, workers):
+    # throttling would reject most of the load
+    environment = dict(os.environ, THROTTLE_ANON_RATE='1000000/min', THROTTLE_USER_RATE='1000000/min')
+    server = subprocess.Popen(SERVERS[kind](port, workers), env=environment)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f'http://127.0.0.1:{port}/api/v1/goods/', timeout=1)
+            return server
+        except requests.RequestException:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f'{kind} server did not start')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='WSGI vs ASGI read throughput at the same number of processes')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--slow-clients', type=int, default=0, help='Connections sending their request a byte per second during the load')
+    parser.add_argument('--output', help='JSON report path, stdout by default')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'marketplace.settings')
+    import django
+    django.setup()
+    seeded = seed(max(args.concurrency))
+    results = []
+    for offset, kind in enumerate(SERVERS):
+        server = start_server(kind, args.port + offset, args.workers)
+        stop = threading.Event()
+        for _ in range(args.slow_clients):
+            threading.Thread(target=slow_client, args=(args.port + offset, stop), daemon=True).start()
+        try:
+            for concurrency in args.concurrency:
+                report = run_load(f'http://127.0.0.1:{args.port + offset}', seeded, concurrency, args.duration, args.seed, READ_SCENARIO)
+                durations = [endpoint['p95_ms'] for endpoint in report['endpoints'].values()]
+                results.append({'server': kind, 'workers': args.workers, 'concurrency': concurrency, 'slow_clients': args.slow_clients, 'throughput_rps': report['throughput_rps'],
+                                'worst_p95_ms': max(durations) if durations else None, 'rss_mb': round(rss_bytes(server.pid) / 2 ** 20, 1),
+                                'errors': sum(endpoint['errors'] for endpoint in report['endpoints'].values()), 'endpoints': report['endpoints']})
+                print(f'{kind} x{args.workers} concurrency={concurrency}: {results[-1]["throughput_rps"]} rps, '
+                      f'worst p95 {results[-1]["worst_p95_ms"]} ms, {results[-1]["rss_mb"]} MB', file=sys.stderr)
+        finally:
+            stop.set()
+            server.terminate()
+            server.wait()
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
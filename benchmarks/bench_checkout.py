@@ -0,0 +1,30 @@
+import time
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from backend_code.checkout import checkout
+from backend_code.models import Product
+from benchmarks.conftest import seed_products, seed_basket, report
+
+ROUNDS = 5
+
+
+# checkout latency and query count for 1-, 20- and 200-item baskets
+@pytest.mark.django_db(transaction=True)
+def test_bench_checkout(bench_customer, bench_store, bench_product_cat):
+    rows = []
+    for size in (1, 20, 200):
+        products = seed_products(bench_store, bench_product_cat, size)
+        timings = []
+        for _ in range(ROUNDS):
+            seed_basket(bench_customer, bench_store, products)
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                checkout(bench_customer, 'False')
+                timings.append(time.perf_counter() - started)
+        rows.append({'items': size, 'queries': len(queries), 'best_ms': round(min(timings) * 1000, 2), 'avg_ms': round(sum(timings) / ROUNDS * 1000, 2)})
+        Product.objects.filter(id__in=[product.id for product in products]).delete()
+    report('checkout', rows)
+    assert len({row['queries'] for row in rows}) == 1
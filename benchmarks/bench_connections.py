@@ -0,0 +1,49 @@
+import time
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import Client
+
+from benchmarks.conftest import report, seed_products
+
+REQUESTS = 300
+
+
+def per_request(client, url, count):
+    started = time.perf_counter()
+    for _ in range(count):
+        # throttling counters live in the cache
+        cache.clear()
+        assert client.get(url).status_code == 200
+    return (time.perf_counter() - started) / count
+
+
+# latency of a short request (goods/<slug>/) with a connection per request and with a persistent connection;
+# run against Postgres to see the connection setup cost, an in-memory SQLite connection is never closed
+@pytest.mark.django_db(transaction=True)
+def test_bench_connections(bench_store, bench_product_cat):
+    product = seed_products(bench_store, bench_product_cat, 1)[0]
+    url = f'/api/v1/goods/{product.slug}/'
+    client = Client()
+    opened = []
+    connection_created.connect(lambda connection, **kwargs: opened.append(connection.alias), weak=False, dispatch_uid='bench_connections')
+    rows = []
+    max_age_setting = connection.settings_dict['CONN_MAX_AGE']
+    try:
+        for mode, max_age in (('per-request', 0), ('persistent', 600)):
+            connection.settings_dict['CONN_MAX_AGE'] = max_age
+            connection.close()
+            per_request(client, url, 10)
+            opened.clear()
+            latency = per_request(client, url, REQUESTS)
+            rows.append({'mode': mode, 'connections_opened': len(opened), 'latency_ms': round(latency * 1000, 3)})
+    finally:
+        connection.settings_dict['CONN_MAX_AGE'] = max_age_setting
+        connection_created.disconnect(dispatch_uid='bench_connections')
+    report(f'goods/<slug>/ latency, {connection.vendor}', rows)
+    if connection.vendor == 'postgresql':
+        assert rows[0]['connections_opened'] == REQUESTS
+        assert rows[1]['connections_opened'] == 0
+        assert rows[1]['latency_ms'] < rows[0]['latency_ms']
@@ -0,0 +1,41 @@
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+from django.db import connection
+from django.test import override_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+from benchmarks.conftest import report
+from benchmarks.load import run_load, seed
+from marketplace.celery import app as celery_app
+
+# LOAD_CONCURRENCY, LOAD_DURATION (seconds) and LOAD_OUTPUT (JSON report path) configure the run
+CONCURRENCY = int(os.environ.get('LOAD_CONCURRENCY', 4))
+DURATION = float(os.environ.get('LOAD_DURATION', 5))
+
+
+@pytest.fixture
+def eager_celery():
+    # tasks run in place of a broker
+    celery_app.conf.task_always_eager = True
+    yield
+    celery_app.conf.task_always_eager = False
+
+
+# mixed scenario against the app served by the live server
+@pytest.mark.django_db(transaction=True)
+def test_bench_load(live_server, eager_celery, tmp_path):
+    # the live server threads share one in-memory SQLite connection: concurrent load needs Postgres
+    concurrency = 1 if connection.vendor == 'sqlite' else CONCURRENCY
+    seeded = seed(concurrency)
+    with override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', EXPORT_ROOT=str(tmp_path)), \
+            patch.dict(SimpleRateThrottle.THROTTLE_RATES, {'anon': None, 'user': None}):
+        result = run_load(live_server.url, seeded, concurrency, DURATION)
+    if os.environ.get('LOAD_OUTPUT'):
+        with open(os.environ['LOAD_OUTPUT'], 'w') as file:
+            json.dump(result, file, indent=2, ensure_ascii=False)
+    report(f'load, {concurrency} users, {result["throughput_rps"]} requests/s', [
+        dict(endpoint=name, **{key: value for key, value in stats.items() if key != 'statuses'}) for name, stats in result['endpoints'].items()])
+    assert all(stats['errors'] == 0 for stats in result['endpoints'].values()), result['endpoints']
@@ -0,0 +1,65 @@
+import socket
+import time
+
+import pytest
+from django.core.mail import EmailMessage
+from django.test import override_settings
+
+from backend_code.mail import queue_mail, deliver_mail
+from benchmarks.conftest import report
+
+MESSAGES = 200
+
+
+class CountingHandler:
+    def __init__(self):
+        self.messages = 0
+        self.sessions = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages += 1
+        return '250 OK'
+
+
+@pytest.fixture
+def smtp_stand_in():
+    controller_module = pytest.importorskip('aiosmtpd.controller')
+    handler = CountingHandler()
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    controller = controller_module.Controller(handler, hostname='127.0.0.1', port=port)
+    controller.start()
+    with override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend', EMAIL_HOST='127.0.0.1', EMAIL_PORT=port,
+                           EMAIL_USE_TLS=False, EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD=''):
+        yield handler
+    controller.stop()
+
+
+# messages per second: one SMTP connection per message vs the batched mail queue
+@pytest.mark.django_db(transaction=True)
+def test_bench_mail(smtp_stand_in):
+    rows = []
+
+    started = time.perf_counter()
+    for i in range(MESSAGES):
+        EmailMessage(f'subject {i}', 'body', 'bench@bench.com', ['bench@bench.com']).send()
+    elapsed = time.perf_counter() - started
+    rows.append({'mode': 'connection per message', 'messages': smtp_stand_in.messages, 'sessions': smtp_stand_in.sessions, 'per_second': round(MESSAGES / elapsed)})
+
+    smtp_stand_in.messages = smtp_stand_in.sessions = 0
+    for i in range(MESSAGES):
+        queue_mail(f'subject {i}', 'body', 'bench@bench.com', ['bench@bench.com'])
+    started = time.perf_counter()
+    delivered = deliver_mail()
+    elapsed = time.perf_counter() - started
+    rows.append({'mode': 'mail queue', 'messages': smtp_stand_in.messages, 'sessions': smtp_stand_in.sessions, 'per_second': round(MESSAGES / elapsed)})
+
+    report('mail delivery', rows)
+    assert delivered == MESSAGES
+    assert smtp_stand_in.sessions == 1
@@ -0,0 +1,41 @@
+import time
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+
+from backend_code.profiling import ProfilingMiddleware
+from benchmarks.conftest import report
+
+REQUESTS = 100000
+SAMPLED_REQUESTS = 200
+
+
+def per_request(handler, request, count):
+    started = time.perf_counter()
+    for _ in range(count):
+        handler(request)
+    return (time.perf_counter() - started) / count
+
+
+# cost the profiling middleware adds to a request: unsampled (the common case) and sampled
+@override_settings(PROFILING_TOKEN='bench')
+def test_bench_profiling():
+    cache.clear()
+    request = RequestFactory().get('/api/v1/goods/')
+    view = lambda request: HttpResponse('ok')
+    middleware = ProfilingMiddleware(view)
+
+    baseline = per_request(view, request, REQUESTS)
+    with override_settings(PROFILING_SAMPLE_RATE=0):
+        unsampled = per_request(middleware, request, REQUESTS)
+    with override_settings(PROFILING_SAMPLE_RATE=1):
+        sampled = per_request(middleware, request, SAMPLED_REQUESTS)
+
+    overhead_ns = round((unsampled - baseline) * 1e9)
+    report('profiling overhead per request', [
+        {'mode': 'unsampled', 'overhead_ns': overhead_ns},
+        {'mode': 'sampled', 'overhead_us': round((sampled - baseline) * 1e6)},
+    ])
+    # an unsampled request pays for one random() call and a dict lookup
+    assert overhead_ns < 5000
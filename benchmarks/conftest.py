@@ -0,0 +1,35 @@
+import pytest
+from django.contrib.auth.hashers import make_password
+
+from backend_code.models import Customer, Store, ProductCategory, Product, Basket
+
+
+# benchmarks are run explicitly, e.g. `pytest benchmarks/bench_checkout.py -s`
+@pytest.fixture
+def bench_customer():
+    return Customer.objects.create(first_name='bench', last_name='bench', email_login='bench@bench.com', password=make_password('valid0_password'), user_name='bench', phone_number='1', area_code=2, address='address', registered_vendor=True, email_verified=True, is_active=True, seller_vendor_id=1)
+
+
+@pytest.fixture
+def bench_store(bench_customer):
+    return Store.objects.create(vendor_id=bench_customer, name='bench', address='address', nominal_delivery_price=50, status=True)
+
+
+@pytest.fixture
+def bench_product_cat():
+    return ProductCategory.objects.create(prod_cat_id=1, name='bench')
+
+
+def seed_products(store, product_cat, size, amount=1000, start=100000):
+    Product.objects.bulk_create([Product(stock_number=start + i, slug=str(start + i), name=f'bench {i}', amount=amount, price=100 + i, weight_class=1 + i % 5, recommended_price=100, delivery_store=store, product_cat=product_cat) for i in range(size)])
+    return list(Product.objects.filter(stock_number__gte=start, stock_number__lt=start + size))
+
+
+def seed_basket(customer, store, products, amount=1):
+    Basket.objects.bulk_create([Basket(b_customer=customer, b_product=product, b_vendor=store, amount=amount) for product in products])
+
+
+def report(title, rows):
+    print(f'\n{title}')
+    for row in rows:
+        print('  ' + '  '.join(f'{key}={value}' for key, value in row.items()))
@@ -0,0 +1,223 @@
+'''
+Нагрузочный тест API: виртуальные пользователи параллельно выполняют смешанный сценарий (просмотр и поиск товаров, корзина, оформление заказа, импорт и экспорт товаров поставщика). Результат - пропускная способность и задержки p50/p95/p99 по каждому маршруту в формате JSON, чтобы сравнивать прогоны между собой.
+
+Запуск против работающего приложения (gunicorn, Postgres, Redis), данные для теста создаются в БД из настроек:
+    python -m benchmarks.load --base-url http://localhost:8000 --concurrency 16 --duration 60 --output load.json
+Ограничение частоты запросов (THROTTLE_*_RATE) на время теста нужно отключить или поднять.
+'''
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import threading
+import time
+from datetime import datetime
+
+import requests
+
+IMPORT_FILE = 'goods_yaml.yaml'
+IMPORT_VENDOR_ID = 56125
+PRODUCTS = 200
+STOCK_NUMBER_START = 700000
+
+# scenario step: (weight, name); names are the endpoints in the report
+SCENARIO = (
+    (30, 'browse goods'),
+    (20, 'search goods'),
+    (20, 'product detail'),
+    (15, 'add to basket'),
+    (5, 'basket'),
+    (6, 'checkout'),
+    (2, 'import price list'),
+    (2, 'export'),
+)
+# read endpoints only: served by async views under ASGI (backend_code.async_views)
+READ_SCENARIO = (
+    (35, 'browse goods'),
+    (25, 'search goods'),
+    (30, 'product detail'),
+    (5, 'store'),
+    (5, 'product category'),
+)
+
+
+def seed(users):
+    '''
+    Данные для теста: поставщик (vendor_id из goods_yaml.yaml, чтобы импорт проходил проверку), его магазин и товары, покупатели с токенами. Возвращает адреса покупателей, адрес поставщика и артикулы товаров.
+    '''
+    from django.contrib.auth.hashers import make_password
+    from rest_framework.authtoken.models import Token
+
+    from backend_code.models import Customer, Store, ProductCategory, Product
+
+    password = make_password('valid0_password')
+    vendor, _ = Customer.objects.get_or_create(email_login='load-vendor@load.com', defaults={
+        'first_name': 'load', 'last_name': 'load', 'password': password, 'user_name': 'load', 'phone_number': '1', 'address': 'address',
+        'registered_vendor': True, 'email_verified': True, 'seller_vendor_id': IMPORT_VENDOR_ID})
+    store, _ = Store.objects.get_or_create(vendor_id=vendor, defaults={'name': 'load', 'address': 'address', 'nominal_delivery_price': 50})
+    product_cat, _ = ProductCategory.objects.get_or_create(prod_cat_id=STOCK_NUMBER_START, defaults={'name': 'load'})
+    Product.objects.bulk_create([Product(stock_number=STOCK_NUMBER_START + i, slug=str(STOCK_NUMBER_START + i), name=f'load product {i}', model=f'load/{i % 10}',
+                                         amount=10 ** 6, price=100 + i, weight_class=1 + i % 5, recommended_price=100, delivery_store=store, product_cat=product_cat)
+                                 for i in range(PRODUCTS) if not Product.objects.filter(stock_number=STOCK_NUMBER_START + i).exists()])
+    emails = [f'load-{i}@load.com' for i in range(users)]
+    existing = set(Customer.objects.filter(email_login__in=emails).values_list('email_login', flat=True))
+    Customer.objects.bulk_create([Customer(first_name='load', last_name='load', email_login=email, password=password, user_name='load', phone_number='1',
+                                           area_code=1 + i % 5, address='address', email_verified=True) for i, email in enumerate(emails) if email not in existing])
+    for customer in Customer.objects.filter(email_login__in=emails + [vendor.email_login]):
+        # tokens older than an hour are rejected by IsAuthenticated
+        Token.objects.filter(user=customer).delete()
+        Token.objects.create(user=customer)
+    return {'customers': emails, 'vendor': vendor.email_login, 'stock_numbers': [STOCK_NUMBER_START + i for i in range(PRODUCTS)]}
+
+
+class VirtualUser:
+    '''
+    Один пользователь теста: свое HTTP-соединение (requests.Session) и случайная последовательность шагов сценария с заданными весами.
+    '''
+
+    def __init__(self, base_url, email, seeded, rng):
+        self.base_url = base_url.rstrip('/')
+        self.email = email
+        self.seeded = seeded
+        self.rng = rng
+        self.session = requests.Session()
+        self.in_basket = False
+
+    def request(self, method, path, **kwargs):
+        return self.session.request(method, f'{self.base_url}{path}', timeout=60, **kwargs)
+
+    def step(self, name):
+        stock_number = self.rng.choice(self.seeded['stock_numbers'])
+        credentials = {'email_login': self.email}
+        if name == 'browse goods':
+            return self.request('GET', f'/api/v1/goods/?page={self.rng.randint(1, 20)}')
+        if name == 'search goods':
+            return self.request('GET', f'/api/v1/goods/?s=load/{self.rng.randint(0, 9)}')
+        if name == 'product detail':
+            return self.request('GET', f'/api/v1/goods/{stock_number}/')
+        if name == 'add to basket':
+            self.in_basket = True
+            return self.request('POST', '/api/v1/basket/', json=dict(credentials, stock_number=stock_number, amount=self.rng.randint(1, 3)))
+        if name == 'basket':
+            # the API reads credentials from the request body, also for GET requests
+            return self.request('GET', '/api/v1/basket/', json=credentials)
+        if name == 'checkout':
+            if not self.in_basket:
+                self.request('POST', '/api/v1/basket/', json=dict(credentials, stock_number=stock_number, amount=1))
+            self.in_basket = False
+            return self.request('POST', '/api/v1/order/', json=dict(credentials, express_delivery='False'))
+        if name == 'import price list':
+            return self.request('POST', '/api/v1/goods-import/', json={'email_login': self.seeded['vendor']})
+        if name == 'store':
+            return self.request('GET', '/api/v1/store/', json={'email_login': self.seeded['vendor']})
+        if name == 'product category':
+            return self.request('GET', '/api/v1/prod-cat/', json={'prod_cat_id': STOCK_NUMBER_START})
+        if name == 'export':
+            return self.request('GET', '/api/v1/product-export/', json={'email_login': self.seeded['vendor']})
+        raise ValueError(name)
+
+
+def percentile(values, share):
+    # nearest-rank percentile of sorted values
+    return values[max(math.ceil(share * len(values)) - 1, 0)]
+
+
+def summarize(samples, elapsed):
+    '''
+    Сводка по маршрутам: количество запросов, ошибки (ответы 5xx и исключения), запросов в секунду и задержки p50/p95/p99/max в миллисекундах.
+    '''
+    endpoints = {}
+    for name, status, duration in samples:
+        endpoints.setdefault(name, []).append((status, duration))
+    report = {}
+    for name, results in sorted(endpoints.items()):
+        durations = sorted(duration * 1000 for _, duration in results)
+        statuses = {}
+        for status, _ in results:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        report[name] = {
+            'requests': len(results),
+            'errors': sum(1 for status, _ in results if status is None or status >= 500),
+            'statuses': statuses,
+            'throughput_rps': round(len(results) / elapsed, 2),
+            'p50_ms': round(percentile(durations, 0.5), 2),
+            'p95_ms': round(percentile(durations, 0.95), 2),
+            'p99_ms': round(percentile(durations, 0.99), 2),
+            'max_ms': round(durations[-1], 2),
+        }
+    return report
+
+
+def run_load(base_url, seeded, concurrency, duration, random_seed=0, scenario=SCENARIO):
+    '''
+    Нагрузка в concurrency потоков в течение duration секунд. Каждый поток - отдельный виртуальный пользователь; сценарий детерминирован при одинаковом random_seed.
+    '''
+    weights = [weight for weight, _ in scenario]
+    names = [name for _, name in scenario]
+    samples = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(number):
+        rng = random.Random(random_seed * 10007 + number)
+        user = VirtualUser(base_url, seeded['customers'][number % len(seeded['customers'])], seeded, rng)
+        local = []
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                status = user.step(name).status_code
+            except requests.RequestException:
+                status = None
+            local.append((name, status, time.perf_counter() - started))
+        with lock:
+            samples.extend(local)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'host': platform.node(),
+        'base_url': base_url,
+        'concurrency': concurrency,
+        'duration_s': round(elapsed, 2),
+        'seed': random_seed,
+        'requests': len(samples),
+        'throughput_rps': round(len(samples) / elapsed, 2),
+        'endpoints': summarize(samples, elapsed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mixed-scenario load test of the marketplace API')
+    parser.add_argument('--base-url', default='http://localhost:8000')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--users', type=int, default=None, help='Number of customers, defaults to concurrency')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--read-only', action='store_true', help='Read endpoints only (READ_SCENARIO)')
+    parser.add_argument('--output', help='JSON report path, stdout by default')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'marketplace.settings')
+    import django
+    django.setup()
+    result = run_load(args.base_url, seed(args.users or args.concurrency), args.concurrency, args.duration, args.seed,
+                      READ_SCENARIO if args.read_only else SCENARIO)
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
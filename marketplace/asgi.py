@@ -3,14 +3,21 @@ ASGI config for marketplace project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
-For more information on this file, see
-https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+Django 2.2 has no ASGI handler: read endpoints (backend_code.async_views.ASYNC_ACTIONS) go through the middleware chain
+in a thread pool, everything else through the WSGI application wrapped with asgiref. Run with
+    gunicorn marketplace.asgi:application --bind 0.0.0.0:8000 --worker-class uvicorn.workers.UvicornWorker
 """
 
 import os
 
-from django.core.asgi import get_asgi_application
+from asgiref.wsgi import WsgiToAsgi
+from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'marketplace.settings')
 
-application = get_asgi_application()
+# sets up Django before the views are imported
+wsgi_application = get_wsgi_application()
+
+from backend_code.async_views import AsgiRouter  # noqa: E402
+
+application = AsgiRouter(WsgiToAsgi(wsgi_application))
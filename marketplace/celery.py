@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from kombu import Queue
 
 from marketplace import settings
 
@@ -8,3 +9,42 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "marketplace.settings")
 app = Celery("marketplace")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks(lambda: settings.INSTALLED_APPS)
+
+
+# worker profile of every queue: a long import must never wait in front of activation emails
+QUEUE_PROFILES = {
+    'mail': {'concurrency': 8, 'prefetch_multiplier': 4, 'acks_late': True, 'soft_time_limit': 60, 'time_limit': 90},
+    'import': {'concurrency': 2, 'prefetch_multiplier': 1, 'acks_late': True, 'soft_time_limit': 1800, 'time_limit': 1900, 'max_tasks_per_child': 20},
+    'export': {'concurrency': 2, 'prefetch_multiplier': 1, 'acks_late': True, 'soft_time_limit': 900, 'time_limit': 1000, 'max_tasks_per_child': 20},
+    'maintenance': {'concurrency': 1, 'prefetch_multiplier': 1, 'acks_late': True, 'soft_time_limit': 3300, 'time_limit': 3600},
+}
+
+TASK_QUEUES = {
+    'backend_code.tasks.send_mail_async': 'mail',
+    'backend_code.tasks.deliver_mail_async': 'mail',
+    'backend_code.tasks.activation_email_async': 'mail',
+    'backend_code.tasks.order_email_async': 'mail',
+    'backend_code.tasks.order_status_emails_async': 'mail',
+    'backend_code.tasks.import_product_list_async': 'import',
+    'backend_code.tasks.export_product_list_async': 'export',
+    'backend_code.tasks.archive_orders_async': 'maintenance',
+}
+
+app.conf.task_queues = [Queue(queue) for queue in QUEUE_PROFILES]
+app.conf.task_default_queue = 'maintenance'
+app.conf.task_routes = {task: {'queue': queue} for task, queue in TASK_QUEUES.items()}
+# with acks_late a task is acknowledged after it finishes and runs again if its worker is killed:
+# a duplicate notification is better than a lost one, imports skip existing products, archiving resumes where it stopped
+app.conf.task_annotations = {task: {name: QUEUE_PROFILES[queue][name] for name in ('acks_late', 'soft_time_limit', 'time_limit')}
+                             for task, queue in TASK_QUEUES.items()}
+app.conf.task_reject_on_worker_lost = True
+# an unacknowledged task is redelivered only after the longest time limit has certainly passed
+app.conf.broker_transport_options = {'visibility_timeout': 2 * max(profile['time_limit'] for profile in QUEUE_PROFILES.values())}
+
+# a worker started for one queue (CELERY_WORKER_QUEUE, see docker-compose.yml) takes that queue's profile
+worker_queue = os.environ.get('CELERY_WORKER_QUEUE')
+if worker_queue:
+    profile = QUEUE_PROFILES[worker_queue]
+    app.conf.worker_concurrency = profile['concurrency']
+    app.conf.worker_prefetch_multiplier = profile['prefetch_multiplier']
+    app.conf.worker_max_tasks_per_child = profile.get('max_tasks_per_child')
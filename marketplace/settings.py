@@ -11,6 +11,8 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 import os
 from pathlib import Path
+
+from celery.schedules import crontab
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -52,10 +54,14 @@ INSTALLED_APPS = [
     'allauth.account',
     'allauth.socialaccount',
     'allauth.socialaccount.providers.google',
-    'silk',
 ]
 
 MIDDLEWARE = [
+    'backend_code.db_connections.ConnectionHealthMiddleware',
+    'backend_code.db_router.ReplicaRoutingMiddleware',
+    'backend_code.metrics.RequestMetricsMiddleware',
+    'backend_code.profiling.ProfilingMiddleware',
+    'backend_code.sql_stats.SqlStatsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,9 +69,14 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'silk.middleware.SilkyMiddleware',
 ]
 
+# silk records every request with its SQL to the database: for local debugging only
+SILK_ENABLED = os.environ.get('SILK_ENABLED') == 'True'
+if SILK_ENABLED:
+    INSTALLED_APPS.append('silk')
+    MIDDLEWARE.append('silk.middleware.SilkyMiddleware')
+
 ROOT_URLCONF = 'marketplace.urls'
 
 TEMPLATES = [
@@ -90,6 +101,17 @@ WSGI_APPLICATION = 'marketplace.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# database connections: 'persistent' - one connection per process, reused for DB_CONN_MAX_AGE seconds (web workers);
+# 'pooled' - behind a transaction pooler (pgbouncer, see docker-compose.yml): connections to the pooler are kept open,
+# server-side cursors are disabled since consecutive transactions may run on different server connections (celery workers);
+# 'per-request' - a new connection for every request and task
+DB_CONNECTION_MODE = os.environ.get('DB_CONNECTION_MODE', 'persistent')
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 600))
+# a connection idle for this many seconds is checked before reuse (backend_code.db_connections)
+DB_HEALTH_CHECK_IDLE = float(os.environ.get('DB_HEALTH_CHECK_IDLE', 10))
+# threads handling the read endpoints under ASGI (marketplace/asgi.py): at most this many connections per process
+ASYNC_DB_THREADS = int(os.environ.get('ASYNC_DB_THREADS', 8))
+
 DATABASES = {
     'default': {
         'ENGINE': os.environ.get('POSTGRES_ENGINE'),
@@ -98,9 +120,28 @@ DATABASES = {
         'PASSWORD': os.environ.get('POSTGRES_PASSWORD'),
         'HOST': os.environ.get('POSTGRES_HOST'),
         'PORT': os.environ.get('POSTGRES_PORT'),
+        'CONN_MAX_AGE': {'persistent': DB_CONN_MAX_AGE, 'pooled': None, 'per-request': 0}[DB_CONNECTION_MODE],
+        'DISABLE_SERVER_SIDE_CURSORS': DB_CONNECTION_MODE == 'pooled',
     }
 }
 
+# read replicas (backend_code.db_router): space-separated host:port of Postgres replicas, or database files of SQLite stand-ins
+for number, replica in enumerate(os.environ.get('DATABASE_REPLICAS', '').split(), 1):
+    if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+        location = {'NAME': replica}
+    else:
+        host, _, port = replica.partition(':')
+        location = {'HOST': host, 'PORT': port or DATABASES['default']['PORT']}
+    DATABASES[f'replica_{number}'] = dict(DATABASES['default'], **location, TEST={'MIRROR': 'default'})
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['backend_code.db_router.ReplicaRouter']
+# reads of a client go to the primary for this many seconds after its last successful write
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 10))
+# a replica further behind than this is out of rotation until the next check
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 5))
+# seconds between replication lag checks of a replica, per process
+REPLICA_LAG_CHECK_INTERVAL = float(os.environ.get('REPLICA_LAG_CHECK_INTERVAL', 5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -181,17 +222,109 @@ REST_FRAMEWORK = {
         'rest_framework.throttling.AnonRateThrottle',
         'rest_framework.throttling.UserRateThrottle',
     ],
+    # raised for load tests (benchmarks/load.py) through the environment
     'DEFAULT_THROTTLE_RATES': {
-        'anon': '100/day',
-        'user': '1000/day',
-        'user_signup': '50/day',
+        'anon': os.environ.get('THROTTLE_ANON_RATE', '100/day'),
+        'user': os.environ.get('THROTTLE_USER_RATE', '1000/day'),
+        'user_signup': os.environ.get('THROTTLE_SIGNUP_RATE', '50/day'),
     }
 }
 
 
+# cache config (shared Redis cache in docker, local memory otherwise)
+CACHES = {
+    'default': {
+        'BACKEND': 'django_redis.cache.RedisCache' if os.environ.get('CACHE_LOCATION') else 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+BASKET_QUOTE_CACHE_TIMEOUT = int(os.environ.get('BASKET_QUOTE_CACHE_TIMEOUT', 300))
+
+# keyset pagination of order history
+ORDER_PAGE_SIZE = 20
+ORDER_MAX_PAGE_SIZE = 100
+
+# maximum number of orders in one status change request
+ORDER_STATUS_BATCH_LIMIT = 5000
+
+# vendor order feed: long polling and Server-Sent Events
+VENDOR_FEED_MAX_WAIT = 30
+VENDOR_FEED_RECHECK_SECONDS = 5
+VENDOR_FEED_KEEPALIVE_SECONDS = 15
+VENDOR_FEED_STREAM_SECONDS = int(os.environ.get('VENDOR_FEED_STREAM_SECONDS', 300))
+VENDOR_FEED_RETRY_MS = 3000
+# without the ASGI router a waiting feed request holds a worker thread: long polling and the stream are cut to this many seconds
+VENDOR_FEED_SYNC_MAX_WAIT = 5
+
+# delivered and canceled orders move to the archive tables after ORDER_ARCHIVE_AGE_DAYS
+ORDER_ARCHIVE_AGE_DAYS = int(os.environ.get('ORDER_ARCHIVE_AGE_DAYS', 180))
+ORDER_ARCHIVE_BATCH_SIZE = 500
+ORDER_ARCHIVE_WATERMARK_TIMEOUT = 300
+
+# mail queue: messages per SMTP connection batch, retries with exponential backoff (seconds)
+MAIL_BATCH_SIZE = 100
+MAIL_MAX_ATTEMPTS = 5
+MAIL_RETRY_BACKOFF = 30
+MAIL_RETRY_BACKOFF_MAX = 3600
+MAIL_SEND_LEASE = 300
+# batches sent by one mail task, well within its soft time limit (marketplace/celery.py); the rest goes out with the next task
+MAIL_BATCHES_PER_RUN = 5
+
+# one import / export per vendor at a time: lock lease while queued and while running (above the task time limits)
+VENDOR_JOB_QUEUED_LEASE = 600
+VENDOR_JOB_RUNNING_LEASE = 2000
+EXPORT_ROOT = os.environ.get('EXPORT_ROOT', os.path.join(BASE_DIR, 'exports'))
+# export artifacts: reuse while the catalog is unchanged (stock amounts are at most EXPORT_ARTIFACT_MAX_AGE old),
+# signed download links, least recently used files are removed above EXPORT_MAX_BYTES
+EXPORT_ARTIFACT_MAX_AGE = 3600
+EXPORT_LINK_MAX_AGE = 24 * 3600
+EXPORT_MAX_BYTES = int(os.environ.get('EXPORT_MAX_BYTES', 1024 ** 3))
+
+# /metrics: every process writes its metrics to the shared cache at most every METRICS_FLUSH_INTERVAL seconds
+METRICS_FLUSH_INTERVAL = 10
+METRICS_PROCESS_TIMEOUT = 600
+# per-task peak memory via tracemalloc (slows tasks down); otherwise the worker process RSS is reported
+TASK_TRACEMALLOC = os.environ.get('TASK_TRACEMALLOC') == 'True'
+
+# sampling profiler: share of profiled requests, X-Profile header token for profiling on demand,
+# stack sampling interval (seconds) and the number of profiles kept in the ring buffer
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN')
+PROFILING_INTERVAL = 0.005
+PROFILING_BUFFER_SIZE = 200
+
+# SQL of every request: slow query threshold (seconds, logged with EXPLAIN), repeated SELECTs reported as N+1,
+# /sql-report covers SQL_REPORT_WINDOWS windows of SQL_REPORT_WINDOW seconds
+SQL_SLOW_QUERY_SECONDS = float(os.environ.get('SQL_SLOW_QUERY_SECONDS', 0.2))
+SQL_SLOW_QUERIES_PER_REQUEST = 5
+SQL_N_PLUS_ONE_THRESHOLD = 5
+SQL_REPORT_WINDOW = 60
+SQL_REPORT_WINDOWS = 15
+# slow queries waiting for their EXPLAIN in the background thread of a process
+SQL_EXPLAIN_QUEUE_SIZE = 100
+
+# transactional outbox: tasks per relay batch, idle poll interval and broker retry backoff (seconds)
+OUTBOX_BATCH_SIZE = 500
+OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL', 0.5))
+OUTBOX_RETRY_BACKOFF = 1
+OUTBOX_RETRY_BACKOFF_MAX = 60
+OUTBOX_DEDUPE_TIMEOUT = 24 * 3600
+
+
 # celery config
 CELERY_BROKER_URL = os.environ.get('BROKER')
 CELERY_RESULT_BACKEND = os.environ.get('BACKEND')
+CELERY_BEAT_SCHEDULE = {
+    'archive-orders': {
+        'task': 'backend_code.tasks.archive_orders_async',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'deliver-mail': {
+        'task': 'backend_code.tasks.deliver_mail_async',
+        'schedule': 60,
+    },
+}
 
 SPECTACULAR_SETTINGS = {
     "TITLE": "Marketplace - my personal project", # название проекта
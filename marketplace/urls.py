@@ -20,6 +20,11 @@ from django.views.generic import TemplateView
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 from rest_framework.routers import DefaultRouter
 
+from backend_code.metrics import metrics_view
+from backend_code.profiling import profiles_view, profile_stacks_view
+from backend_code.sql_stats import sql_report_view
+from marketplace import settings
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -29,5 +34,11 @@ urlpatterns = [
     path('', TemplateView.as_view(template_name="google-auth/google_login.html")),
     path('accounts/', include('allauth.urls')),
     path('logout', LogoutView.as_view()),
-    path('silk/', include('silk.urls', namespace='silk'))
+    path('metrics', metrics_view, name='metrics'),
+    path('sql-report', sql_report_view, name='sql_report'),
+    path('profiling/', profiles_view, name='profiles'),
+    path('profiling/<int:profile_id>/stacks', profile_stacks_view, name='profile_stacks'),
 ]
+
+if settings.SILK_ENABLED:
+    urlpatterns.append(path('silk/', include('silk.urls', namespace='silk')))
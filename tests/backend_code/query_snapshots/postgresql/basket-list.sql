@@ -0,0 +1,6 @@
+SELECT "backend_code_customer"."id", "backend_code_customer"."last_login", "backend_code_customer"."email_login", "backend_code_customer"."email_verified", "backend_code_customer"."password", "backend_code_customer"."user_name", "backend_code_customer"."first_name", "backend_code_customer"."last_name", "backend_code_customer"."phone_number", "backend_code_customer"."address", "backend_code_customer"."registered_vendor", "backend_code_customer"."is_active", "backend_code_customer"."organization", "backend_code_customer"."area_code", "backend_code_customer"."seller_vendor_id", "backend_code_customer"."is_staff", "backend_code_customer"."is_superuser" FROM "backend_code_customer" WHERE "backend_code_customer"."email_login" = ? ORDER BY "backend_code_customer"."id" ASC LIMIT ?;
+SELECT "authtoken_token"."key", "authtoken_token"."user_id", "authtoken_token"."created" FROM "authtoken_token" WHERE "authtoken_token"."user_id" = ? ORDER BY "authtoken_token"."key" ASC LIMIT ?;
+SELECT "backend_code_customer"."id", "backend_code_customer"."last_login", "backend_code_customer"."email_login", "backend_code_customer"."email_verified", "backend_code_customer"."password", "backend_code_customer"."user_name", "backend_code_customer"."first_name", "backend_code_customer"."last_name", "backend_code_customer"."phone_number", "backend_code_customer"."address", "backend_code_customer"."registered_vendor", "backend_code_customer"."is_active", "backend_code_customer"."organization", "backend_code_customer"."area_code", "backend_code_customer"."seller_vendor_id", "backend_code_customer"."is_staff", "backend_code_customer"."is_superuser" FROM "backend_code_customer" WHERE "backend_code_customer"."email_login" = ? ORDER BY "backend_code_customer"."id" ASC LIMIT ?;
+SELECT COUNT(*) AS "__count" FROM "backend_code_basket" WHERE "backend_code_basket"."b_customer_id" = ?;
+SELECT "backend_code_basket"."id", "backend_code_basket"."b_customer_id", "backend_code_basket"."b_product_id", "backend_code_basket"."b_vendor_id", "backend_code_basket"."amount", "backend_code_customer"."id", "backend_code_customer"."last_login", "backend_code_customer"."email_login", "backend_code_customer"."email_verified", "backend_code_customer"."password", "backend_code_customer"."user_name", "backend_code_customer"."first_name", "backend_code_customer"."last_name", "backend_code_customer"."phone_number", "backend_code_customer"."address", "backend_code_customer"."registered_vendor", "backend_code_customer"."is_active", "backend_code_customer"."organization", "backend_code_customer"."area_code", "backend_code_customer"."seller_vendor_id", "backend_code_customer"."is_staff", "backend_code_customer"."is_superuser", "backend_code_product"."id", "backend_code_product"."stock_number", "backend_code_product"."slug", "backend_code_product"."name", "backend_code_product"."model", "backend_code_product"."delivery_store_id", "backend_code_product"."amount", "backend_code_product"."price", "backend_code_product"."product_cat_id", "backend_code_product"."weight_class", "backend_code_product"."recommended_price", "backend_code_product"."custom_description", "backend_code_store"."id", "backend_code_store"."vendor_id_id", "backend_code_store"."name", "backend_code_store"."address", "backend_code_store"."url", "backend_code_store"."nominal_delivery_price", "backend_code_store"."status", "backend_code_store"."catalog_version", T5."id", T5."last_login", T5."email_login", T5."email_verified", T5."password", T5."user_name", T5."first_name", T5."last_name", T5."phone_number", T5."address", T5."registered_vendor", T5."is_active", T5."organization", T5."area_code", T5."seller_vendor_id", T5."is_staff", T5."is_superuser" FROM "backend_code_basket" INNER JOIN "backend_code_customer" ON ("backend_code_basket"."b_customer_id" = "backend_code_customer"."id") INNER JOIN "backend_code_product" ON ("backend_code_basket"."b_product_id" = "backend_code_product"."id") INNER JOIN "backend_code_store" ON ("backend_code_basket"."b_vendor_id" = "backend_code_store"."id") INNER JOIN "backend_code_customer" T5 ON ("backend_code_store"."vendor_id_id" = T5."id") WHERE "backend_code_basket"."b_customer_id" = ? ORDER BY "backend_code_basket"."id" ASC LIMIT ?;
+SELECT ("backend_code_storecategory_stores"."store_id") AS "_prefetch_related_val_store_id", "backend_code_storecategory"."id", "backend_code_storecategory"."store_cat_id", "backend_code_storecategory"."store_cat_creator_id", "backend_code_storecategory"."name" FROM "backend_code_storecategory" INNER JOIN "backend_code_storecategory_stores" ON ("backend_code_storecategory"."id" = "backend_code_storecategory_stores"."storecategory_id") WHERE "backend_code_storecategory_stores"."store_id" IN (...) ORDER BY "backend_code_storecategory"."name" DESC;
@@ -0,0 +1,4 @@
+SELECT "backend_code_customer"."id", "backend_code_customer"."last_login", "backend_code_customer"."email_login", "backend_code_customer"."email_verified", "backend_code_customer"."password", "backend_code_customer"."user_name", "backend_code_customer"."first_name", "backend_code_customer"."last_name", "backend_code_customer"."phone_number", "backend_code_customer"."address", "backend_code_customer"."registered_vendor", "backend_code_customer"."is_active", "backend_code_customer"."organization", "backend_code_customer"."area_code", "backend_code_customer"."seller_vendor_id", "backend_code_customer"."is_staff", "backend_code_customer"."is_superuser" FROM "backend_code_customer" WHERE "backend_code_customer"."email_login" = ? ORDER BY "backend_code_customer"."id" ASC LIMIT ?;
+SELECT "authtoken_token"."key", "authtoken_token"."user_id", "authtoken_token"."created" FROM "authtoken_token" WHERE "authtoken_token"."user_id" = ? ORDER BY "authtoken_token"."key" ASC LIMIT ?;
+SELECT "backend_code_customer"."id", "backend_code_customer"."last_login", "backend_code_customer"."email_login", "backend_code_customer"."email_verified", "backend_code_customer"."password", "backend_code_customer"."user_name", "backend_code_customer"."first_name", "backend_code_customer"."last_name", "backend_code_customer"."phone_number", "backend_code_customer"."address", "backend_code_customer"."registered_vendor", "backend_code_customer"."is_active", "backend_code_customer"."organization", "backend_code_customer"."area_code", "backend_code_customer"."seller_vendor_id", "backend_code_customer"."is_staff", "backend_code_customer"."is_superuser" FROM "backend_code_customer" WHERE "backend_code_customer"."email_login" = ? ORDER BY "backend_code_customer"."id" ASC LIMIT ?;
+SELECT COUNT("backend_code_basket"."id") AS "lines", SUM("backend_code_basket"."amount") AS "item_count", SUM(("backend_code_basket"."amount" * "backend_code_product"."price")) AS "total_price", MAX("backend_code_store"."nominal_delivery_price") AS "nominal_delivery_price", MAX("backend_code_product"."weight_class") AS "weight_class" FROM "backend_code_basket" INNER JOIN "backend_code_product" ON ("backend_code_basket"."b_product_id" = "backend_code_product"."id") INNER JOIN "backend_code_store" ON ("backend_code_basket"."b_vendor_id" = "backend_code_store"."id") WHERE "backend_code_basket"."b_customer_id" = ?;
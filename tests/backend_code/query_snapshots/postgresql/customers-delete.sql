@@ -0,0 +1,31 @@
+SELECT "backend_code_customer"."id", "backend_code_customer"."last_login", "backend_code_customer"."email_login", "backend_code_customer"."email_verified", "backend_code_customer"."password", "backend_code_customer"."user_name", "backend_code_customer"."first_name", "backend_code_customer"."last_name", "backend_code_customer"."phone_number", "backend_code_customer"."address", "backend_code_customer"."registered_vendor", "backend_code_customer"."is_active", "backend_code_customer"."organization", "backend_code_customer"."area_code", "backend_code_customer"."seller_vendor_id", "backend_code_customer"."is_staff", "backend_code_customer"."is_superuser" FROM "backend_code_customer" WHERE "backend_code_customer"."email_login" = ? ORDER BY "backend_code_customer"."id" ASC LIMIT ?;
+SELECT "authtoken_token"."key", "authtoken_token"."user_id", "authtoken_token"."created" FROM "authtoken_token" WHERE "authtoken_token"."user_id" = ? ORDER BY "authtoken_token"."key" ASC LIMIT ?;
+SELECT "backend_code_customer"."id", "backend_code_customer"."last_login", "backend_code_customer"."email_login", "backend_code_customer"."email_verified", "backend_code_customer"."password", "backend_code_customer"."user_name", "backend_code_customer"."first_name", "backend_code_customer"."last_name", "backend_code_customer"."phone_number", "backend_code_customer"."address", "backend_code_customer"."registered_vendor", "backend_code_customer"."is_active", "backend_code_customer"."organization", "backend_code_customer"."area_code", "backend_code_customer"."seller_vendor_id", "backend_code_customer"."is_staff", "backend_code_customer"."is_superuser" FROM "backend_code_customer" WHERE "backend_code_customer"."email_login" = ?;
+SELECT "backend_code_store"."id", "backend_code_store"."vendor_id_id", "backend_code_store"."name", "backend_code_store"."address", "backend_code_store"."url", "backend_code_store"."nominal_delivery_price", "backend_code_store"."status", "backend_code_store"."catalog_version" FROM "backend_code_store" WHERE "backend_code_store"."vendor_id_id" IN (...) ORDER BY "backend_code_store"."name" DESC;
+SELECT "backend_code_product"."id", "backend_code_product"."stock_number", "backend_code_product"."slug", "backend_code_product"."name", "backend_code_product"."model", "backend_code_product"."delivery_store_id", "backend_code_product"."amount", "backend_code_product"."price", "backend_code_product"."product_cat_id", "backend_code_product"."weight_class", "backend_code_product"."recommended_price", "backend_code_product"."custom_description" FROM "backend_code_product" WHERE "backend_code_product"."delivery_store_id" IN (...) ORDER BY "backend_code_product"."name" DESC;
+SELECT "backend_code_productparameters"."id", "backend_code_productparameters"."pr_id_id", "backend_code_productparameters"."screen_size", "backend_code_productparameters"."dimension", "backend_code_productparameters"."RAM", "backend_code_productparameters"."color" FROM "backend_code_productparameters" WHERE "backend_code_productparameters"."pr_id_id" IN (...);
+SELECT "backend_code_storecategory"."id", "backend_code_storecategory"."store_cat_id", "backend_code_storecategory"."store_cat_creator_id", "backend_code_storecategory"."name" FROM "backend_code_storecategory" WHERE "backend_code_storecategory"."store_cat_creator_id" IN (...) ORDER BY "backend_code_storecategory"."name" DESC;
+SELECT "backend_code_order"."id", "backend_code_order"."order_number", "backend_code_order"."order_slug", "backend_code_order"."order_customer_id", "backend_code_order"."area_code", "backend_code_order"."final_delivery_price", "backend_code_order"."express_delivery", "backend_code_order"."total_price", "backend_code_order"."status", "backend_code_order"."status_changed" FROM "backend_code_order" WHERE "backend_code_order"."order_customer_id" IN (...);
+SELECT "backend_code_archivedorder"."id", "backend_code_archivedorder"."order_number", "backend_code_archivedorder"."order_slug", "backend_code_archivedorder"."order_customer_id", "backend_code_archivedorder"."area_code", "backend_code_archivedorder"."final_delivery_price", "backend_code_archivedorder"."express_delivery", "backend_code_archivedorder"."total_price", "backend_code_archivedorder"."status", "backend_code_archivedorder"."status_changed" FROM "backend_code_archivedorder" WHERE "backend_code_archivedorder"."order_customer_id" IN (...);
+SELECT "account_emailaddress"."id", "account_emailaddress"."user_id", "account_emailaddress"."email", "account_emailaddress"."verified", "account_emailaddress"."primary" FROM "account_emailaddress" WHERE "account_emailaddress"."user_id" IN (...);
+SELECT "socialaccount_socialaccount"."id", "socialaccount_socialaccount"."user_id", "socialaccount_socialaccount"."provider", "socialaccount_socialaccount"."uid", "socialaccount_socialaccount"."last_login", "socialaccount_socialaccount"."date_joined", "socialaccount_socialaccount"."extra_data" FROM "socialaccount_socialaccount" WHERE "socialaccount_socialaccount"."user_id" IN (...);
+UPDATE "backend_code_orderitems" SET "order_vendor_id" = NULL WHERE "backend_code_orderitems"."order_vendor_id" = ?;
+UPDATE "backend_code_archivedorderitems" SET "order_vendor_id" = NULL WHERE "backend_code_archivedorderitems"."order_vendor_id" = ?;
+DELETE FROM "django_admin_log" WHERE "django_admin_log"."user_id" IN (...);
+DELETE FROM "authtoken_token" WHERE "authtoken_token"."user_id" IN (...);
+DELETE FROM "backend_code_storecategory_stores" WHERE "backend_code_storecategory_stores"."store_id" IN (...);
+DELETE FROM "backend_code_product_custom_parameters" WHERE "backend_code_product_custom_parameters"."product_id" IN (...);
+DELETE FROM "backend_code_basket" WHERE "backend_code_basket"."b_product_id" IN (...);
+DELETE FROM "backend_code_orderitems" WHERE "backend_code_orderitems"."order_product_id" IN (...);
+DELETE FROM "backend_code_archivedorderitems" WHERE "backend_code_archivedorderitems"."order_product_id" IN (...);
+DELETE FROM "backend_code_basket" WHERE "backend_code_basket"."b_vendor_id" IN (...);
+DELETE FROM "backend_code_storecategory_stores" WHERE "backend_code_storecategory_stores"."storecategory_id" IN (...);
+DELETE FROM "backend_code_customer_groups" WHERE "backend_code_customer_groups"."customer_id" IN (...);
+DELETE FROM "backend_code_customer_user_permissions" WHERE "backend_code_customer_user_permissions"."customer_id" IN (...);
+DELETE FROM "backend_code_basket" WHERE "backend_code_basket"."b_customer_id" IN (...);
+DELETE FROM "backend_code_orderitems" WHERE "backend_code_orderitems"."number_of_order_id" IN (...);
+DELETE FROM "backend_code_product" WHERE "backend_code_product"."id" IN (...);
+DELETE FROM "backend_code_storecategory" WHERE "backend_code_storecategory"."id" IN (...);
+DELETE FROM "backend_code_order" WHERE "backend_code_order"."id" IN (...);
+DELETE FROM "backend_code_store" WHERE "backend_code_store"."id" IN (...);
+DELETE FROM "backend_code_customer" WHERE "backend_code_customer"."id" IN (...);
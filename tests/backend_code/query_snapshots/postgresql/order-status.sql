@@ -0,0 +1,6 @@
+SELECT "backend_code_customer"."id", "backend_code_customer"."last_login", "backend_code_customer"."email_login", "backend_code_customer"."email_verified", "backend_code_customer"."password", "backend_code_customer"."user_name", "backend_code_customer"."first_name", "backend_code_customer"."last_name", "backend_code_customer"."phone_number", "backend_code_customer"."address", "backend_code_customer"."registered_vendor", "backend_code_customer"."is_active", "backend_code_customer"."organization", "backend_code_customer"."area_code", "backend_code_customer"."seller_vendor_id", "backend_code_customer"."is_staff", "backend_code_customer"."is_superuser" FROM "backend_code_customer" WHERE "backend_code_customer"."email_login" = ? ORDER BY "backend_code_customer"."id" ASC LIMIT ?;
+SELECT "authtoken_token"."key", "authtoken_token"."user_id", "authtoken_token"."created" FROM "authtoken_token" WHERE "authtoken_token"."user_id" = ? ORDER BY "authtoken_token"."key" ASC LIMIT ?;
+SELECT "backend_code_store"."id", "backend_code_store"."vendor_id_id", "backend_code_store"."name", "backend_code_store"."address", "backend_code_store"."url", "backend_code_store"."nominal_delivery_price", "backend_code_store"."status", "backend_code_store"."catalog_version" FROM "backend_code_store" INNER JOIN "backend_code_customer" ON ("backend_code_store"."vendor_id_id" = "backend_code_customer"."id") WHERE "backend_code_customer"."email_login" = ? ORDER BY "backend_code_store"."name" DESC LIMIT ?;
+SELECT "backend_code_order"."id", "backend_code_order"."order_number", "backend_code_order"."status", EXISTS(SELECT U0."id", U0."number_of_order_id", U0."order_product_id", U0."order_prod_vendor", U0."order_vendor_id", U0."order_prod_amount", U0."feed_position" FROM "backend_code_orderitems" U0 WHERE (U0."number_of_order_id" = ("backend_code_order"."id") AND NOT (U0."order_vendor_id" = ? AND U0."order_vendor_id" IS NOT NULL))) AS "shared" FROM "backend_code_order" WHERE ("backend_code_order"."id" IN (SELECT U0."number_of_order_id" FROM "backend_code_orderitems" U0 WHERE U0."order_vendor_id" = ?) AND "backend_code_order"."order_number" IN (...)) FOR UPDATE;
+UPDATE "backend_code_order" SET "status" = ?, "status_changed" = ?::timestamp WHERE "backend_code_order"."id" IN (...);
+INSERT INTO "backend_code_outboxmessage" ("task", "args", "kwargs", "dedupe_key", "created", "attempts", "next_attempt", "last_error") VALUES (?, ?, ?, NULL, ?::timestamp, ?, ?::timestamp, ?) ON CONFLICT DO NOTHING;
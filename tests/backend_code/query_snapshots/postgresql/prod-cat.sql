@@ -0,0 +1 @@
+SELECT "backend_code_productcategory"."id", "backend_code_productcategory"."prod_cat_id", "backend_code_productcategory"."name" FROM "backend_code_productcategory" WHERE "backend_code_productcategory"."prod_cat_id" = ?;
@@ -0,0 +1,8 @@
+SELECT "backend_code_customer"."id", "backend_code_customer"."last_login", "backend_code_customer"."email_login", "backend_code_customer"."email_verified", "backend_code_customer"."password", "backend_code_customer"."user_name", "backend_code_customer"."first_name", "backend_code_customer"."last_name", "backend_code_customer"."phone_number", "backend_code_customer"."address", "backend_code_customer"."registered_vendor", "backend_code_customer"."is_active", "backend_code_customer"."organization", "backend_code_customer"."area_code", "backend_code_customer"."seller_vendor_id", "backend_code_customer"."is_staff", "backend_code_customer"."is_superuser" FROM "backend_code_customer" WHERE "backend_code_customer"."email_login" = ? ORDER BY "backend_code_customer"."id" ASC LIMIT ?;
+SELECT "authtoken_token"."key", "authtoken_token"."user_id", "authtoken_token"."created" FROM "authtoken_token" WHERE "authtoken_token"."user_id" = ? ORDER BY "authtoken_token"."key" ASC LIMIT ?;
+SELECT "backend_code_customer"."id", "backend_code_customer"."last_login", "backend_code_customer"."email_login", "backend_code_customer"."email_verified", "backend_code_customer"."password", "backend_code_customer"."user_name", "backend_code_customer"."first_name", "backend_code_customer"."last_name", "backend_code_customer"."phone_number", "backend_code_customer"."address", "backend_code_customer"."registered_vendor", "backend_code_customer"."is_active", "backend_code_customer"."organization", "backend_code_customer"."area_code", "backend_code_customer"."seller_vendor_id", "backend_code_customer"."is_staff", "backend_code_customer"."is_superuser" FROM "backend_code_customer" WHERE "backend_code_customer"."email_login" = ? ORDER BY "backend_code_customer"."id" ASC LIMIT ?;
+SELECT "backend_code_storecategory"."id", "backend_code_storecategory"."store_cat_id", "backend_code_storecategory"."store_cat_creator_id", "backend_code_storecategory"."name" FROM "backend_code_storecategory" WHERE ("backend_code_storecategory"."store_cat_creator_id" = ? AND "backend_code_storecategory"."store_cat_id" = ?) FOR UPDATE;
+UPDATE "backend_code_storecategory" SET "store_cat_id" = ?, "store_cat_creator_id" = ?, "name" = ? WHERE "backend_code_storecategory"."id" = ?;
+SELECT "backend_code_storecategory"."id", "backend_code_storecategory"."store_cat_id", "backend_code_storecategory"."store_cat_creator_id", "backend_code_storecategory"."name", "backend_code_customer"."id", "backend_code_customer"."last_login", "backend_code_customer"."email_login", "backend_code_customer"."email_verified", "backend_code_customer"."password", "backend_code_customer"."user_name", "backend_code_customer"."first_name", "backend_code_customer"."last_name", "backend_code_customer"."phone_number", "backend_code_customer"."address", "backend_code_customer"."registered_vendor", "backend_code_customer"."is_active", "backend_code_customer"."organization", "backend_code_customer"."area_code", "backend_code_customer"."seller_vendor_id", "backend_code_customer"."is_staff", "backend_code_customer"."is_superuser" FROM "backend_code_storecategory" INNER JOIN "backend_code_customer" ON ("backend_code_storecategory"."store_cat_creator_id" = "backend_code_customer"."id") WHERE "backend_code_storecategory"."id" = ?;
+SELECT ("backend_code_storecategory_stores"."storecategory_id") AS "_prefetch_related_val_storecategory_id", "backend_code_store"."id", "backend_code_store"."vendor_id_id", "backend_code_store"."name", "backend_code_store"."address", "backend_code_store"."url", "backend_code_store"."nominal_delivery_price", "backend_code_store"."status", "backend_code_store"."catalog_version", "backend_code_customer"."id", "backend_code_customer"."last_login", "backend_code_customer"."email_login", "backend_code_customer"."email_verified", "backend_code_customer"."password", "backend_code_customer"."user_name", "backend_code_customer"."first_name", "backend_code_customer"."last_name", "backend_code_customer"."phone_number", "backend_code_customer"."address", "backend_code_customer"."registered_vendor", "backend_code_customer"."is_active", "backend_code_customer"."organization", "backend_code_customer"."area_code", "backend_code_customer"."seller_vendor_id", "backend_code_customer"."is_staff", "backend_code_customer"."is_superuser" FROM "backend_code_store" INNER JOIN "backend_code_storecategory_stores" ON ("backend_code_store"."id" = "backend_code_storecategory_stores"."store_id") INNER JOIN "backend_code_customer" ON ("backend_code_store"."vendor_id_id" = "backend_code_customer"."id") WHERE "backend_code_storecategory_stores"."storecategory_id" IN (...) ORDER BY "backend_code_store"."name" DESC;
+SELECT ("backend_code_storecategory_stores"."store_id") AS "_prefetch_related_val_store_id", "backend_code_storecategory"."id", "backend_code_storecategory"."store_cat_id", "backend_code_storecategory"."store_cat_creator_id", "backend_code_storecategory"."name" FROM "backend_code_storecategory" INNER JOIN "backend_code_storecategory_stores" ON ("backend_code_storecategory"."id" = "backend_code_storecategory_stores"."storecategory_id") WHERE "backend_code_storecategory_stores"."store_id" IN (...) ORDER BY "backend_code_storecategory"."name" DESC;
@@ -0,0 +1,12 @@
+SELECT "backend_code_customer"."id", "backend_code_customer"."last_login", "backend_code_customer"."email_login", "backend_code_customer"."email_verified", "backend_code_customer"."password", "backend_code_customer"."user_name", "backend_code_customer"."first_name", "backend_code_customer"."last_name", "backend_code_customer"."phone_number", "backend_code_customer"."address", "backend_code_customer"."registered_vendor", "backend_code_customer"."is_active", "backend_code_customer"."organization", "backend_code_customer"."area_code", "backend_code_customer"."seller_vendor_id", "backend_code_customer"."is_staff", "backend_code_customer"."is_superuser" FROM "backend_code_customer" WHERE "backend_code_customer"."email_login" = ? ORDER BY "backend_code_customer"."id" ASC LIMIT ?;
+SELECT "authtoken_token"."key", "authtoken_token"."user_id", "authtoken_token"."created" FROM "authtoken_token" WHERE "authtoken_token"."user_id" = ? ORDER BY "authtoken_token"."key" ASC LIMIT ?;
+SELECT "backend_code_customer"."id", "backend_code_customer"."last_login", "backend_code_customer"."email_login", "backend_code_customer"."email_verified", "backend_code_customer"."password", "backend_code_customer"."user_name", "backend_code_customer"."first_name", "backend_code_customer"."last_name", "backend_code_customer"."phone_number", "backend_code_customer"."address", "backend_code_customer"."registered_vendor", "backend_code_customer"."is_active", "backend_code_customer"."organization", "backend_code_customer"."area_code", "backend_code_customer"."seller_vendor_id", "backend_code_customer"."is_staff", "backend_code_customer"."is_superuser" FROM "backend_code_customer" WHERE "backend_code_customer"."email_login" = ? ORDER BY "backend_code_customer"."id" ASC LIMIT ?;
+SELECT "backend_code_storecategory"."id", "backend_code_storecategory"."store_cat_id", "backend_code_storecategory"."store_cat_creator_id", "backend_code_storecategory"."name" FROM "backend_code_storecategory" WHERE "backend_code_storecategory"."store_cat_id" = ? ORDER BY "backend_code_storecategory"."name" DESC LIMIT ?;
+SELECT "backend_code_customer"."id", "backend_code_customer"."last_login", "backend_code_customer"."email_login", "backend_code_customer"."email_verified", "backend_code_customer"."password", "backend_code_customer"."user_name", "backend_code_customer"."first_name", "backend_code_customer"."last_name", "backend_code_customer"."phone_number", "backend_code_customer"."address", "backend_code_customer"."registered_vendor", "backend_code_customer"."is_active", "backend_code_customer"."organization", "backend_code_customer"."area_code", "backend_code_customer"."seller_vendor_id", "backend_code_customer"."is_staff", "backend_code_customer"."is_superuser" FROM "backend_code_customer" WHERE "backend_code_customer"."id" = ?;
+SELECT (...) AS "a" FROM "backend_code_store" WHERE "backend_code_store"."vendor_id_id" = ? LIMIT ?;
+SELECT "backend_code_storecategory"."id", "backend_code_storecategory"."store_cat_id", "backend_code_storecategory"."store_cat_creator_id", "backend_code_storecategory"."name" FROM "backend_code_storecategory" WHERE "backend_code_storecategory"."id" = ?;
+INSERT INTO "backend_code_store" ("vendor_id_id", "name", "address", "url", "nominal_delivery_price", "status", "catalog_version") VALUES (?, ?, ?, NULL, ?, false, ?) RETURNING "backend_code_store"."id";
+SELECT "backend_code_storecategory"."id" FROM "backend_code_storecategory" INNER JOIN "backend_code_storecategory_stores" ON ("backend_code_storecategory"."id" = "backend_code_storecategory_stores"."storecategory_id") WHERE "backend_code_storecategory_stores"."store_id" = ? ORDER BY "backend_code_storecategory"."name" DESC;
+SELECT "backend_code_storecategory_stores"."storecategory_id" FROM "backend_code_storecategory_stores" WHERE ("backend_code_storecategory_stores"."store_id" = ? AND "backend_code_storecategory_stores"."storecategory_id" IN (...));
+INSERT INTO "backend_code_storecategory_stores" ("storecategory_id", "store_id") VALUES (...) RETURNING "backend_code_storecategory_stores"."id";
+SELECT "backend_code_storecategory"."id", "backend_code_storecategory"."store_cat_id", "backend_code_storecategory"."store_cat_creator_id", "backend_code_storecategory"."name" FROM "backend_code_storecategory" INNER JOIN "backend_code_storecategory_stores" ON ("backend_code_storecategory"."id" = "backend_code_storecategory_stores"."storecategory_id") WHERE "backend_code_storecategory_stores"."store_id" = ? ORDER BY "backend_code_storecategory"."name" DESC;
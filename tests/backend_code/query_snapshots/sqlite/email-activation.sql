@@ -0,0 +1,2 @@
+SELECT "backend_code_customer"."id", "backend_code_customer"."last_login", "backend_code_customer"."email_login", "backend_code_customer"."email_verified", "backend_code_customer"."password", "backend_code_customer"."user_name", "backend_code_customer"."first_name", "backend_code_customer"."last_name", "backend_code_customer"."phone_number", "backend_code_customer"."address", "backend_code_customer"."registered_vendor", "backend_code_customer"."is_active", "backend_code_customer"."organization", "backend_code_customer"."area_code", "backend_code_customer"."seller_vendor_id", "backend_code_customer"."is_staff", "backend_code_customer"."is_superuser" FROM "backend_code_customer" WHERE "backend_code_customer"."id" = ?;
+UPDATE "backend_code_customer" SET "last_login" = NULL, "email_login" = ?, "email_verified" = ?, "password" = ?, "user_name" = ?, "first_name" = ?, "last_name" = ?, "phone_number" = ?, "address" = ?, "registered_vendor" = ?, "is_active" = ?, "organization" = ?, "area_code" = ?, "seller_vendor_id" = ?, "is_staff" = ?, "is_superuser" = ? WHERE "backend_code_customer"."id" = ?;
@@ -0,0 +1 @@
+SELECT "backend_code_product"."id", "backend_code_product"."stock_number", "backend_code_product"."slug", "backend_code_product"."name", "backend_code_product"."model", "backend_code_product"."delivery_store_id", "backend_code_product"."amount", "backend_code_product"."price", "backend_code_product"."product_cat_id", "backend_code_product"."weight_class", "backend_code_product"."recommended_price", "backend_code_product"."custom_description", "backend_code_productcategory"."id", "backend_code_productcategory"."prod_cat_id", "backend_code_productcategory"."name" FROM "backend_code_product" INNER JOIN "backend_code_productcategory" ON ("backend_code_product"."product_cat_id" = "backend_code_productcategory"."id") WHERE "backend_code_product"."slug" = ?;
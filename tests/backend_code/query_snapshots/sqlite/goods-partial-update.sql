@@ -0,0 +1,4 @@
+SELECT "backend_code_product"."id", "backend_code_product"."stock_number", "backend_code_product"."slug", "backend_code_product"."name", "backend_code_product"."model", "backend_code_product"."delivery_store_id", "backend_code_product"."amount", "backend_code_product"."price", "backend_code_product"."product_cat_id", "backend_code_product"."weight_class", "backend_code_product"."recommended_price", "backend_code_product"."custom_description", "backend_code_productcategory"."id", "backend_code_productcategory"."prod_cat_id", "backend_code_productcategory"."name" FROM "backend_code_product" INNER JOIN "backend_code_productcategory" ON ("backend_code_product"."product_cat_id" = "backend_code_productcategory"."id") WHERE "backend_code_product"."slug" = ?;
+UPDATE "backend_code_product" SET "stock_number" = ?, "slug" = ?, "name" = ?, "model" = NULL, "delivery_store_id" = ?, "amount" = ?, "price" = ?, "product_cat_id" = ?, "weight_class" = ?, "recommended_price" = ?, "custom_description" = NULL WHERE "backend_code_product"."id" = ?;
+UPDATE "backend_code_store" SET "catalog_version" = ("backend_code_store"."catalog_version" + ?) WHERE "backend_code_store"."id" IN (...);
+SELECT DISTINCT "backend_code_basket"."b_customer_id" FROM "backend_code_basket" WHERE "backend_code_basket"."b_product_id" IN (...);
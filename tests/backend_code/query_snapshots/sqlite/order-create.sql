@@ -0,0 +1,16 @@
+SELECT "backend_code_customer"."id", "backend_code_customer"."last_login", "backend_code_customer"."email_login", "backend_code_customer"."email_verified", "backend_code_customer"."password", "backend_code_customer"."user_name", "backend_code_customer"."first_name", "backend_code_customer"."last_name", "backend_code_customer"."phone_number", "backend_code_customer"."address", "backend_code_customer"."registered_vendor", "backend_code_customer"."is_active", "backend_code_customer"."organization", "backend_code_customer"."area_code", "backend_code_customer"."seller_vendor_id", "backend_code_customer"."is_staff", "backend_code_customer"."is_superuser" FROM "backend_code_customer" WHERE "backend_code_customer"."email_login" = ? ORDER BY "backend_code_customer"."id" ASC LIMIT ?;
+SELECT "authtoken_token"."key", "authtoken_token"."user_id", "authtoken_token"."created" FROM "authtoken_token" WHERE "authtoken_token"."user_id" = ? ORDER BY "authtoken_token"."key" ASC LIMIT ?;
+SELECT "backend_code_customer"."id", "backend_code_customer"."last_login", "backend_code_customer"."email_login", "backend_code_customer"."email_verified", "backend_code_customer"."password", "backend_code_customer"."user_name", "backend_code_customer"."first_name", "backend_code_customer"."last_name", "backend_code_customer"."phone_number", "backend_code_customer"."address", "backend_code_customer"."registered_vendor", "backend_code_customer"."is_active", "backend_code_customer"."organization", "backend_code_customer"."area_code", "backend_code_customer"."seller_vendor_id", "backend_code_customer"."is_staff", "backend_code_customer"."is_superuser" FROM "backend_code_customer" WHERE "backend_code_customer"."email_login" = ? ORDER BY "backend_code_customer"."id" ASC LIMIT ?;
+SELECT "backend_code_basket"."id", "backend_code_basket"."b_customer_id", "backend_code_basket"."b_product_id", "backend_code_basket"."b_vendor_id", "backend_code_basket"."amount", "backend_code_product"."id", "backend_code_product"."stock_number", "backend_code_product"."slug", "backend_code_product"."name", "backend_code_product"."model", "backend_code_product"."delivery_store_id", "backend_code_product"."amount", "backend_code_product"."price", "backend_code_product"."product_cat_id", "backend_code_product"."weight_class", "backend_code_product"."recommended_price", "backend_code_product"."custom_description", "backend_code_store"."id", "backend_code_store"."vendor_id_id", "backend_code_store"."name", "backend_code_store"."address", "backend_code_store"."url", "backend_code_store"."nominal_delivery_price", "backend_code_store"."status", "backend_code_store"."catalog_version" FROM "backend_code_basket" INNER JOIN "backend_code_product" ON ("backend_code_basket"."b_product_id" = "backend_code_product"."id") INNER JOIN "backend_code_store" ON ("backend_code_basket"."b_vendor_id" = "backend_code_store"."id") WHERE "backend_code_basket"."b_customer_id" = ?;
+SELECT (...) AS "a" FROM "backend_code_order" WHERE "backend_code_order"."order_number" = ? LIMIT ?;
+SELECT "backend_code_customer"."id", "backend_code_customer"."last_login", "backend_code_customer"."email_login", "backend_code_customer"."email_verified", "backend_code_customer"."password", "backend_code_customer"."user_name", "backend_code_customer"."first_name", "backend_code_customer"."last_name", "backend_code_customer"."phone_number", "backend_code_customer"."address", "backend_code_customer"."registered_vendor", "backend_code_customer"."is_active", "backend_code_customer"."organization", "backend_code_customer"."area_code", "backend_code_customer"."seller_vendor_id", "backend_code_customer"."is_staff", "backend_code_customer"."is_superuser" FROM "backend_code_customer" WHERE "backend_code_customer"."id" = ?;
+SELECT "backend_code_product"."id", "backend_code_product"."stock_number", "backend_code_product"."amount" FROM "backend_code_product" WHERE "backend_code_product"."id" IN (...) ORDER BY "backend_code_product"."id" ASC;
+UPDATE "backend_code_product" SET "amount" = ("backend_code_product"."amount" - CASE WHEN ("backend_code_product"."id" = ?) THEN ? ... ELSE NULL END) WHERE ("backend_code_product"."amount" >= (CASE WHEN "backend_code_product"."id" = ? THEN ? ... ELSE NULL END) AND "backend_code_product"."id" IN (...));
+INSERT INTO "backend_code_order" ("order_number", "order_slug", "order_customer_id", "area_code", "final_delivery_price", "express_delivery", "total_price", "status", "status_changed") VALUES (...);
+INSERT INTO "backend_code_orderitems" ("number_of_order_id", "order_product_id", "order_prod_vendor", "order_vendor_id", "order_prod_amount", "feed_position") SELECT ?, ?, ?, ?, ?, NULL UNION ALL ...;
+DELETE FROM "backend_code_basket" WHERE "backend_code_basket"."id" IN (...);
+SELECT MIN("backend_code_orderitems"."id") AS "first", MAX("backend_code_orderitems"."id") AS "last" FROM "backend_code_orderitems" WHERE "backend_code_orderitems"."number_of_order_id" = ?;
+UPDATE "backend_code_idsequence" SET "last_block" = ("backend_code_idsequence"."last_block" + ?) WHERE "backend_code_idsequence"."name" = ?;
+SELECT "backend_code_idsequence"."last_block" FROM "backend_code_idsequence" WHERE "backend_code_idsequence"."name" = ?;
+UPDATE "backend_code_orderitems" SET "feed_position" = (("backend_code_orderitems"."id" - ?) + ?) WHERE "backend_code_orderitems"."number_of_order_id" = ?;
+INSERT OR IGNORE INTO "backend_code_outboxmessage" ("task", "args", "kwargs", "dedupe_key", "created", "attempts", "next_attempt", "last_error") SELECT ?, ?, ?, ?, ?, ?, ?, ?;
@@ -0,0 +1,4 @@
+SELECT "backend_code_customer"."id", "backend_code_customer"."last_login", "backend_code_customer"."email_login", "backend_code_customer"."email_verified", "backend_code_customer"."password", "backend_code_customer"."user_name", "backend_code_customer"."first_name", "backend_code_customer"."last_name", "backend_code_customer"."phone_number", "backend_code_customer"."address", "backend_code_customer"."registered_vendor", "backend_code_customer"."is_active", "backend_code_customer"."organization", "backend_code_customer"."area_code", "backend_code_customer"."seller_vendor_id", "backend_code_customer"."is_staff", "backend_code_customer"."is_superuser" FROM "backend_code_customer" WHERE "backend_code_customer"."email_login" = ? ORDER BY "backend_code_customer"."id" ASC LIMIT ?;
+SELECT "authtoken_token"."key", "authtoken_token"."user_id", "authtoken_token"."created" FROM "authtoken_token" WHERE "authtoken_token"."user_id" = ? ORDER BY "authtoken_token"."key" ASC LIMIT ?;
+SELECT "backend_code_order"."id", "backend_code_order"."order_number", "backend_code_order"."order_slug", "backend_code_order"."order_customer_id", "backend_code_order"."area_code", "backend_code_order"."final_delivery_price", "backend_code_order"."express_delivery", "backend_code_order"."total_price", "backend_code_order"."status", "backend_code_order"."status_changed", "backend_code_customer"."id", "backend_code_customer"."last_login", "backend_code_customer"."email_login", "backend_code_customer"."email_verified", "backend_code_customer"."password", "backend_code_customer"."user_name", "backend_code_customer"."first_name", "backend_code_customer"."last_name", "backend_code_customer"."phone_number", "backend_code_customer"."address", "backend_code_customer"."registered_vendor", "backend_code_customer"."is_active", "backend_code_customer"."organization", "backend_code_customer"."area_code", "backend_code_customer"."seller_vendor_id", "backend_code_customer"."is_staff", "backend_code_customer"."is_superuser" FROM "backend_code_order" INNER JOIN "backend_code_customer" ON ("backend_code_order"."order_customer_id" = "backend_code_customer"."id") WHERE "backend_code_order"."order_slug" = ?;
+SELECT "backend_code_orderitems"."id", "backend_code_orderitems"."number_of_order_id", "backend_code_orderitems"."order_product_id", "backend_code_orderitems"."order_prod_vendor", "backend_code_orderitems"."order_vendor_id", "backend_code_orderitems"."order_prod_amount", "backend_code_orderitems"."feed_position", "backend_code_product"."id", "backend_code_product"."stock_number", "backend_code_product"."slug", "backend_code_product"."name", "backend_code_product"."model", "backend_code_product"."delivery_store_id", "backend_code_product"."amount", "backend_code_product"."price", "backend_code_product"."product_cat_id", "backend_code_product"."weight_class", "backend_code_product"."recommended_price", "backend_code_product"."custom_description", "backend_code_productcategory"."id", "backend_code_productcategory"."prod_cat_id", "backend_code_productcategory"."name" FROM "backend_code_orderitems" INNER JOIN "backend_code_product" ON ("backend_code_orderitems"."order_product_id" = "backend_code_product"."id") INNER JOIN "backend_code_productcategory" ON ("backend_code_product"."product_cat_id" = "backend_code_productcategory"."id") WHERE "backend_code_orderitems"."number_of_order_id" IN (...) ORDER BY "backend_code_orderitems"."number_of_order_id" DESC;
@@ -0,0 +1,4 @@
+SELECT "backend_code_customer"."id", "backend_code_customer"."last_login", "backend_code_customer"."email_login", "backend_code_customer"."email_verified", "backend_code_customer"."password", "backend_code_customer"."user_name", "backend_code_customer"."first_name", "backend_code_customer"."last_name", "backend_code_customer"."phone_number", "backend_code_customer"."address", "backend_code_customer"."registered_vendor", "backend_code_customer"."is_active", "backend_code_customer"."organization", "backend_code_customer"."area_code", "backend_code_customer"."seller_vendor_id", "backend_code_customer"."is_staff", "backend_code_customer"."is_superuser" FROM "backend_code_customer" WHERE "backend_code_customer"."email_login" = ? ORDER BY "backend_code_customer"."id" ASC LIMIT ?;
+SELECT "authtoken_token"."key", "authtoken_token"."user_id", "authtoken_token"."created" FROM "authtoken_token" WHERE "authtoken_token"."user_id" = ? ORDER BY "authtoken_token"."key" ASC LIMIT ?;
+SELECT "backend_code_order"."id", "backend_code_order"."order_number", "backend_code_order"."order_slug", "backend_code_order"."order_customer_id", "backend_code_order"."area_code", "backend_code_order"."final_delivery_price", "backend_code_order"."express_delivery", "backend_code_order"."total_price", "backend_code_order"."status", "backend_code_order"."status_changed" FROM "backend_code_order" INNER JOIN "backend_code_customer" ON ("backend_code_order"."order_customer_id" = "backend_code_customer"."id") WHERE "backend_code_customer"."email_login" = ? ORDER BY "backend_code_order"."id" DESC LIMIT ?;
+SELECT MAX("backend_code_archivedorder"."id") AS "last_id" FROM "backend_code_archivedorder";
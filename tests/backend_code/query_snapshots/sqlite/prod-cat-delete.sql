@@ -0,0 +1,11 @@
+SELECT "backend_code_customer"."id", "backend_code_customer"."last_login", "backend_code_customer"."email_login", "backend_code_customer"."email_verified", "backend_code_customer"."password", "backend_code_customer"."user_name", "backend_code_customer"."first_name", "backend_code_customer"."last_name", "backend_code_customer"."phone_number", "backend_code_customer"."address", "backend_code_customer"."registered_vendor", "backend_code_customer"."is_active", "backend_code_customer"."organization", "backend_code_customer"."area_code", "backend_code_customer"."seller_vendor_id", "backend_code_customer"."is_staff", "backend_code_customer"."is_superuser" FROM "backend_code_customer" WHERE "backend_code_customer"."email_login" = ? ORDER BY "backend_code_customer"."id" ASC LIMIT ?;
+SELECT "authtoken_token"."key", "authtoken_token"."user_id", "authtoken_token"."created" FROM "authtoken_token" WHERE "authtoken_token"."user_id" = ? ORDER BY "authtoken_token"."key" ASC LIMIT ?;
+SELECT "backend_code_productcategory"."id", "backend_code_productcategory"."prod_cat_id", "backend_code_productcategory"."name" FROM "backend_code_productcategory" WHERE "backend_code_productcategory"."prod_cat_id" = ?;
+SELECT "backend_code_product"."id", "backend_code_product"."stock_number", "backend_code_product"."slug", "backend_code_product"."name", "backend_code_product"."model", "backend_code_product"."delivery_store_id", "backend_code_product"."amount", "backend_code_product"."price", "backend_code_product"."product_cat_id", "backend_code_product"."weight_class", "backend_code_product"."recommended_price", "backend_code_product"."custom_description" FROM "backend_code_product" WHERE "backend_code_product"."product_cat_id" IN (...) ORDER BY "backend_code_product"."name" DESC;
+SELECT "backend_code_productparameters"."id", "backend_code_productparameters"."pr_id_id", "backend_code_productparameters"."screen_size", "backend_code_productparameters"."dimension", "backend_code_productparameters"."RAM", "backend_code_productparameters"."color" FROM "backend_code_productparameters" WHERE "backend_code_productparameters"."pr_id_id" IN (...);
+DELETE FROM "backend_code_product_custom_parameters" WHERE "backend_code_product_custom_parameters"."product_id" IN (...);
+DELETE FROM "backend_code_basket" WHERE "backend_code_basket"."b_product_id" IN (...);
+DELETE FROM "backend_code_orderitems" WHERE "backend_code_orderitems"."order_product_id" IN (...);
+DELETE FROM "backend_code_archivedorderitems" WHERE "backend_code_archivedorderitems"."order_product_id" IN (...);
+DELETE FROM "backend_code_product" WHERE "backend_code_product"."id" IN (...);
+DELETE FROM "backend_code_productcategory" WHERE "backend_code_productcategory"."id" IN (...);
@@ -0,0 +1,4 @@
+SELECT (...) AS "a" FROM "backend_code_customer" WHERE "backend_code_customer"."email_login" = ? LIMIT ?;
+SELECT (...) AS "a" FROM "backend_code_customer" WHERE "backend_code_customer"."seller_vendor_id" = ? LIMIT ?;
+INSERT INTO "backend_code_customer" ("last_login", "email_login", "email_verified", "password", "user_name", "first_name", "last_name", "phone_number", "address", "registered_vendor", "is_active", "organization", "area_code", "seller_vendor_id", "is_staff", "is_superuser") VALUES (NULL, ?, ?, ?, ?, ?, ?, ?, NULL, ?, ?, ?, ?, ?, ?, ?);
+INSERT OR IGNORE INTO "backend_code_outboxmessage" ("task", "args", "kwargs", "dedupe_key", "created", "attempts", "next_attempt", "last_error") SELECT ?, ?, ?, NULL, ?, ?, ?, ?;
@@ -0,0 +1,174 @@
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from backend_code.export_artifacts import download_url, write_artifact
+from backend_code.models import Customer, Store, StoreCategory, ProductCategory, Product, Basket, Order, OrderItems
+from backend_code.sql_stats import fingerprint
+from backend_code.token_gen import generate_token
+from backend_code.vendor_feed import assign_feed_positions
+from tests.backend_code.tests import app_queries
+
+# every route runs against 1, 10 and 100 rows per relation: the number of statements must not change
+SIZES = (1, 10, 100)
+SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), 'query_snapshots')
+# UPDATE_QUERY_SNAPSHOTS=True rewrites the snapshots after an intended change of the SQL
+UPDATE_SNAPSHOTS = os.environ.get('UPDATE_QUERY_SNAPSHOTS') == 'True'
+
+
+def seed(size, run):
+    '''
+    Покупатель-продавец с магазином, size товаров в корзине, size заказов по size позиций, категория магазинов с size магазинами. Данные каждого прогона run не пересекаются.
+    '''
+    base = run * 100000
+    customer = Customer.objects.create(first_name='budget', last_name='budget', email_login=f'budget{run}@budget.com', password=make_password('valid0_password'),
+                                       user_name='budget', phone_number='1', area_code=2, address='address', registered_vendor=True, email_verified=True,
+                                       is_active=True, is_staff=True, seller_vendor_id=base)
+    Token.objects.create(user=customer)
+    # a vendor without a store creates one
+    free_vendor = Customer.objects.create(first_name='free', last_name='free', email_login=f'free{run}@budget.com', password='-', user_name='free', phone_number='1',
+                                          area_code=2, registered_vendor=True, is_active=True, seller_vendor_id=base + size)
+    Token.objects.create(user=free_vendor)
+    store = Store.objects.create(vendor_id=customer, name='budget', address='address', nominal_delivery_price=50)
+    Customer.objects.bulk_create([Customer(first_name='vendor', last_name='vendor', email_login=f'budget{run}-{i}@budget.com', password='-', user_name='vendor',
+                                           phone_number='1', registered_vendor=True, seller_vendor_id=base + 1 + i) for i in range(size - 1)])
+    vendors = Customer.objects.filter(email_login__startswith=f'budget{run}-')
+    Store.objects.bulk_create([Store(vendor_id=vendor, name=f'vendor {i}', address='address', nominal_delivery_price=50) for i, vendor in enumerate(vendors)])
+    store_cat = StoreCategory.objects.create(store_cat_id=base, store_cat_creator=customer, name='budget')
+    store_cat.stores.set(Store.objects.filter(vendor_id__email_login__startswith=f'budget{run}'))
+    # only a category without stores can be deleted
+    empty_store_cat = StoreCategory.objects.create(store_cat_id=base + 1, store_cat_creator=customer, name='empty')
+    product_cat = ProductCategory.objects.create(prod_cat_id=base, name='budget')
+    Product.objects.bulk_create([Product(stock_number=base + i, name=f'budget {i}', amount=1000, price=100 + i, weight_class=1 + i % 5, recommended_price=100,
+                                         delivery_store=store, product_cat=product_cat, slug=str(base + i)) for i in range(size)])
+    products = list(Product.objects.filter(delivery_store=store).order_by('id'))
+    Basket.objects.bulk_create([Basket(b_customer=customer, b_product=product, b_vendor=store, amount=1) for product in products])
+    Order.objects.bulk_create([Order(order_number=base + i, order_slug=str(base + i), order_customer=customer, area_code=2, final_delivery_price=50, total_price=100, status='new')
+                               for i in range(size)])
+    orders = list(Order.objects.filter(order_customer=customer).order_by('id'))
+    OrderItems.objects.bulk_create([OrderItems(number_of_order=order, order_product=product, order_prod_vendor=str(store), order_vendor=store, order_prod_amount=1)
+                                    for order in orders for product in products])
+    assign_feed_positions(OrderItems.objects.filter(number_of_order__in=orders))
+    return {'run': run, 'customer': customer, 'free_vendor': free_vendor, 'store': store, 'store_cat': store_cat, 'empty_store_cat': empty_store_cat, 'product_cat': product_cat,
+            'products': products, 'orders': orders}
+
+
+def credentials(seeded, **data):
+    return dict(data, email_login=seeded['customer'].email_login)
+
+
+def export_url(seeded):
+    store = seeded['store']
+    write_artifact(store, store.catalog_version, [{'stock_number': product.stock_number} for product in seeded['products']], None)
+    return download_url('testserver', store, store.catalog_version).replace('http://testserver', '')
+
+
+def activation_url(seeded):
+    customer = seeded['customer']
+    return f'/api/v1/email-activation/{urlsafe_base64_encode(force_bytes(customer.pk))}/{generate_token.make_token(customer)}/'
+
+
+# route: (method, url, request data, body format, expected status)
+ROUTES = {
+    'customers': ('get', lambda seeded: '/api/v1/customers/', credentials, 'json', 200),
+    'customers-update': ('patch', lambda seeded: '/api/v1/customers/', lambda seeded: credentials(seeded, first_name='updated', registered_vendor='True'), 'multipart', 200),
+    'customers-delete': ('delete', lambda seeded: '/api/v1/customers/', credentials, 'json', 204),
+    'goods-import': ('post', lambda seeded: '/api/v1/goods-import/', credentials, 'json', 200),
+    'user-signup': ('post', lambda seeded: '/api/v1/user-signup/', lambda seeded: {
+        'first_name': '1', 'last_name': '1', 'email_login': f'signup{seeded["run"]}@budget.com', 'password': 'valid0_password', 'user_name': '1',
+        'phone_number': '1', 'area_code': '1', 'registered_vendor': 'True', 'is_active': 'True'}, 'multipart', 201),
+    'store': ('get', lambda seeded: '/api/v1/store/', credentials, 'json', 200),
+    'store-create': ('post', lambda seeded: '/api/v1/store/', lambda seeded: {
+        'email_login': seeded['free_vendor'].email_login, 'name': 'free', 'address': 'address', 'nominal_delivery_price': 50, 'store_cat_id': seeded['store_cat'].store_cat_id},
+                     'multipart', 200),
+    'store-update': ('patch', lambda seeded: '/api/v1/store/', lambda seeded: credentials(seeded, nominal_delivery_price=60, store_cat_id=seeded['store_cat'].store_cat_id),
+                     'multipart', 200),
+    'store-delete': ('delete', lambda seeded: '/api/v1/store/', credentials, 'json', 200),
+    'basket-list': ('get', lambda seeded: '/api/v1/basket/', credentials, 'json', 200),
+    'basket-create': ('post', lambda seeded: '/api/v1/basket/', lambda seeded: credentials(seeded, stock_number=seeded['products'][0].stock_number, amount=3), 'json', 200),
+    'basket-batch': ('post', lambda seeded: '/api/v1/basket/', lambda seeded: credentials(seeded, items=[
+        {'stock_number': product.stock_number, 'amount': 2} for product in seeded['products']]), 'json', 200),
+    'basket-delete': ('delete', lambda seeded: '/api/v1/basket/', lambda seeded: credentials(seeded, stock_number=seeded['products'][0].stock_number), 'json', 200),
+    'basket-quote': ('get', lambda seeded: '/api/v1/basket-quote/', credentials, 'json', 200),
+    'store-cat': ('get', lambda seeded: '/api/v1/store-cat/', lambda seeded: credentials(seeded, store_cat_id=seeded['store_cat'].store_cat_id), 'json', 200),
+    'store-cat-update': ('post', lambda seeded: '/api/v1/store-cat/', lambda seeded: credentials(seeded, store_cat_id=seeded['store_cat'].store_cat_id, name='updated'),
+                         'json', 200),
+    'store-cat-delete': ('delete', lambda seeded: '/api/v1/store-cat/', lambda seeded: credentials(seeded, store_cat_id=seeded['empty_store_cat'].store_cat_id), 'json', 200),
+    'prod-cat': ('get', lambda seeded: '/api/v1/prod-cat/', lambda seeded: {'prod_cat_id': seeded['product_cat'].prod_cat_id}, 'json', 200),
+    'prod-cat-update': ('post', lambda seeded: '/api/v1/prod-cat/', lambda seeded: credentials(seeded, prod_cat_id=seeded['product_cat'].prod_cat_id, name='updated'), 'json', 200),
+    'prod-cat-delete': ('delete', lambda seeded: '/api/v1/prod-cat/', lambda seeded: credentials(seeded, prod_cat_id=seeded['product_cat'].prod_cat_id), 'json', 200),
+    'login': ('post', lambda seeded: '/api/v1/login/', lambda seeded: credentials(seeded, password='valid0_password'), 'json', 200),
+    'order-list': ('get', lambda seeded: '/api/v1/order/', credentials, 'json', 200),
+    'order-create': ('post', lambda seeded: '/api/v1/order/', lambda seeded: credentials(seeded, express_delivery='False'), 'json', 201),
+    'order-delete': ('delete', lambda seeded: '/api/v1/order/', lambda seeded: credentials(seeded, order_number=seeded['orders'][0].order_number), 'json', 200),
+    'order-status': ('post', lambda seeded: '/api/v1/order-status/', lambda seeded: credentials(seeded, status='confirmed', order_numbers=[
+        order.order_number for order in seeded['orders']]), 'json', 200),
+    'vendor-orders': ('get', lambda seeded: '/api/v1/vendor-orders/', lambda seeded: credentials(seeded, limit=100), 'json', 200),
+    'order-detail': ('get', lambda seeded: f'/api/v1/order-detail/{seeded["orders"][0].order_slug}/', credentials, 'json', 200),
+    'email-activation': ('get', activation_url, lambda seeded: {}, 'json', 200),
+    'product-export': ('get', lambda seeded: '/api/v1/product-export/', credentials, 'json', 200),
+    'product-export-download': ('get', export_url, lambda seeded: {}, 'json', 200),
+    'delivery-quotes': ('post', lambda seeded: '/api/v1/delivery-quotes/', lambda seeded: credentials(seeded, limit=100), 'json', 200),
+    'goods-list': ('get', lambda seeded: '/api/v1/goods/', lambda seeded: {}, 'json', 200),
+    'goods-detail': ('get', lambda seeded: f'/api/v1/goods/{seeded["products"][0].slug}/', lambda seeded: {}, 'json', 200),
+    'goods-update': ('put', lambda seeded: f'/api/v1/goods/{seeded["products"][0].slug}/', lambda seeded: {
+        'stock_number': seeded['products'][0].stock_number, 'name': 'updated', 'amount': 10, 'price': 200, 'recommended_price': 200, 'weight_class': 1}, 'json', 200),
+    'goods-partial-update': ('patch', lambda seeded: f'/api/v1/goods/{seeded["products"][0].slug}/', lambda seeded: {'price': 200}, 'json', 200),
+    'goods-delete': ('delete', lambda seeded: f'/api/v1/goods/{seeded["products"][0].slug}/', credentials, 'json', 204),
+}
+
+
+def run_route(route, seeded):
+    method, url, data, body_format, expected_status = ROUTES[route]
+    client = APIClient()
+    url, data = url(seeded), data(seeded)
+    # throttling counters live in the cache
+    cache.clear()
+    with CaptureQueriesContext(connection) as queries:
+        if method == 'get':
+            # the API reads credentials from the request body, also for GET requests
+            response = client.generic('GET', url, json.dumps(data), content_type='application/json')
+        else:
+            response = getattr(client, method)(url, data, format=body_format)
+    assert response.status_code == expected_status, response.content
+    if hasattr(response, 'streaming_content'):
+        b''.join(response.streaming_content)
+    return [fingerprint(query['sql']) for query in app_queries(queries)]
+
+
+def check_snapshot(route, statements):
+    # the SQL text differs between database backends: one snapshot directory per backend
+    path = os.path.join(SNAPSHOT_DIR, connection.vendor, f'{route}.sql')
+    text = ''.join(f'{statement};\n' for statement in statements)
+    if UPDATE_SNAPSHOTS:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file:
+            file.write(text)
+        return
+    assert os.path.exists(path), f'No SQL snapshot of {route} for {connection.vendor}, create it with UPDATE_QUERY_SNAPSHOTS=True and commit it'
+    with open(path) as file:
+        assert text == file.read(), f'SQL of {route} changed, see the diff above or rerun with UPDATE_QUERY_SNAPSHOTS=True'
+
+
+@pytest.mark.parametrize('route', ROUTES)
+@pytest.mark.django_db(transaction=True)
+def test_query_budget(route, tmp_path):
+    with override_settings(EXPORT_ROOT=str(tmp_path)), \
+            patch('backend_code.views.import_product_list_async.delay'), patch('backend_code.views.export_product_list_async.delay'):
+        # a warm-up run fills per-process caches (id blocks, sites, content types) before the measured runs
+        run_route(route, seed(SIZES[0], 0))
+        statements = {size: run_route(route, seed(size, run)) for run, size in enumerate(SIZES, 1)}
+    counts = {size: len(statements[size]) for size in SIZES}
+    assert len(set(counts.values())) == 1, f'{route}: statements per size {counts}'
+    check_snapshot(route, statements[SIZES[-1]])
@@ -1,18 +1,56 @@
+import asyncio
+import importlib
+import gzip
+import json
+import os
+import re
+import smtplib
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from unittest.mock import patch, MagicMock
 
 import pytest
 from django.contrib.auth.hashers import make_password
 from django.core import mail
+from django.core.cache import cache
+from django.db import connection, transaction, IntegrityError, OperationalError
+from django.db.models import F, Max
+from django.http import JsonResponse, StreamingHttpResponse
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 
+from asgiref.testing import ApplicationCommunicator
 from celery import Celery
-
-from backend_code.models import Customer, Product, Store, StoreCategory, ProductCategory, Basket, Order
-from backend_code.tasks import send_mail_async
+from celery.exceptions import SoftTimeLimitExceeded
+
+from backend_code.archive import archive_orders, archive_watermark
+from backend_code.async_views import AsgiRouter, build_environ
+from backend_code.basket import basket_quote
+from backend_code.checkout import checkout, CheckoutError
+from backend_code.delivery import delivery_price, quote_baskets, quote_orders
+from backend_code.export_artifacts import bump_catalog_version, evict_artifacts
+from backend_code.jobs import start_vendor_job, vendor_job_lease
+from backend_code.mail import queue_mail, deliver_mail
+from backend_code import db_connections, db_router, metrics, profiling, sql_stats
+from backend_code.notifications import order_mail, _template
+from backend_code.outbox import enqueue, relay_outbox, deliver_once
+from backend_code.id_allocator import IdAllocator, ID_BLOCK_SIZE, ID_OFFSET, scramble
+from backend_code.stock import reserve_stock, release_stock, InsufficientStock
+from backend_code.synthetic_data import SeedPlan, seed_data, GENERATORS
+from backend_code.models import Customer, Product, Store, StoreCategory, ProductCategory, Basket, Order, OrderItems, ArchivedOrder, \
+    ArchivedOrderItems, QueuedEmail, OutboxMessage, ProductParameters, IdSequence
+from backend_code.tasks import export_product_list, send_mail_async, order_status_emails_async, activation_email_async, import_product_list_async, \
+    export_product_list_async, archive_orders_async
+from backend_code.vendor_feed import assign_feed_positions, vendor_feed, wait_for_items
 from marketplace import settings
+from marketplace.celery import app as celery_app, QUEUE_PROFILES
 
 
 @pytest.fixture
@@ -61,9 +99,21 @@ def sample_product(sample_store, sample_product_cat):
 
 @pytest.fixture
 def sample_basket(login_user, sample_product, sample_store):
-    sample_basket = Basket.objects.create(b_customer=login_user, b_product=sample_product, b_vendor=sample_store, amount=100)
+    sample_basket = Basket.objects.create(b_customer=login_user, b_product=sample_product, b_vendor=sample_store, amount=5)
     return sample_basket
 
+def app_queries(queries):
+    # skip the profiler's own bookkeeping (silk) and transaction control statements
+    return [query for query in queries.captured_queries if 'silk_' not in query['sql'] and not query['sql'].startswith(('EXPLAIN', 'BEGIN', 'SAVEPOINT', 'RELEASE SAVEPOINT'))]
+
+
+def fill_basket(customer, store, product_cat, size, amount=1):
+    Product.objects.bulk_create([Product(stock_number=1000 + i, slug=str(1000 + i), name=f'name {i}', amount=amount * 10, price=100 + i, weight_class=1 + i % 3, recommended_price=50, delivery_store=store, product_cat=product_cat) for i in range(size)])
+    products = Product.objects.filter(stock_number__gte=1000, stock_number__lt=1000 + size)
+    Basket.objects.bulk_create([Basket(b_customer=customer, b_product=product, b_vendor=store, amount=amount) for product in products])
+    return products
+
+
 @pytest.fixture
 def sample_order(login_user, sample_basket):
     sample_order = Order.objects.create(order_number=1, order_customer=login_user, area_code=1, final_delivery_price=100, total_price=200, status='new')
@@ -330,3 +380,1260 @@ class TestOrderDetail:
     def test_get_order_details(self, client, login_user, sample_order, order_detail_user, order_detail_number):
         response_get_order_details = client.get(f'/api/v1/order-detail/{order_detail_number}/', data={'email_login': order_detail_user})
         assert response_get_order_details.status_code == 200
+
+
+class TestCheckout:
+
+    # query count does not depend on basket size
+    @pytest.mark.django_db(transaction=True)
+    def test_checkout_constant_queries(self, login_user, sample_store, sample_product_cat):
+        login_user.address = 'address'
+        login_user.save()
+        query_counts = []
+        # the first checkout of the process reserves a block of order numbers, it is not measured
+        for size in (1, 1, 20):
+            fill_basket(login_user, sample_store, sample_product_cat, size)
+            with CaptureQueriesContext(connection) as queries:
+                checkout(login_user, 'False')
+            query_counts.append(len(queries))
+            Product.objects.filter(stock_number__gte=1000).delete()
+        assert query_counts[1] == query_counts[2]
+
+    # totals use item amounts, basket is cleared
+    @pytest.mark.django_db(transaction=True)
+    def test_checkout_totals(self, login_user, sample_store, sample_product_cat):
+        login_user.address = 'address'
+        login_user.save()
+        fill_basket(login_user, sample_store, sample_product_cat, 3, amount=2)
+        current_order, _ = checkout(login_user, 'True')
+        assert current_order.total_price == (100 + 101 + 102) * 2
+        assert current_order.final_delivery_price == 1 * 50 * 3 * 3
+        assert OrderItems.objects.filter(number_of_order=current_order).count() == 3
+        assert not Basket.objects.filter(b_customer=login_user).exists()
+
+    # failed item insert leaves neither an order nor a cleared basket
+    @pytest.mark.django_db(transaction=True)
+    def test_checkout_atomic(self, login_user, sample_store, sample_product_cat):
+        login_user.address = 'address'
+        login_user.save()
+        fill_basket(login_user, sample_store, sample_product_cat, 3)
+        with patch('backend_code.checkout.OrderItems.objects.bulk_create', side_effect=RuntimeError):
+            with pytest.raises(RuntimeError):
+                checkout(login_user, 'False')
+        assert not Order.objects.exists()
+        assert Basket.objects.filter(b_customer=login_user).count() == 3
+
+    # empty basket
+    @pytest.mark.django_db(transaction=True)
+    def test_checkout_empty_basket(self, login_user):
+        with pytest.raises(CheckoutError) as err:
+            checkout(login_user, 'False')
+        assert err.value.status == 404
+
+
+class TestStock:
+
+    # short line fails the whole reservation
+    @pytest.mark.django_db(transaction=True)
+    def test_reserve_stock_short(self, sample_store, sample_product_cat):
+        products = fill_basket(sample_store.vendor_id, sample_store, sample_product_cat, 2, amount=1)
+        with pytest.raises(InsufficientStock) as err:
+            with transaction.atomic():
+                reserve_stock({products[0].id: 1, products[1].id: 11})
+        assert err.value.stock_numbers == [products[1].stock_number]
+        assert sorted(Product.objects.filter(stock_number__gte=1000).values_list('amount', flat=True)) == [10, 10]
+
+    # lines of several orders are summed per product and returned with one UPDATE
+    @pytest.mark.django_db(transaction=True)
+    def test_release_stock(self, login_user, sample_store, sample_product_cat):
+        products = fill_basket(login_user, sample_store, sample_product_cat, 3, amount=1)
+        orders = [Order.objects.create(order_number=number, order_customer=login_user, area_code=1, final_delivery_price=0, total_price=0, status='canceled') for number in (1, 2)]
+        OrderItems.objects.bulk_create([
+            OrderItems(number_of_order=orders[0], order_product=products[0], order_prod_vendor=str(sample_store), order_prod_amount=2),
+            OrderItems(number_of_order=orders[1], order_product=products[0], order_prod_vendor=str(sample_store), order_prod_amount=3),
+            OrderItems(number_of_order=orders[1], order_product=products[1], order_prod_vendor=str(sample_store), order_prod_amount=4),
+        ])
+        with CaptureQueriesContext(connection) as queries, transaction.atomic():
+            release_stock(orders)
+        assert len([query for query in queries if query['sql'].startswith('UPDATE')]) == 1
+        amounts = dict(Product.objects.values_list('id', 'amount'))
+        assert [amounts[product.id] for product in products] == [15, 14, 10]
+
+    # checkout reserves stock, order delete releases it
+    @pytest.mark.django_db(transaction=True)
+    def test_checkout_reserves_and_delete_releases(self, client, login_user, sample_store, sample_product_cat):
+        login_user.address = 'address'
+        login_user.save()
+        fill_basket(login_user, sample_store, sample_product_cat, 2, amount=3)
+        current_order, _ = checkout(login_user, 'False')
+        assert list(Product.objects.filter(stock_number__gte=1000).values_list('amount', flat=True)) == [27, 27]
+        response_order_delete = client.delete('/api/v1/order/', data={'email_login': settings.EMAIL_TO_USER, 'order_number': current_order.order_number})
+        assert response_order_delete.status_code == 200
+        assert list(Product.objects.filter(stock_number__gte=1000).values_list('amount', flat=True)) == [30, 30]
+
+    # concurrent checkouts of the same SKU never oversell
+    @pytest.mark.django_db(transaction=True)
+    def test_concurrent_checkouts(self, sample_store, sample_product_cat):
+        initial_amount, buyers = 5, 20
+        sample_product = Product.objects.create(stock_number=15, name='name', amount=initial_amount, price=100, weight_class=1, recommended_price=50, delivery_store=sample_store, product_cat=sample_product_cat)
+        customers = []
+        for i in range(buyers):
+            customer = Customer.objects.create(first_name='1', last_name='1', email_login=f'buyer{i}@none.com', user_name='1', phone_number='1', area_code=1, address='address')
+            Basket.objects.create(b_customer=customer, b_product=sample_product, b_vendor=sample_store, amount=1)
+            customers.append(customer)
+        results = []
+        barrier = threading.Barrier(buyers)
+
+        def buy(customer):
+            barrier.wait()
+            try:
+                # SQLite reports concurrent writers as 'database table is locked': retry like a client would
+                for _ in range(100):
+                    try:
+                        checkout(customer, 'False')
+                        results.append('ok')
+                        return
+                    except OperationalError:
+                        time.sleep(0.01)
+                    except CheckoutError:
+                        results.append('failed')
+                        return
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy, args=(customer,)) for customer in customers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        sample_product.refresh_from_db()
+        sold = results.count('ok')
+        assert len(results) == buyers
+        assert sold == initial_amount
+        assert sample_product.amount == initial_amount - sold
+        assert Order.objects.count() == sold
+
+
+class TestIdAllocator:
+
+    # ids are unique and a block costs one reservation
+    @pytest.mark.django_db(transaction=True)
+    def test_allocator_unique_ids(self):
+        allocator = IdAllocator('order_number')
+        first_block = [allocator.next_id()]
+        with CaptureQueriesContext(connection) as queries:
+            first_block += [allocator.next_id() for _ in range(ID_BLOCK_SIZE - 1)]
+        assert len(queries) == 0
+        with CaptureQueriesContext(connection) as queries:
+            second_block = [allocator.next_id()]
+        assert len(queries) > 0
+        with CaptureQueriesContext(connection) as queries:
+            second_block += [allocator.next_id() for _ in range(ID_BLOCK_SIZE - 1)]
+        assert len(queries) == 0
+        all_ids = first_block + second_block
+        assert len(set(all_ids)) == len(all_ids)
+        assert all(ID_OFFSET <= value < 2 ** 31 for value in all_ids)
+
+    # separate allocators (processes) never share a block
+    @pytest.mark.django_db(transaction=True)
+    def test_allocator_separate_processes(self):
+        first, second = IdAllocator('prod_cat_id'), IdAllocator('prod_cat_id')
+        ids = [first.next_id(), second.next_id(), first.next_id(), second.next_id()]
+        assert len(set(ids)) == 4
+
+    # scrambling is a bijection
+    def test_scramble_unique(self):
+        values = [scramble(value) for value in range(100000)]
+        assert len(set(values)) == len(values)
+
+    # new vendor gets an allocated seller id
+    @pytest.mark.django_db(transaction=True)
+    def test_signup_vendor_id(self, client):
+        sample_user = {'first_name': '1', 'last_name': '1', 'email_login': settings.EMAIL_TO_USER, 'password': 'valid0_password', 'user_name': '1', 'phone_number': '1', 'area_code': '1', 'registered_vendor': True, 'is_active': True}
+        with patch('backend_code.views.send_activation_email'):
+            response_signup = client.post('/api/v1/user-signup/', data=sample_user)
+        assert response_signup.status_code == 201
+        assert response_signup.json()['seller_vendor_id'] >= ID_OFFSET
+
+
+class TestBasketBatch:
+
+    # set, increment and remove in one request
+    @pytest.mark.django_db(transaction=True)
+    def test_basket_batch(self, client, login_user, sample_store, sample_product_cat):
+        products = fill_basket(login_user, sample_store, sample_product_cat, 3, amount=2)
+        Basket.objects.filter(b_product=products[2]).delete()
+        items = [{'stock_number': products[0].stock_number, 'amount': 5},
+                 {'stock_number': products[1].stock_number, 'amount': 3, 'op': 'increment'},
+                 {'stock_number': products[2].stock_number, 'amount': 1, 'op': 'increment'},
+                 {'stock_number': products[0].stock_number, 'op': 'remove'},
+                 {'stock_number': products[0].stock_number, 'amount': 4, 'op': 'increment'}]
+        response_basket_batch = client.post('/api/v1/basket/', data={'email_login': settings.EMAIL_TO_USER, 'items': items}, format='json')
+        assert response_basket_batch.status_code == 200
+        assert [item['amount'] for item in response_basket_batch.json()] == [4, 5, 1]
+        assert dict(Basket.objects.values_list('b_product', 'amount')) == {products[0].id: 4, products[1].id: 5, products[2].id: 1}
+
+    # query count does not depend on the number of operations
+    @pytest.mark.django_db(transaction=True)
+    def test_basket_batch_constant_queries(self, client, login_user, sample_store, sample_product_cat):
+        products = fill_basket(login_user, sample_store, sample_product_cat, 20)
+        Basket.objects.all().delete()
+        query_counts = []
+        for size in (2, 20):
+            items = [{'stock_number': product.stock_number, 'amount': 1, 'op': 'increment'} for product in products[:size]]
+            with CaptureQueriesContext(connection) as queries:
+                response_basket_batch = client.post('/api/v1/basket/', data={'email_login': settings.EMAIL_TO_USER, 'items': items}, format='json')
+            assert response_basket_batch.status_code == 200
+            query_counts.append(len(app_queries(queries)))
+        assert query_counts[0] == query_counts[1]
+
+    # unknown product rejects the whole batch
+    @pytest.mark.django_db(transaction=True)
+    def test_basket_batch_not_found(self, client, login_user, sample_product):
+        items = [{'stock_number': sample_product.stock_number, 'amount': 1}, {'stock_number': 500, 'amount': 1}]
+        response_basket_batch = client.post('/api/v1/basket/', data={'email_login': settings.EMAIL_TO_USER, 'items': items}, format='json')
+        assert response_basket_batch.status_code == 404
+        assert not Basket.objects.exists()
+
+    # one row per customer and product
+    @pytest.mark.django_db(transaction=True)
+    def test_basket_unique_product(self, sample_basket):
+        with pytest.raises(IntegrityError):
+            Basket.objects.create(b_customer=sample_basket.b_customer, b_product=sample_basket.b_product, b_vendor=sample_basket.b_vendor, amount=1)
+
+
+class TestBasketQuote:
+
+    # totals multiply price by amount; one aggregate query, then cached
+    @pytest.mark.django_db(transaction=True)
+    def test_basket_quote(self, login_user, sample_store, sample_product_cat):
+        cache.clear()
+        login_user.area_code = 2
+        fill_basket(login_user, sample_store, sample_product_cat, 3, amount=2)
+        with CaptureQueriesContext(connection) as queries:
+            quote = basket_quote(login_user)
+        assert len(app_queries(queries)) == 1
+        assert quote == {'lines': 3, 'item_count': 6, 'total_price': (100 + 101 + 102) * 2, 'standard_delivery_price': 2 * 50 * 3, 'express_delivery_price': 2 * 50 * 3 * 3}
+        with CaptureQueriesContext(connection) as queries:
+            assert basket_quote(login_user) == quote
+        assert len(queries) == 0
+
+    # basket mutations invalidate the cached quote
+    @pytest.mark.django_db(transaction=True)
+    def test_basket_quote_invalidation(self, client, login_user, sample_product):
+        cache.clear()
+        assert basket_quote(login_user)['lines'] == 0
+        response_basket_create = client.post('/api/v1/basket/', data={'email_login': settings.EMAIL_TO_USER, 'stock_number': sample_product.stock_number, 'amount': 2})
+        assert response_basket_create.status_code == 200
+        assert basket_quote(login_user)['total_price'] == 200
+        client.delete('/api/v1/basket/', data={'email_login': settings.EMAIL_TO_USER, 'stock_number': sample_product.stock_number})
+        assert basket_quote(login_user)['lines'] == 0
+
+    # a changed price or weight class of a product invalidates the quotes of the baskets holding it
+    @pytest.mark.django_db(transaction=True)
+    def test_basket_quote_product_update(self, client, login_user, sample_basket, sample_product):
+        cache.clear()
+        assert basket_quote(login_user)['total_price'] == 500
+        response_goods_update = client.patch(f'/api/v1/goods/{sample_product.slug}/', data={'price': 120}, format='json')
+        assert response_goods_update.status_code == 200
+        assert basket_quote(login_user)['total_price'] == 600
+        response_goods_update = client.patch(f'/api/v1/goods/{sample_product.slug}/', data={'weight_class': 2}, format='json')
+        assert response_goods_update.status_code == 200
+        assert basket_quote(login_user)['standard_delivery_price'] == delivery_price(login_user.area_code, sample_product.delivery_store.nominal_delivery_price, 2, False)
+        response_goods_delete = client.delete(f'/api/v1/goods/{sample_product.slug}/', data={'email_login': settings.EMAIL_TO_USER}, format='json')
+        assert response_goods_delete.status_code == 204
+        assert basket_quote(login_user)['lines'] == 0
+
+    # quote endpoint
+    @pytest.mark.django_db(transaction=True)
+    def test_basket_quote_view(self, client, sample_basket):
+        response_basket_quote = client.generic('GET', '/api/v1/basket-quote/', json.dumps({'email_login': settings.EMAIL_TO_USER}), content_type='application/json')
+        assert response_basket_quote.status_code == 200
+        assert response_basket_quote.json()['total_price'] == 500
+
+
+def json_get(client, url, data):
+    # the API reads credentials from the request body, also for GET requests
+    return client.generic('GET', url, json.dumps(data), content_type='application/json')
+
+
+class TestOrderHistory:
+
+    # keyset pagination and status filter
+    @pytest.mark.django_db(transaction=True)
+    def test_order_list_pages(self, client, login_user):
+        for number in range(1, 6):
+            Order.objects.create(order_number=number, order_customer=login_user, area_code=1, final_delivery_price=100, total_price=200, status='delivered' if number % 2 else 'new')
+        response_first_page = json_get(client, '/api/v1/order/?limit=2', {'email_login': settings.EMAIL_TO_USER})
+        assert response_first_page.status_code == 200
+        assert [order['order_number'] for order in response_first_page.json()['results']] == [5, 4]
+        next_cursor = response_first_page.json()['next']
+        response_last_page = json_get(client, f'/api/v1/order/?limit=2&before={next_cursor}&status=delivered', {'email_login': settings.EMAIL_TO_USER})
+        assert [order['order_number'] for order in response_last_page.json()['results']] == [3, 1]
+        assert response_last_page.json()['next'] is None
+
+    # order detail query count does not depend on the number of lines
+    @pytest.mark.django_db(transaction=True)
+    def test_order_detail_queries(self, client, login_user, sample_store, sample_product_cat):
+        products = fill_basket(login_user, sample_store, sample_product_cat, 500)
+        query_counts = []
+        for number, size in ((1, 1), (2, 500)):
+            order = Order.objects.create(order_number=number, order_customer=login_user, area_code=1, final_delivery_price=100, total_price=200, status='new')
+            OrderItems.objects.bulk_create([OrderItems(number_of_order=order, order_product=product, order_prod_vendor=str(sample_store), order_prod_amount=1) for product in products[:size]])
+            with CaptureQueriesContext(connection) as queries:
+                response_order_detail = json_get(client, f'/api/v1/order-detail/{number}/', {'email_login': settings.EMAIL_TO_USER})
+            assert response_order_detail.status_code == 200
+            assert len(response_order_detail.json()['order_items_number']) == size
+            query_counts.append(len(app_queries(queries)))
+        assert query_counts[0] == query_counts[1] <= 4
+
+
+class TestDeliveryQuotes:
+
+    # batch quotes match the checkout formula, tariff overrides are applied
+    @pytest.mark.django_db(transaction=True)
+    def test_quote_baskets(self, login_user, sample_store, sample_product_cat):
+        login_user.area_code = 2
+        login_user.address = 'address'
+        login_user.save()
+        fill_basket(login_user, sample_store, sample_product_cat, 3)
+        quotes = list(quote_baskets())
+        assert [(quote['b_customer'], quote['delivery_price']) for quote in quotes] == [(login_user.id, 2 * 50 * 3)]
+        quotes = list(quote_baskets(nominal_prices={sample_store.id: 70}, express_delivery=True))
+        assert quotes[0]['delivery_price'] == 2 * 70 * 3 * 3
+        current_order, _ = checkout(login_user, 'True')
+        order_quote = list(quote_orders(order_ids=[current_order.id]))[0]
+        assert order_quote['delivery_price'] == order_quote['final_delivery_price'] == current_order.final_delivery_price
+
+    # staff only
+    @pytest.mark.parametrize('is_staff', [False, True])
+    @pytest.mark.django_db(transaction=True)
+    def test_quote_view(self, client, sample_basket, is_staff):
+        Customer.objects.filter(id=sample_basket.b_customer_id).update(is_staff=is_staff)
+        response_quotes = client.post('/api/v1/delivery-quotes/', data={'email_login': settings.EMAIL_TO_USER, 'target': 'baskets', 'nominal_prices': {sample_basket.b_vendor_id: 10}}, format='json')
+        assert response_quotes.status_code == (200 if is_staff else 403)
+        if is_staff:
+            assert float(response_quotes.json()['results'][0]['delivery_price']) == 10
+
+
+class TestOrderStatus:
+
+    # allowed transitions in one request, per-order failures, one notification task
+    @pytest.mark.django_db(transaction=True)
+    def test_order_status_batch(self, client, login_user, sample_store, sample_product):
+        for number, status in ((1, 'new'), (2, 'new'), (3, 'delivered')):
+            order = Order.objects.create(order_number=number, order_customer=login_user, area_code=1, final_delivery_price=100, total_price=200, status=status)
+            OrderItems.objects.create(number_of_order=order, order_product=sample_product, order_prod_vendor=str(sample_store), order_vendor=sample_store, order_prod_amount=2)
+        response_order_status = client.post('/api/v1/order-status/', data={'email_login': settings.EMAIL_TO_USER, 'order_numbers': [1, 2, 3, 4], 'status': 'canceled'}, format='json')
+        assert response_order_status.status_code == 200
+        assert response_order_status.json()['Updated'] == [1, 2]
+        assert set(response_order_status.json()['Failed']) == {'3', '4'}
+        assert list(OutboxMessage.objects.values_list('task', flat=True)) == ['backend_code.tasks.order_status_emails_async']
+        assert dict(Order.objects.values_list('order_number', 'status')) == {1: 'canceled', 2: 'canceled', 3: 'delivered'}
+        sample_product.refresh_from_db()
+        assert sample_product.amount == 5 + 2 * 2
+
+    # a store cannot change the status of an order with items of another store
+    @pytest.mark.django_db(transaction=True)
+    def test_order_status_shared_order(self, client, login_user, sample_store, sample_product):
+        other_vendor = Customer.objects.create(email_login='other@mail.ru', password='-', area_code=1, registered_vendor=True)
+        other_store = Store.objects.create(vendor_id=other_vendor, name='other', address='address', nominal_delivery_price=50, status=True)
+        other_product = Product.objects.create(stock_number=16, slug='16', name='other', amount=5, price=100, weight_class=1, recommended_price=50, delivery_store=other_store, product_cat=sample_product.product_cat)
+        order = Order.objects.create(order_number=1, order_customer=login_user, area_code=1, final_delivery_price=100, total_price=400, status='new')
+        OrderItems.objects.create(number_of_order=order, order_product=sample_product, order_prod_vendor=str(sample_store), order_vendor=sample_store, order_prod_amount=2)
+        OrderItems.objects.create(number_of_order=order, order_product=other_product, order_prod_vendor=str(other_store), order_vendor=other_store, order_prod_amount=2)
+        response_order_status = client.post('/api/v1/order-status/', data={'email_login': settings.EMAIL_TO_USER, 'order_numbers': [1], 'status': 'canceled'}, format='json')
+        assert response_order_status.status_code == 200
+        assert response_order_status.json()['Updated'] == []
+        assert response_order_status.json()['Failed'] == {'1': 'Order has items of other stores'}
+        assert Order.objects.get(id=order.id).status == 'new'
+        assert list(Product.objects.order_by('stock_number').values_list('amount', flat=True)) == [5, 5]
+
+    # batched notification emails
+    @pytest.mark.django_db(transaction=True)
+    @override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+    def test_order_status_emails(self, sample_order):
+        assert order_status_emails_async(order_ids=[sample_order.id]) == 'Mail sent - 1'
+        assert len(mail.outbox) == 1
+
+
+class TestVendorFeed:
+
+    # checkout fills the vendor relation and the feed positions, the feed pages forward by position
+    @pytest.mark.django_db(transaction=True)
+    def test_vendor_feed_pages(self, client, login_user, sample_store, sample_product_cat):
+        login_user.address = 'address'
+        login_user.save()
+        fill_basket(login_user, sample_store, sample_product_cat, 3)
+        checkout(login_user, 'False')
+        assert OrderItems.objects.filter(order_vendor=sample_store).count() == 3
+        response_feed = json_get(client, '/api/v1/vendor-orders/', {'email_login': settings.EMAIL_TO_USER, 'limit': 2})
+        assert response_feed.status_code == 200
+        item_ids = list(OrderItems.objects.order_by('feed_position').values_list('id', flat=True))
+        assert [item['id'] for item in response_feed.json()['results']] == item_ids[:2]
+        assert response_feed.json()['next'] == response_feed.json()['results'][-1]['feed_position']
+        response_feed = json_get(client, '/api/v1/vendor-orders/', {'email_login': settings.EMAIL_TO_USER, 'after': response_feed.json()['next']})
+        assert [item['id'] for item in response_feed.json()['results']] == item_ids[2:]
+        response_feed = json_get(client, '/api/v1/vendor-orders/', {'email_login': settings.EMAIL_TO_USER, 'after': response_feed.json()['next']})
+        assert response_feed.json()['results'] == []
+
+    # a waiting request wakes up when an order commits, not at the timeout
+    @pytest.mark.django_db(transaction=True)
+    def test_vendor_feed_long_poll(self, login_user, sample_store, sample_product_cat):
+        login_user.address = 'address'
+        login_user.save()
+        fill_basket(login_user, sample_store, sample_product_cat, 2)
+
+        def place_order():
+            time.sleep(0.3)
+            checkout(login_user, 'False')
+            connection.close()
+
+        worker = threading.Thread(target=place_order)
+        started = time.monotonic()
+        worker.start()
+        items, cursor = wait_for_items(sample_store, 0, None, 10)
+        worker.join()
+        assert len(items) == 2
+        assert cursor == items[-1].feed_position
+        assert time.monotonic() - started < 5
+
+    # a line committed after a line with a greater id is not skipped: the cursor follows the commit order
+    @pytest.mark.django_db(transaction=True)
+    def test_vendor_feed_commit_order(self, login_user, sample_store, sample_product):
+        if connection.vendor == 'sqlite':
+            pytest.skip('SQLite runs one write transaction at a time')
+        orders = [Order.objects.create(order_number=number, order_customer=login_user, area_code=1, final_delivery_price=0, total_price=0, status='new') for number in (1, 2)]
+        inserted, released = threading.Event(), threading.Event()
+
+        def place_order(order):
+            OrderItems.objects.create(number_of_order=order, order_product=sample_product, order_prod_vendor=str(sample_store), order_vendor=sample_store, order_prod_amount=1)
+            assign_feed_positions(OrderItems.objects.filter(number_of_order=order))
+
+        def slow_order():
+            try:
+                with transaction.atomic():
+                    OrderItems.objects.create(number_of_order=orders[0], order_product=sample_product, order_prod_vendor=str(sample_store), order_vendor=sample_store,
+                                              order_prod_amount=1)
+                    inserted.set()
+                    released.wait(5)
+                    assign_feed_positions(OrderItems.objects.filter(number_of_order=orders[0]))
+            finally:
+                connection.close()
+
+        worker = threading.Thread(target=slow_order)
+        worker.start()
+        assert inserted.wait(5)
+        with transaction.atomic():
+            place_order(orders[1])
+        items, cursor = vendor_feed(sample_store)
+        assert [item.number_of_order_id for item in items] == [orders[1].id]
+        released.set()
+        worker.join()
+        items, cursor = vendor_feed(sample_store, cursor)
+        assert [item.number_of_order_id for item in items] == [orders[0].id]
+        assert items[0].id < OrderItems.objects.get(number_of_order=orders[1]).id
+
+    # without the ASGI router a request waits at most VENDOR_FEED_SYNC_MAX_WAIT seconds
+    @pytest.mark.django_db(transaction=True)
+    @override_settings(VENDOR_FEED_SYNC_MAX_WAIT=0.3)
+    def test_vendor_feed_sync_wait(self, client, login_user, sample_store):
+        started = time.monotonic()
+        response_feed = json_get(client, '/api/v1/vendor-orders/', {'email_login': settings.EMAIL_TO_USER, 'wait': 10})
+        assert response_feed.status_code == 200
+        assert response_feed.json()['results'] == []
+        assert time.monotonic() - started < 2
+
+    # event stream sends committed order lines and resumes from Last-Event-ID
+    @pytest.mark.django_db(transaction=True)
+    @override_settings(VENDOR_FEED_STREAM_SECONDS=0.2, VENDOR_FEED_KEEPALIVE_SECONDS=0.1)
+    def test_vendor_feed_stream(self, client, login_user, sample_store, sample_product_cat):
+        login_user.address = 'address'
+        login_user.save()
+        fill_basket(login_user, sample_store, sample_product_cat, 2)
+        checkout(login_user, 'False')
+        positions = list(OrderItems.objects.order_by('feed_position').values_list('feed_position', flat=True))
+        response_feed = client.generic('GET', '/api/v1/vendor-orders/?stream=True', json.dumps({'email_login': settings.EMAIL_TO_USER}),
+                                       content_type='application/json', HTTP_LAST_EVENT_ID=str(positions[0]))
+        assert response_feed['Content-Type'] == 'text/event-stream'
+        events = b''.join(response_feed.streaming_content).decode()
+        assert events.count('event: order_item') == 1
+        assert f'id: {positions[1]}' in events
+        assert ': keep-alive' in events
+
+    # migration fills the vendor of existing order lines from their products
+    @pytest.mark.django_db(transaction=True)
+    def test_vendor_backfill(self, sample_order, sample_product, sample_store):
+        from django.apps import apps
+        OrderItems.objects.create(number_of_order=sample_order, order_product=sample_product, order_prod_vendor=str(sample_store), order_prod_amount=1)
+        importlib.import_module('backend_code.migrations.0005_order_items_vendor').backfill_order_vendor(apps, None)
+        assert OrderItems.objects.get().order_vendor == sample_store
+
+    # migration numbers existing order lines by id, new positions follow them
+    @pytest.mark.django_db(transaction=True)
+    def test_feed_position_backfill(self, sample_order, sample_product, sample_store):
+        from django.apps import apps
+        item = OrderItems.objects.create(number_of_order=sample_order, order_product=sample_product, order_prod_vendor=str(sample_store), order_vendor=sample_store, order_prod_amount=1)
+        importlib.import_module('backend_code.migrations.0012_order_items_feed_position').backfill_feed_position(apps, None)
+        assert OrderItems.objects.get().feed_position == item.id
+        assert IdSequence.objects.get(name='vendor_feed').last_block == item.id
+
+    # deleting a store clears the vendor of its remaining order lines with one UPDATE
+    @pytest.mark.django_db(transaction=True)
+    def test_vendor_store_deleted(self, sample_order, sample_product):
+        other_vendor = Customer.objects.create(email_login='other@mail.ru', password='-', area_code=1, registered_vendor=True)
+        other_store = Store.objects.create(vendor_id=other_vendor, name='other', address='address', nominal_delivery_price=50, status=True)
+        OrderItems.objects.bulk_create([OrderItems(number_of_order=sample_order, order_product=sample_product, order_prod_vendor=str(other_store), order_vendor=other_store,
+                                                   order_prod_amount=1) for _ in range(150)])
+        with CaptureQueriesContext(connection) as queries:
+            other_store.delete()
+        assert len([query for query in queries.captured_queries if 'backend_code_orderitems' in query['sql']]) == 1
+        assert OrderItems.objects.filter(order_vendor__isnull=True).count() == 150
+
+
+class TestOrderArchive:
+
+    @staticmethod
+    def create_orders(customer, product, statuses, age_days):
+        for number, status in statuses:
+            order = Order.objects.create(order_number=number, order_customer=customer, area_code=1, final_delivery_price=100, total_price=200, status=status,
+                                         status_changed=timezone.now() - timedelta(days=age_days))
+            OrderItems.objects.create(number_of_order=order, order_product=product, order_prod_vendor=str(product.delivery_store), order_vendor=product.delivery_store, order_prod_amount=1)
+
+    # only old terminal orders move, in batches, together with their lines
+    @pytest.mark.django_db(transaction=True)
+    def test_archive_orders(self, login_user, sample_product):
+        cache.clear()
+        self.create_orders(login_user, sample_product, ((1, 'delivered'), (2, 'canceled'), (3, 'delivered'), (4, 'new')), 365)
+        self.create_orders(login_user, sample_product, ((5, 'delivered'),), 1)
+        item_ids = set(OrderItems.objects.filter(number_of_order__order_number__lte=3).values_list('id', flat=True))
+        assert archive_orders(age_days=180, batch_size=2) == 3
+        assert set(Order.objects.values_list('order_number', flat=True)) == {4, 5}
+        assert set(ArchivedOrder.objects.values_list('order_number', flat=True)) == {1, 2, 3}
+        assert set(ArchivedOrderItems.objects.values_list('id', flat=True)) == item_ids
+        assert archive_watermark() == ArchivedOrder.objects.get(order_number=3).id
+        assert archive_orders(age_days=180) == 0
+
+    # deleting a store clears the vendor of its archived order lines with one UPDATE
+    @pytest.mark.django_db(transaction=True)
+    def test_archived_vendor_store_deleted(self, login_user, sample_product):
+        self.create_orders(login_user, sample_product, ((1, 'delivered'), (2, 'canceled')), 365)
+        archive_orders(age_days=180)
+        other_vendor = Customer.objects.create(email_login='other@mail.ru', password='-', area_code=1, registered_vendor=True)
+        other_store = Store.objects.create(vendor_id=other_vendor, name='other', address='address', nominal_delivery_price=50, status=True)
+        ArchivedOrderItems.objects.update(order_vendor=other_store)
+        with CaptureQueriesContext(connection) as queries:
+            other_store.delete()
+        assert len([query for query in queries.captured_queries if 'backend_code_archivedorderitems' in query['sql']]) == 1
+        assert ArchivedOrderItems.objects.filter(order_vendor__isnull=True).count() == 2
+
+    # recent pages read only the hot table, older pages continue in the archive
+    @pytest.mark.django_db(transaction=True)
+    def test_order_history_union(self, client, login_user, sample_product):
+        cache.clear()
+        self.create_orders(login_user, sample_product, ((1, 'delivered'), (2, 'canceled'), (3, 'delivered')), 365)
+        self.create_orders(login_user, sample_product, ((4, 'new'), (5, 'confirmed'), (6, 'delivered')), 1)
+        archive_orders(age_days=180)
+        with CaptureQueriesContext(connection) as queries:
+            response_order_list = json_get(client, '/api/v1/order/?limit=2', {'email_login': settings.EMAIL_TO_USER})
+        assert [order['order_number'] for order in response_order_list.json()['results']] == [6, 5]
+        assert not any('archivedorder' in query['sql'] for query in app_queries(queries))
+        pages = []
+        while response_order_list.json()['next']:
+            response_order_list = json_get(client, f'/api/v1/order/?limit=2&before={response_order_list.json()["next"]}', {'email_login': settings.EMAIL_TO_USER})
+            pages.append([order['order_number'] for order in response_order_list.json()['results']])
+        assert pages == [[4, 3], [2, 1]]
+        response_order_list = json_get(client, '/api/v1/order/?status=delivered', {'email_login': settings.EMAIL_TO_USER})
+        assert [order['order_number'] for order in response_order_list.json()['results']] == [6, 3, 1]
+
+    # archived orders keep their detail page
+    @pytest.mark.django_db(transaction=True)
+    def test_archived_order_detail(self, client, login_user, sample_product):
+        self.create_orders(login_user, sample_product, ((1, 'delivered'),), 365)
+        archive_orders(age_days=180)
+        response_order_detail = json_get(client, '/api/v1/order-detail/1/', {'email_login': settings.EMAIL_TO_USER})
+        assert response_order_detail.status_code == 200
+        assert response_order_detail.json()['status'] == 'delivered'
+        assert len(response_order_detail.json()['order_items_number']) == 1
+
+
+@pytest.fixture
+def smtp_server():
+    controller_module = pytest.importorskip('aiosmtpd.controller')
+
+    class Handler:
+        def __init__(self):
+            self.messages = []
+            self.sessions = 0
+
+        async def handle_EHLO(self, server, session, envelope, hostname, responses):
+            self.sessions += 1
+            session.host_name = hostname
+            return responses
+
+        async def handle_DATA(self, server, session, envelope):
+            self.messages.append(envelope)
+            return '250 OK'
+
+    handler = Handler()
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    controller = controller_module.Controller(handler, hostname='127.0.0.1', port=port)
+    controller.start()
+    with override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend', EMAIL_HOST='127.0.0.1', EMAIL_PORT=port,
+                           EMAIL_USE_TLS=False, EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD=''):
+        yield handler
+    controller.stop()
+
+
+class TestMailQueue:
+
+    # queued mail goes out in batches over one SMTP session and leaves the queue
+    @pytest.mark.django_db(transaction=True)
+    def test_deliver_mail_smtp(self, smtp_server):
+        for i in range(25):
+            queue_mail(f'subject {i}', 'body', settings.EMAIL_FROM_USER, [settings.EMAIL_TO_USER])
+        assert deliver_mail(batch_size=10) == 25
+        assert len(smtp_server.messages) == 25
+        assert smtp_server.sessions == 1
+        assert not QueuedEmail.objects.exists()
+
+    # a failed message is retried later with backoff, the rest of the batch is sent
+    @pytest.mark.django_db(transaction=True)
+    @override_settings(MAIL_MAX_ATTEMPTS=2)
+    def test_deliver_mail_retry(self):
+        first = queue_mail('first', 'body', settings.EMAIL_FROM_USER, [settings.EMAIL_TO_USER])
+        queue_mail('second', 'body', settings.EMAIL_FROM_USER, [settings.EMAIL_TO_USER])
+        connection = MagicMock()
+        connection.send_messages.side_effect = [smtplib.SMTPServerDisconnected('gone'), 1]
+        with patch('backend_code.mail.get_connection', return_value=connection):
+            started = time.monotonic()
+            assert deliver_mail() == 1
+            assert time.monotonic() - started < 1
+            first.refresh_from_db()
+            assert (first.status, first.attempts) == ('queued', 1)
+            assert first.next_attempt > timezone.now()
+            # not due yet: nothing is claimed
+            assert deliver_mail() == 0
+            QueuedEmail.objects.update(next_attempt=timezone.now())
+            connection.send_messages.side_effect = smtplib.SMTPServerDisconnected('gone')
+            assert deliver_mail() == 0
+        first.refresh_from_db()
+        assert (first.status, first.attempts) == ('failed', 2)
+        assert connection.close.called
+
+    # a task interrupted mid-batch does not send the delivered messages again, one run sends at most MAIL_BATCHES_PER_RUN batches
+    @pytest.mark.django_db(transaction=True)
+    @override_settings(MAIL_BATCHES_PER_RUN=2)
+    def test_deliver_mail_interrupted(self):
+        for i in range(5):
+            queue_mail(f'subject {i}', 'body', settings.EMAIL_FROM_USER, [settings.EMAIL_TO_USER])
+        connection = MagicMock()
+        connection.send_messages.side_effect = [1, 1, SoftTimeLimitExceeded()]
+        with patch('backend_code.mail.get_connection', return_value=connection):
+            with pytest.raises(SoftTimeLimitExceeded):
+                deliver_mail()
+            assert list(QueuedEmail.objects.values_list('subject', flat=True)) == ['subject 2', 'subject 3', 'subject 4']
+            QueuedEmail.objects.update(next_attempt=timezone.now())
+            connection.send_messages.side_effect = None
+            connection.send_messages.return_value = 1
+            assert deliver_mail(batch_size=1) == 2
+        assert QueuedEmail.objects.count() == 1
+
+
+class TestNotifications:
+
+    # the order email renders from one query, whatever the number of lines
+    @pytest.mark.django_db(transaction=True)
+    def test_order_mail_single_query(self, login_user, sample_store, sample_product_cat):
+        login_user.address = 'address'
+        login_user.save()
+        fill_basket(login_user, sample_store, sample_product_cat, 5)
+        current_order, _ = checkout(login_user, 'False')
+        with CaptureQueriesContext(connection) as queries:
+            subject, body, _, to = order_mail('order_confirmation', current_order.id)
+        assert len(app_queries(queries)) == 1
+        assert subject == 'Order confirmed'
+        assert to == [settings.EMAIL_TO_USER]
+        assert all(f'name {i} x 1' in body for i in range(5))
+
+    # the web request only hands ids to the worker
+    @pytest.mark.django_db(transaction=True)
+    def test_order_create_sends_ids(self, client, login_user, sample_basket):
+        login_user.address = 'address'
+        login_user.save()
+        response_order_create = client.post('/api/v1/order/', data={'email_login': settings.EMAIL_TO_USER, 'express_delivery': 'False'})
+        assert response_order_create.status_code == 201
+        message = OutboxMessage.objects.get()
+        assert message.task == 'backend_code.tasks.order_email_async'
+        assert json.loads(message.args) == ['order_confirmation', response_order_create.json()['id']]
+
+    # the worker renders the activation link; templates are compiled once
+    @pytest.mark.django_db(transaction=True)
+    @override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+    def test_activation_email_async(self, login_user):
+        assert activation_email_async(login_user.id, 'testserver') == 'Mail sent - 1'
+        assert 'http://testserver/api/v1/email-activation/' in mail.outbox[0].body
+        assert _template('authentication/activate.html') is _template('authentication/activate.html')
+
+
+class TestCeleryQueues:
+
+    # mail never shares a queue with imports and exports; limits follow the queue profile
+    @pytest.mark.parametrize('task, queue', [
+        (send_mail_async, 'mail'),
+        (activation_email_async, 'mail'),
+        (order_status_emails_async, 'mail'),
+        (import_product_list_async, 'import'),
+        (export_product_list_async, 'export'),
+        (archive_orders_async, 'maintenance'),
+    ])
+    def test_task_routes(self, task, queue):
+        assert celery_app.amqp.router.route({}, task.name)['queue'].name == queue
+        assert task.acks_late == QUEUE_PROFILES[queue]['acks_late']
+        assert task.time_limit == QUEUE_PROFILES[queue]['time_limit']
+
+
+class TestVendorJobs:
+
+    # repeated requests attach to the queued job, a finished job frees the vendor
+    @pytest.mark.django_db(transaction=True)
+    def test_export_single_flight(self, client, login_user):
+        cache.clear()
+        with patch('backend_code.views.export_product_list_async.delay') as enqueue:
+            responses = [json_get(client, '/api/v1/product-export/', {'email_login': settings.EMAIL_TO_USER}).json() for _ in range(3)]
+            assert enqueue.call_count == 1
+            assert len({response['Job'] for response in responses}) == 1
+            assert [response['Attached'] for response in responses] == [False, True, True]
+            domain, data, job = enqueue.call_args[0]
+            with vendor_job_lease('export', settings.EMAIL_TO_USER, job) as owned:
+                assert owned
+            json_get(client, '/api/v1/product-export/', {'email_login': settings.EMAIL_TO_USER})
+            assert enqueue.call_count == 2
+            assert enqueue.call_args[0][2] != job
+
+    # an expired lease lets a new job start; the stale job then does not run
+    @override_settings(VENDOR_JOB_QUEUED_LEASE=1)
+    def test_job_lease_expiry(self):
+        cache.clear()
+        stale_job, _ = start_vendor_job('import', 'vendor', lambda job: None)
+        time.sleep(1.1)
+        new_job, attached = start_vendor_job('import', 'vendor', lambda job: None)
+        assert not attached and new_job != stale_job
+        with vendor_job_lease('import', 'vendor', stale_job) as owned:
+            assert not owned
+        with vendor_job_lease('import', 'vendor', new_job) as owned:
+            assert owned
+
+    # a failed enqueue does not leave the vendor locked
+    def test_job_enqueue_failure(self):
+        cache.clear()
+        with pytest.raises(RuntimeError):
+            start_vendor_job('import', 'vendor', MagicMock(side_effect=RuntimeError))
+        assert not start_vendor_job('import', 'vendor', lambda job: None)[1]
+
+
+class TestExportArtifacts:
+
+    def export(self, data):
+        with patch('backend_code.tasks.send_mail_async.delay') as send:
+            result = export_product_list('testserver', data, 'job')
+        return result, re.search(r'http://testserver(\S+)', send.call_args[0][1]).group(1)
+
+    # an unchanged catalog reuses the compressed file, a changed one is exported again
+    @pytest.mark.django_db(transaction=True)
+    def test_export_cached(self, tmp_path, sample_product):
+        with override_settings(EXPORT_ROOT=str(tmp_path)):
+            data = {'email_login': settings.EMAIL_TO_USER}
+            assert self.export(data)[0] == 'Product list has been exported'
+            assert self.export(data)[0] == 'Product list has been exported (cached)'
+            bump_catalog_version([sample_product.delivery_store_id])
+            assert self.export(data)[0] == 'Product list has been exported'
+            assert sorted(os.listdir(tmp_path)) == [f'{sample_product.delivery_store_id}-0.yaml.gz', f'{sample_product.delivery_store_id}-1.yaml.gz']
+
+    # the signed link streams the file; changed or expired links are refused
+    @pytest.mark.django_db(transaction=True)
+    def test_export_download(self, client, tmp_path, sample_product):
+        with override_settings(EXPORT_ROOT=str(tmp_path)):
+            _, url = self.export({'email_login': settings.EMAIL_TO_USER})
+            response_download = client.get(url)
+            assert response_download.status_code == 200
+            assert sample_product.name in gzip.decompress(b''.join(response_download.streaming_content)).decode()
+            assert client.get(url.replace('/download/', '/download/x')).status_code == 403
+            with override_settings(EXPORT_LINK_MAX_AGE=-1):
+                assert client.get(url).status_code == 410
+
+    # least recently used files go first, the newest artifact is kept
+    def test_evict_artifacts(self, tmp_path):
+        for number in range(4):
+            path = tmp_path / f'1-{number}.yaml.gz'
+            path.write_bytes(b'x' * 100)
+            os.utime(path, (1000 + number, 1000))
+        with override_settings(EXPORT_ROOT=str(tmp_path), EXPORT_MAX_BYTES=250):
+            evict_artifacts(keep=str(tmp_path / '1-0.yaml.gz'))
+        assert sorted(os.listdir(tmp_path)) == ['1-0.yaml.gz', '1-3.yaml.gz']
+
+
+class TestMetrics:
+
+    # request latency by route template, in Prometheus text format
+    @pytest.mark.django_db(transaction=True)
+    def test_request_metrics(self, client, login_user):
+        cache.clear()
+        json_get(client, '/api/v1/order/', {'email_login': settings.EMAIL_TO_USER})
+        response_metrics = client.get('/metrics')
+        assert response_metrics.status_code == 200
+        assert response_metrics['Content-Type'].startswith('text/plain; version=0.0.4')
+        text = response_metrics.content.decode()
+        assert '# TYPE http_request_duration_seconds histogram' in text
+        assert 'http_request_duration_seconds_count{method="GET",route="api/v1/order/",status="404"}' in text
+        assert 'le="+Inf"' in text
+
+    # queue wait, run time, rows and memory of a task run
+    def test_task_metrics(self):
+        cache.clear()
+        task = MagicMock()
+        task.name = 'backend_code.tasks.sample'
+        headers = {}
+        metrics._task_published(headers=headers)
+        task.request.published_at = headers['published_at'] - 2
+        metrics._task_started(task=task)
+        assert metrics.record_rows(7) == 7
+        metrics._task_finished(task=task, state='SUCCESS')
+        totals = metrics.collect()
+        labels = (('task', 'backend_code.tasks.sample'),)
+        assert totals[('celery_task_rows_processed_total', labels)] == [7]
+        assert totals[('celery_task_queue_wait_seconds', labels)][-1] == 1
+        assert totals[('celery_task_queue_wait_seconds', labels)][-2] >= 2
+        assert totals[('celery_task_runtime_seconds', (('state', 'SUCCESS'),) + labels)][-1] == 1
+        assert totals[('celery_task_peak_memory_bytes', labels)][-2] > 0
+
+    # values of all worker processes are summed, stale processes are dropped
+    def test_metrics_aggregation(self):
+        cache.clear()
+        metrics.increment('celery_task_retries_total', task='sample')
+        worker_key = 'metrics:process:worker:1'
+        cache.set(worker_key, {('celery_task_retries_total', (('task', 'sample'),)): [2]})
+        cache.set(metrics.METRICS_PROCESSES_KEY, [worker_key, 'metrics:process:gone:2'])
+        assert 'celery_task_retries_total{task="sample"} 3' in metrics.render(metrics.collect())
+        assert 'metrics:process:gone:2' not in cache.get(metrics.METRICS_PROCESSES_KEY)
+
+
+class TestOutbox:
+
+    # the activation email is written in the sign up transaction, the broker is not called
+    @pytest.mark.django_db(transaction=True)
+    def test_signup_writes_outbox(self, client):
+        sample_user = {'first_name': '1', 'last_name': '1', 'email_login': settings.EMAIL_TO_USER, 'password': 'valid0_password', 'user_name': '1', 'phone_number': '1', 'area_code': '1', 'registered_vendor': False, 'is_active': True}
+        with patch.object(celery_app, 'send_task') as send_task:
+            response_signup = client.post('/api/v1/user-signup/', data=sample_user)
+        assert response_signup.status_code == 201
+        send_task.assert_not_called()
+        message = OutboxMessage.objects.get()
+        assert message.task == 'backend_code.tasks.activation_email_async'
+        assert json.loads(message.args)[0] == response_signup.json()['id']
+
+    # a rolled back business change leaves no task; a duplicate dedupe key is ignored
+    @pytest.mark.django_db(transaction=True)
+    def test_enqueue_transaction_and_dedupe(self):
+        with pytest.raises(IntegrityError):
+            with transaction.atomic():
+                enqueue(order_status_emails_async, [1])
+                raise IntegrityError
+        assert not OutboxMessage.objects.exists()
+        with transaction.atomic():
+            enqueue(order_status_emails_async, [1], dedupe_key='order-status:1')
+            enqueue(order_status_emails_async, [1], dedupe_key='order-status:1')
+        assert OutboxMessage.objects.count() == 1
+
+    # published tasks are deleted, a broker error keeps the rest for a later attempt
+    @pytest.mark.django_db(transaction=True)
+    def test_relay(self):
+        for order_id in range(5):
+            enqueue(order_status_emails_async, [order_id], dedupe_key=f'order-status:{order_id}' if order_id == 0 else None)
+        published = []
+
+        def send_task(name, args, kwargs, task_id, producer):
+            if len(published) == 3:
+                raise OSError('broker down')
+            published.append((name, args, task_id))
+
+        with patch.object(celery_app, 'producer_or_acquire'), patch.object(celery_app, 'send_task', side_effect=send_task):
+            assert relay_outbox(batch_size=2) == 3
+        assert [args for _, args, _ in published] == [[[0]], [[1]], [[2]]]
+        assert published[0][2] == 'outbox:order-status:0'
+        remaining = list(OutboxMessage.objects.order_by('id'))
+        assert [json.loads(message.args) for message in remaining] == [[[3]], [[4]]]
+        assert remaining[0].attempts == 1 and remaining[0].next_attempt > timezone.now()
+        # the failed task waits for its backoff, later tasks are not held back
+        with patch.object(celery_app, 'producer_or_acquire'), patch.object(celery_app, 'send_task') as retry:
+            assert relay_outbox() == 1
+        assert retry.call_args.kwargs['args'] == [[4]]
+
+    # a task published twice by the relay runs once
+    def test_deliver_once(self):
+        cache.clear()
+        calls = []
+        task = deliver_once(lambda: calls.append(1) or 'done')
+        with patch('backend_code.outbox.current_task') as current:
+            current.request.id = 'outbox:order-confirmation:1'
+            assert task() == 'done'
+            assert task() == 'Duplicate delivery skipped'
+            current.request.id = 'plain-task-id'
+            task()
+            task()
+        assert len(calls) == 3
+
+
+class TestProfiling:
+
+    # only requests carrying the token are profiled while the sample rate is 0
+    @pytest.mark.django_db(transaction=True)
+    @override_settings(PROFILING_SAMPLE_RATE=0, PROFILING_TOKEN='secret')
+    def test_profile_on_demand(self, client, sample_product):
+        cache.clear()
+        client.get(f'/api/v1/goods/{sample_product.slug}/')
+        client.get(f'/api/v1/goods/{sample_product.slug}/', HTTP_X_PROFILE='wrong')
+        assert profiling.stored_profiles() == []
+        response_product = client.get(f'/api/v1/goods/{sample_product.slug}/', HTTP_X_PROFILE='secret')
+        assert response_product.status_code == 200
+        assert client.get('/profiling/').status_code == 403
+        profiles = client.get('/profiling/', HTTP_X_PROFILE='secret').json()
+        assert [(profile['route'], profile['reason'], profile['status']) for profile in profiles] == [('api/v1/goods/(?P<slug>[^/.]+)/$', 'header', 200)]
+        response_stacks = client.get(f'/profiling/{profiles[0]["id"]}/stacks', HTTP_X_PROFILE='secret')
+        assert response_stacks.status_code == 200
+        assert all(re.fullmatch(r'\S+ \d+', line) for line in response_stacks.content.decode().splitlines())
+
+    # stacks of the profiled thread, in collapsed format
+    @override_settings(PROFILING_INTERVAL=0.001)
+    def test_sampler(self):
+        def busy_request():
+            started = time.perf_counter()
+            while time.perf_counter() - started < 0.1:
+                pass
+
+        profiling.sampler.start()
+        busy_request()
+        stacks = profiling.sampler.stop()
+        assert sum(stacks.values()) > 10
+        assert any(stack.endswith('test_sampler;tests.backend_code.tests.busy_request') for stack in stacks)
+
+    # the ring buffer keeps the newest PROFILING_BUFFER_SIZE profiles
+    @override_settings(PROFILING_BUFFER_SIZE=3)
+    def test_ring_buffer(self):
+        cache.clear()
+        for number in range(5):
+            profiling.store_profile({'path': str(number), 'stacks': {}})
+        assert [profile['path'] for profile in profiling.stored_profiles()] == ['4', '3', '2']
+
+
+class TestSqlStats:
+
+    # statements differing only in values share a fingerprint
+    def test_fingerprint(self):
+        first = sql_stats.fingerprint("SELECT \"id\" FROM \"product\" WHERE (\"price\" = 10.5 AND \"name\" = 'it''s' AND \"id\" IN (%s, %s, %s))")
+        second = sql_stats.fingerprint('SELECT "id"  FROM "product" WHERE ("price" = 7 AND "name" = \'x\' AND "id" IN (%s))')
+        assert first == second == 'SELECT "id" FROM "product" WHERE ("price" = ? AND "name" = ? AND "id" IN (...))'
+        # bulk statements do not grow with the number of rows
+        for rows in (2, 50):
+            assert sql_stats.fingerprint('UPDATE "product" SET "amount" = ("amount" - CASE ' + ' '.join(['WHEN ("id" = %s) THEN %s'] * rows) + ' ELSE 0 END)') == \
+                'UPDATE "product" SET "amount" = ("amount" - CASE WHEN ("id" = ?) THEN ? ... ELSE ? END)'
+            assert sql_stats.fingerprint('INSERT INTO "item" ("a", "b") SELECT ' + ' UNION ALL SELECT '.join(['%s, %s'] * rows)) == 'INSERT INTO "item" ("a", "b") SELECT ?, ? UNION ALL ...'
+            assert sql_stats.fingerprint('INSERT INTO "item" ("a", "b") SELECT ' + ' UNION ALL SELECT '.join(['%s, NULL'] * rows)) == 'INSERT INTO "item" ("a", "b") SELECT ?, NULL UNION ALL ...'
+            assert sql_stats.fingerprint('INSERT INTO "item" ("a", "b") VALUES ' + ', '.join(['(%s, NULL)'] * rows)) == 'INSERT INTO "item" ("a", "b") VALUES (?, NULL)'
+
+    # a query per row is reported as N+1, a single query is not
+    @pytest.mark.django_db(transaction=True)
+    def test_n_plus_one(self, sample_store, sample_product_cat):
+        products = fill_basket(sample_store.vendor_id, sample_store, sample_product_cat, 6)
+        queries = sql_stats.RequestQueries()
+        with connection.execute_wrapper(queries):
+            list(Product.objects.filter(id__in=[product.id for product in products]))
+            for product in products:
+                Product.objects.get(id=product.id)
+        assert queries.count == 7
+        assert list(queries.n_plus_one().values()) == [6]
+
+    # per-route report, slow queries are logged with their plan
+    @pytest.mark.django_db(transaction=True)
+    @override_settings(SQL_SLOW_QUERY_SECONDS=0)
+    def test_request_report(self, client, sample_product, caplog):
+        cache.clear()
+        sql_stats.sql_report._windows = {}
+        client.get(f'/api/v1/goods/{sample_product.slug}/')
+        with CaptureQueriesContext(connection) as queries:
+            client.get(f'/api/v1/goods/{sample_product.slug}/')
+        # plans are built in the background, not on the request connection
+        assert not [query for query in queries.captured_queries if query['sql'].startswith('EXPLAIN')]
+        sql_stats.slow_query_log.wait()
+        assert 'Slow query on GET' in caplog.text
+        assert 'EXPLAIN failed' not in caplog.text
+        report = client.get('/sql-report').json()['routes']
+        route = next(total for total in report if total['route'] == 'api/v1/goods/(?P<slug>[^/.]+)/$')
+        assert route['requests'] == 2
+        assert route['queries'] == 2 * route['max_queries'] > 0
+        assert route['slow_queries'] == min(route['queries'], 2 * settings.SQL_SLOW_QUERIES_PER_REQUEST)
+
+
+class TestSyntheticData:
+
+    # every table gets its rows, references point to the product's own store
+    @pytest.mark.django_db(transaction=True)
+    def test_seed_data(self):
+        loaded = seed_data(SeedPlan(customers=20, vendors=3, products=50, orders=30, seed=1), chunk_size=7, log=lambda line: None)
+        assert Customer.objects.count() == 20
+        assert Customer.objects.filter(registered_vendor=True).count() == Store.objects.count() == 3
+        assert Product.objects.count() == ProductParameters.objects.count() == 50
+        assert Order.objects.count() == 30
+        assert loaded['orders'] == 30 + OrderItems.objects.count()
+        assert not Basket.objects.exclude(b_vendor=F('b_product__delivery_store')).exists()
+        assert not OrderItems.objects.exclude(order_vendor=F('order_product__delivery_store')).exists()
+        order = Order.objects.prefetch_related('order_items_number__order_product').first()
+        assert order.total_price == sum(item.order_product.price * item.order_prod_amount for item in order.order_items_number.all())
+        # sequences continue after the explicit ids
+        seeded = Customer.objects.aggregate(Max('id'))['id__max']
+        assert Customer.objects.create(email_login='after@seed.com', password='-').id > seeded
+
+    # rows depend on the seed and the row number only, not on the chunks
+    @pytest.mark.django_db
+    def test_deterministic(self):
+        plan, other = SeedPlan(10, 2, 10, 10, seed=1), SeedPlan(10, 2, 10, 10, seed=2)
+        plan.categories = other.categories = {224: 1, 15: 2, 19: 3}
+        for name, generate in GENERATORS.items():
+            whole = {model: list(rows) for model, rows in generate(plan, 0, 10).items()}
+            chunks = {model: list(rows) + list(generate(plan, 4, 10)[model]) for model, rows in generate(plan, 0, 4).items()}
+            assert whole == chunks
+            assert whole != {model: list(rows) for model, rows in generate(other, 0, 10).items()}
+
+
+class TestDbConnections:
+
+    # a connection idle for DB_HEALTH_CHECK_IDLE seconds is checked and closed when broken, a recently used one is not checked
+    @pytest.mark.django_db(transaction=True)
+    @override_settings(DB_HEALTH_CHECK_IDLE=10)
+    def test_health_check(self):
+        connection.ensure_connection()
+        with patch.object(connection, 'is_usable', return_value=False) as is_usable, patch.object(connection, 'close') as close:
+            db_connections.mark_used()
+            db_connections.check_connections()
+            assert not is_usable.called
+            connection.last_used -= 10
+            db_connections.check_connections()
+            assert is_usable.called
+            assert close.called
+
+    # the check runs before the view
+    @pytest.mark.django_db(transaction=True)
+    def test_middleware(self, client):
+        with patch('backend_code.db_connections.check_connections') as check:
+            client.get('/api/v1/goods/')
+        assert check.called
+        assert connection.last_used > time.monotonic() - 5
+
+
+def asgi_communicator(application, method, path, query=''):
+    return ApplicationCommunicator(application, {
+        'type': 'http', 'method': method, 'path': path, 'query_string': query.encode(), 'http_version': '1.1', 'scheme': 'http',
+        'server': ('testserver', 80), 'headers': [(b'host', b'testserver'), (b'content-type', b'application/json')]})
+
+
+def asgi_request(application, method, path, query='', body=b''):
+    async def run():
+        communicator = asgi_communicator(application, method, path, query)
+        await communicator.send_input({'type': 'http.request', 'body': body})
+        start = await communicator.receive_output(5)
+        content = await communicator.receive_output(5)
+        return start['status'], content['body']
+    return asyncio.run(run())
+
+
+class TestAsyncViews:
+
+    # async views answer exactly like the WSGI application
+    @pytest.mark.django_db(transaction=True)
+    def test_same_responses(self, client, sample_product):
+        application = AsgiRouter(None)
+        requests = [
+            ('/api/v1/goods/', 's=name', {}),
+            (f'/api/v1/goods/{sample_product.slug}/', '', {}),
+            ('/api/v1/goods/missing/', '', {}),
+            ('/api/v1/prod-cat/', '', {'prod_cat_id': sample_product.product_cat.prod_cat_id}),
+            ('/api/v1/store/', '', {'email_login': sample_product.delivery_store.vendor_id.email_login}),
+        ]
+        for path, query, data in requests:
+            cache.clear()
+            response = client.generic('GET', f'{path}?{query}', json.dumps(data), content_type='application/json')
+            cache.clear()
+            assert asgi_request(application, 'GET', path, query, json.dumps(data).encode()) == (response.status_code, response.content)
+
+    # the read endpoints go through the middleware chain: request metrics, SQL stats, connection checks
+    @pytest.mark.django_db(transaction=True)
+    def test_middleware(self, client, sample_product):
+        def requests_counted():
+            found = re.search(r'http_request_duration_seconds_count\{method="GET",route="[^"]*goods[^"]*slug[^"]*",status="200"\} (\d+)', client.get('/metrics').content.decode())
+            return int(found.group(1)) if found else 0
+
+        cache.clear()
+        sql_stats.sql_report._windows = {}
+        application = AsgiRouter(None)
+        counted = requests_counted()
+        with patch('backend_code.db_connections.check_connections') as check:
+            assert asgi_request(application, 'GET', f'/api/v1/goods/{sample_product.slug}/')[0] == 200
+        assert check.called
+        assert requests_counted() == counted + 1
+        report = client.get('/sql-report').json()['routes']
+        assert [total['requests'] for total in report if 'goods' in total['route'] and 'slug' in total['route']] == [1]
+
+    # a streaming response is sent as one body with its status, headers and cookies
+    @pytest.mark.django_db(transaction=True)
+    def test_streaming_response(self):
+        streamed = StreamingHttpResponse(iter([b'a', b'b']), status=202, content_type='text/plain')
+        streamed['X-Test'] = 'yes'
+        streamed.set_cookie('name', 'value')
+        application = AsgiRouter(None)
+        with patch.object(application.handler, 'get_response', return_value=streamed):
+            response = application.handler.handle(build_environ({'method': 'GET', 'path': '/api/v1/goods/', 'query_string': b'', 'http_version': '1.1'}, b''))
+        assert not response.streaming
+        assert (response.status_code, response.content, response['Content-Type'], response['X-Test']) == (202, b'ab', 'text/plain', 'yes')
+        assert response.cookies['name'].value == 'value'
+
+    # a waiting feed request holds no thread: with a single pool thread other requests are served while it waits
+    @pytest.mark.django_db(transaction=True)
+    def test_vendor_feed_wait(self, login_user, sample_store, sample_product_cat, sample_product):
+        login_user.address = 'address'
+        login_user.save()
+        fill_basket(login_user, sample_store, sample_product_cat, 2)
+        application = AsgiRouter(None)
+        feed_body = json.dumps({'email_login': settings.EMAIL_TO_USER}).encode()
+
+        async def run():
+            feed = asgi_communicator(application, 'GET', '/api/v1/vendor-orders/', 'wait=10')
+            await feed.send_input({'type': 'http.request', 'body': feed_body})
+            assert await feed.receive_nothing(0.5)
+            started = time.monotonic()
+            goods = asgi_communicator(application, 'GET', f'/api/v1/goods/{sample_product.slug}/')
+            await goods.send_input({'type': 'http.request', 'body': b''})
+            assert (await goods.receive_output(5))['status'] == 200
+            await goods.receive_output(5)
+            served = time.monotonic() - started
+            await asyncio.get_running_loop().run_in_executor(None, place_order)
+            start = await feed.receive_output(5)
+            content = await feed.receive_output(5)
+            return served, start['status'], json.loads(content['body'])
+
+        def place_order():
+            checkout(login_user, 'False')
+            connection.close()
+
+        with patch('backend_code.async_views._db_executor', ThreadPoolExecutor(1)):
+            served, status, feed = asyncio.run(run())
+        assert served < 2
+        assert status == 200
+        assert len(feed['results']) == 2
+        assert feed['next'] == feed['results'][-1]['feed_position']
+
+    # the event stream is sent by the event loop chunk by chunk
+    @pytest.mark.django_db(transaction=True)
+    @override_settings(VENDOR_FEED_STREAM_SECONDS=0.3, VENDOR_FEED_KEEPALIVE_SECONDS=0.1)
+    def test_vendor_feed_stream(self, login_user, sample_store, sample_product_cat):
+        login_user.address = 'address'
+        login_user.save()
+        fill_basket(login_user, sample_store, sample_product_cat, 2)
+        checkout(login_user, 'False')
+        application = AsgiRouter(None)
+
+        async def run():
+            feed = asgi_communicator(application, 'GET', '/api/v1/vendor-orders/', 'stream=True')
+            await feed.send_input({'type': 'http.request', 'body': json.dumps({'email_login': settings.EMAIL_TO_USER}).encode()})
+            start = await feed.receive_output(5)
+            chunks = [await feed.receive_output(5)]
+            while chunks[-1].get('more_body'):
+                chunks.append(await feed.receive_output(5))
+            return start, [chunk['body'].decode() for chunk in chunks]
+
+        start, chunks = asyncio.run(run())
+        assert (b'content-type', b'text/event-stream') in start['headers']
+        assert not [name for name, value in start['headers'] if name == b'content-length']
+        assert chunks[0].startswith('retry: ')
+        assert ''.join(chunks).count('event: order_item') == 2
+        assert ': keep-alive\n\n' in chunks
+        assert chunks[-1] == ''
+
+    # other methods and routes go to the WSGI application
+    def test_fallback(self):
+        handled = []
+
+        async def wsgi_application(scope, receive, send):
+            handled.append((scope['method'], scope['path']))
+            await send({'type': 'http.response.start', 'status': 204, 'headers': []})
+            await send({'type': 'http.response.body', 'body': b''})
+
+        application = AsgiRouter(wsgi_application)
+        for method, path in (('POST', '/api/v1/prod-cat/'), ('GET', '/api/v1/order/'), ('DELETE', '/api/v1/goods/15/'), ('GET', '/missing/')):
+            assert asgi_request(application, method, path) == (204, b'')
+        assert handled == [('POST', '/api/v1/prod-cat/'), ('GET', '/api/v1/order/'), ('DELETE', '/api/v1/goods/15/'), ('GET', '/missing/')]
+
+
+class TestReplicaRouter:
+
+    @pytest.fixture(autouse=True)
+    def replicas(self, settings):
+        settings.DATABASE_REPLICAS = ['replica_1', 'replica_2']
+        settings.REPLICA_MAX_LAG_SECONDS = 5
+        settings.REPLICA_LAG_CHECK_INTERVAL = 0
+        db_router.monitor.reset()
+        yield
+        db_router.monitor.reset()
+
+    # reads go to the replicas only inside a routed read request and outside of transactions, writes always go to the primary
+    def test_routing(self):
+        router = db_router.ReplicaRouter()
+        with patch('backend_code.db_router.replica_lag', return_value=0):
+            assert router.db_for_read(Product) == 'default'
+            with db_router.read_routing(False):
+                assert router.db_for_read(Product) in ('replica_1', 'replica_2')
+                assert router.db_for_write(Product) == 'default'
+                with patch.object(connection, 'in_atomic_block', True):
+                    assert router.db_for_read(Product) == 'default'
+            with db_router.read_routing(True):
+                assert router.db_for_read(Product) == 'default'
+
+    # a lagging or unreachable replica is out of rotation until it catches up
+    def test_lag(self):
+        router = db_router.ReplicaRouter()
+        lag = {'replica_1': 30, 'replica_2': 0}
+
+        def replica_lag(alias):
+            if isinstance(lag[alias], Exception):
+                raise lag[alias]
+            return lag[alias]
+
+        with patch('backend_code.db_router.replica_lag', side_effect=replica_lag), db_router.read_routing(False):
+            assert {router.db_for_read(Product) for _ in range(20)} == {'replica_2'}
+            lag['replica_2'] = OperationalError('connection refused')
+            assert router.db_for_read(Product) == 'default'
+            lag['replica_1'] = 1
+            assert {router.db_for_read(Product) for _ in range(20)} == {'replica_1'}
+
+    # after a successful write the client reads from the primary for REPLICA_PIN_SECONDS, other clients keep reading from the replicas
+    @override_settings(REPLICA_PIN_SECONDS=10)
+    def test_read_your_writes(self, rf):
+        cache.clear()
+        router = db_router.ReplicaRouter()
+        used = []
+
+        def view(request):
+            used.append(router.db_for_read(Basket))
+            return JsonResponse({}, status=200 if request.method == 'GET' else 201)
+
+        middleware = db_router.ReplicaRoutingMiddleware(view)
+        body = json.dumps({'email_login': 'buyer@mail.ru'})
+        with patch('backend_code.db_router.replica_lag', return_value=0):
+            middleware(rf.generic('GET', '/api/v1/basket/', body, content_type='application/json'))
+            middleware(rf.post('/api/v1/basket/', body, content_type='application/json'))
+            middleware(rf.generic('GET', '/api/v1/basket/', body, content_type='application/json'))
+            middleware(rf.get('/api/v1/basket/', {'email_login': 'other@mail.ru'}))
+            cache.clear()
+            middleware(rf.generic('GET', '/api/v1/basket/', body, content_type='application/json'))
+        assert [alias != 'default' for alias in used] == [True, False, False, True, True]